@@ -132,32 +132,35 @@ def run_import_job(task, importjob_id):
     importjob = UserImportJob.objects.get(pk=importjob_id)
     importjob.status = JOB_FINISHED if success else JOB_ABORTED
     importjob.save(update_fields=("status",))
-    return success, "{}\n{}".format(
+    summary_str = "{}\n{}".format(
         runner.user_import_summary_str, "\n".join(str(err) for err in runner.errors)
     )
+    return success, summary_str, runner.user_import_profile
 
 
 @shared_task(bind=True)
 def import_users(self, importjob_id):
     logger.info("Starting UserImportJob %d (%r).", importjob_id, self)
-    success, summary_str = run_import_job(self, importjob_id)
+    success, summary_str, profile = run_import_job(self, importjob_id)
     logger.info("Finished UserImportJob %d.", importjob_id)
     return HttpApiImportFrontend.make_job_state(
         description="UserImportJob #{} ended {}.\n\n{}".format(
             importjob_id, "successfully" if success else "with error", summary_str
         ),
         percentage=100,
+        profile=profile,
     )
 
 
 @shared_task(bind=True)
 def dry_run(self, importjob_id):
     logger.info("Starting dry run %d (%r).", importjob_id, self)
-    success, summary_str = run_import_job(self, importjob_id)
+    success, summary_str, profile = run_import_job(self, importjob_id)
     logger.info("Finished dry run %d.", importjob_id)
     return HttpApiImportFrontend.make_job_state(
         description="UserImportJob #{} (dry run) ended {}.\n\n{}".format(
             importjob_id, "successfully" if success else "with error", summary_str
         ),
         percentage=100,
+        profile=profile,
     )
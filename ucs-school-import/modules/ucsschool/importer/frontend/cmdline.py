@@ -70,6 +70,7 @@ class CommandLine(object):
         self.factory = None
         self.errors = []
         self.user_import_summary_str = ""
+        self.user_import_profile = []
         self._error_log_handler = None
 
     def parse_cmdline(self):
@@ -166,6 +167,7 @@ class CommandLine(object):
         finally:
             self.errors = importer.errors
             self.user_import_summary_str = importer.user_import_stats_str
+            self.user_import_profile = importer.user_import_profile
             # log result to error log (was logged before at INFO level)
             if self.user_import_summary_str:
                 log_msgs = (
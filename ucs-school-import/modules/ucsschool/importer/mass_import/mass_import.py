@@ -32,7 +32,9 @@
 """Default mass import class."""
 
 import datetime
+import json
 import logging
+import os.path
 from typing import TYPE_CHECKING, Optional, TypeVar  # noqa: F401
 
 from ucsschool.lib.models.utils import stopped_notifier
@@ -42,6 +44,7 @@ from ..exceptions import UcsSchoolImportError, UcsSchoolImportFatalError
 from ..factory import Factory
 from ..utils.import_pyhook import run_import_pyhooks
 from ..utils.pre_read_pyhook import PreReadPyHook
+from ..utils.profiler import get_profiler
 from ..utils.result_pyhook import ResultPyHook
 from ..utils.utils import nullcontext
 
@@ -71,6 +74,7 @@ class MassImport(object):
         self.password_exporter = self.factory.make_password_exporter()
         self.errors = []
         self.user_import_stats_str = ""
+        self.user_import_profile = []
 
     def mass_import(self):  # type: () -> None
         with nullcontext() if self.dry_run else stopped_notifier():
@@ -107,15 +111,30 @@ class MassImport(object):
     def import_users(self):  # type: () -> None
         self.logger.info("------ Importing users... ------")
         user_import = self.factory.make_user_importer(self.dry_run)
+        profiler = get_profiler()
         exception = None
         try:
             user_import.progress_report(description="Running pre-read hooks: 0%.", percentage=0)
-            run_import_pyhooks(PreReadPyHook, "pre_read")
+            with profiler.phase("pre_read hooks"):
+                run_import_pyhooks(PreReadPyHook, "pre_read")
             user_import.progress_report(description="Analyzing data: 1%.", percentage=1)
-            imported_users = user_import.read_input()
-            users_to_delete = user_import.detect_users_to_delete()
-            user_import.delete_users(users_to_delete)  # 0% - 10%
-            user_import.create_and_modify_users(imported_users)  # 90% - 100%
+            batch_size = self.config.get("streaming_batch_size", 0)
+            if batch_size:
+                with profiler.phase("prefetch existing users"):
+                    user_import.prefetch_existing_users()
+                with profiler.phase("stream users"):
+                    user_import.stream_users(batch_size)
+            else:
+                with profiler.phase("read input"):
+                    imported_users = user_import.read_input()
+                with profiler.phase("prefetch existing users"):
+                    user_import.prefetch_existing_users()
+                with profiler.phase("detect users to delete"):
+                    users_to_delete = user_import.detect_users_to_delete()
+                with profiler.phase("delete users"):
+                    user_import.delete_users(users_to_delete)  # 0% - 10%
+                with profiler.phase("create and modify users"):
+                    user_import.create_and_modify_users(imported_users)  # 90% - 100%
         except UcsSchoolImportError as exc:
             exception = exc
             user_import.errors.append(exc)
@@ -126,7 +145,18 @@ class MassImport(object):
                 UcsSchoolImportFatalError("An unknown error terminated the import job: {}".format(exc))
             )
             self.logger.exception(exc)
+        finally:
+            # must not replace an exception of the import or skip the reporting below
+            try:
+                user_import.release_name_counters()
+            except Exception as exc:
+                self.logger.exception("Error releasing reserved name counters: %s", exc)
+            try:
+                user_import.save_delta_state()
+            except Exception as exc:
+                self.logger.exception("Error saving the delta import state: %s", exc)
         self.errors.extend(user_import.errors)
+        self.user_import_profile = profiler.get_stats()
         self.user_import_stats_str = user_import.log_stats()
         if self.config["output"]["new_user_passwords"]:
             nup = datetime.datetime.now().strftime(self.config["output"]["new_user_passwords"])
@@ -136,8 +166,22 @@ class MassImport(object):
             uis = datetime.datetime.now().strftime(self.config["output"]["user_import_summary"])
             self.logger.info("------ Writing user import summary to %s... ------", uis)
             self.result_exporter.dump(user_import, uis)
+            if profiler.enabled:
+                self.dump_profile("{}.profile.json".format(os.path.splitext(uis)[0]))
         result_data = user_import.get_result_data()
         run_import_pyhooks(ResultPyHook, "user_result", result_data)
         self.logger.info("------ Importing users done. ------")
         if exception:
             raise exception
+
+    def dump_profile(self, filename):  # type: (str) -> None
+        """
+        Write the timing statistics of the user import (see configuration key
+        `profiling`) as JSON to a file.
+
+        :param str filename: path of the file to write
+        :return: None
+        """
+        self.logger.info("------ Writing user import timing statistics to %s... ------", filename)
+        with open(filename, "w") as fp:
+            json.dump(self.user_import_profile, fp, indent=2)
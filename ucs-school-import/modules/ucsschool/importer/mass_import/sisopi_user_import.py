@@ -51,11 +51,12 @@ class SingleSourcePartialUserImport(UserImport):
     Currently used by MassImport like this:
 
     1. read_input()
-    2. detect_users_to_delete()
-    3. delete_users()
-    4. create_and_modify_users()
-    5. log_stats()
-    6. get_result_data()
+    2. prefetch_existing_users()
+    3. detect_users_to_delete()
+    4. delete_users()
+    5. create_and_modify_users()
+    6. log_stats()
+    7. get_result_data()
 
     In the SingleSourcePartialImport scenario the following is done:
 
@@ -32,18 +32,38 @@
 
 """Default user import class."""
 
+import concurrent.futures
 import copy
 import datetime
+import hashlib
+import itertools
+import json
 import logging
+import os
 import sys
-from collections import defaultdict
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type, Union  # noqa: F401
+import threading
+from collections import defaultdict, namedtuple
+from operator import itemgetter
+from typing import (  # noqa: F401
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import six
 from ldap.filter import filter_format
 
 from ucsschool.lib.models.attributes import ValidationError
-from ucsschool.lib.models.base import NoObject, WrongObjectType
+from ucsschool.lib.models.base import PYHOOKS_PATH, NoObject, WrongObjectType
+from ucsschool.lib.models.utils import paged_search
+from univention.admin.uexceptions import noObject
 
 from ..configuration import Configuration
 from ..exceptions import (
@@ -59,12 +79,43 @@ from ..exceptions import (
 )
 from ..factory import Factory
 from ..utils.import_pyhook import run_import_pyhooks
-from ..utils.ldap_connection import get_admin_connection, get_readonly_connection
+from ..utils.ldap_connection import (
+    get_admin_connection,
+    get_new_admin_connection,
+    get_readonly_connection,
+)
 from ..utils.post_read_pyhook import PostReadPyHook
+from ..utils.profiler import get_profiler
+from ..utils.uniqueness_index import (
+    FULL_LOAD_THRESHOLD,
+    UNIQUENESS,
+    get_email_index,
+    get_username_index,
+)
 
 if TYPE_CHECKING:
     from ..configuration import ReadOnlyDict  # noqa: F401
     from ..models.import_user import ImportUser  # noqa: F401
+    from ..utils.ldap_connection import LoType  # noqa: F401
+    from ..utils.username_handler import UsernameHandler  # noqa: F401
+
+
+DeltaStateEntry = namedtuple("DeltaStateEntry", ["input_hash", "csn", "name", "groups_hash"])
+DELTA_GROUPS_FILTER = "(&(objectClass=univentionGroup)(uniqueMember=*))"
+# configuration keys, that do not affect the data of users, ignored when comparing delta states
+DELTA_VOLATILE_CONFIG_KEYS = (
+    "delta_state_file",
+    "dry_run",
+    "input",
+    "logfile",
+    "output",
+    "parallelism",
+    "profiling",
+    "progress_notification_function",
+    "streaming_batch_size",
+    "tolerate_errors",
+    "verbose",
+)
 
 
 class UserImport(object):
@@ -72,21 +123,33 @@ class UserImport(object):
     Currently used by MassImport like this:
 
     1. read_input()
-    2. detect_users_to_delete()
-    3. delete_users()
-    4. create_and_modify_users()
-    5. log_stats()
-    6. get_result_data()
+    2. prefetch_existing_users()
+    3. detect_users_to_delete()
+    4. delete_users()
+    5. create_and_modify_users()
+    6. log_stats()
+    7. get_result_data()
+
+    With the configuration key `streaming_batch_size` set, steps 1 and 3-5
+    are replaced by :py:meth:`stream_users()` (running after step 2).
     """
 
+    deletion_batch_size = 200  # number of users delete_users() loads with one LDAP search
+
     def __init__(self, dry_run=True):
         """:param bool dry_run: set to False to actually commit changes to LDAP"""
         self.dry_run = dry_run
+        self._lock = threading.RLock()
+        self._worker_data = threading.local()
         self.errors = []  # type: List[UcsSchoolImportError]
         self.imported_users = []  # type: List[ImportUser]
+        # what detect_users_to_delete() needs to know about the input, filled by read_input*():
+        self.imported_user_ids = set()  # type: Set[Tuple[str, str]]
+        self._users_marked_for_deletion = []  # type: List[Tuple[str, str, List[str]]]
         self.added_users = defaultdict(list)  # type: Dict[str, List[Dict[str, Any]]]
         self.modified_users = defaultdict(list)  # type: Dict[str, List[Dict[str, Any]]]
         self.deleted_users = defaultdict(list)  # type: Dict[str, List[Dict[str, Any]]]
+        self.unchanged_users = defaultdict(list)  # type: Dict[str, List[Dict[str, Any]]]
         self.config = Configuration()  # type: ReadOnlyDict
         self.logger = logging.getLogger(__name__)
         self.connection, self.position = get_readonly_connection() if dry_run else get_admin_connection()
@@ -94,6 +157,17 @@ class UserImport(object):
         self.reader = self.factory.make_reader(filename=self.config["input"]["filename"])
         self.ucr = self.factory.make_ucr()
         self.imported_users_len = 0
+        # set by stream_users(), the total number of users is unknown until the input has been read
+        self._streaming = False
+        # (source_uid, record_uid) -> DN, filled by prefetch_existing_users():
+        self.existing_users = None  # type: Optional[Dict[Tuple[str, str], str]]
+        self._existing_user_dns = {}  # type: Dict[Tuple[str, str], str]
+        self._existing_import_ids = set()  # type: Set[Tuple[str, str]]
+        # delta mode: state of the last import and of this import, see load_delta_state():
+        self.delta_state = None  # type: Optional[Dict[Tuple[str, str], DeltaStateEntry]]
+        self._new_delta_state = {}  # type: Dict[Tuple[str, str], DeltaStateEntry]
+        self._existing_user_csns = {}  # type: Dict[Tuple[str, str], str]
+        self._existing_user_groups_hashes = {}  # type: Dict[Tuple[str, str], str]
 
     def read_input(self):  # type: () -> List[ImportUser]
         """
@@ -119,9 +193,103 @@ class UserImport(object):
                 self.logger.exception("Error reading %d. user: %s", num, exc)
                 self._add_error(exc)
             num += 1
+        self._remember_imported_users(self.imported_users)
         self.logger.info("------ Read %d users from input data. ------", len(self.imported_users))
         return self.imported_users
 
+    def read_input_batches(self, batch_size):  # type: (int) -> Iterator[List[ImportUser]]
+        """
+        Read users from input data in batches of `batch_size` users.
+
+        In contrast to :py:meth:`read_input()` the :py:class:`ImportUser`
+        objects are not stored in `self.imported_users`. Only their
+        `(source_uid, record_uid)` are kept for :py:meth:`detect_users_to_delete()`.
+
+        * :py:class:`UcsSchoolImportErrors` are stored in in `self.errors` (with input entry number in
+            `error.entry_count`).
+        * The `all_entries_read` hook is run for each batch.
+
+        :param int batch_size: maximum number of users per batch
+        :return: iterator over lists of ImportUsers found in input
+        :rtype: Iterator(list(ImportUser))
+        """
+        num = 1
+        num_read = 0
+        batch = []  # type: List[ImportUser]
+        self.logger.info(
+            "------ Starting to read users from input data in batches of %d... ------", batch_size
+        )
+        while True:
+            try:
+                import_user = next(self.reader)
+                self.logger.info("Done reading %d. user: %s", num, import_user)
+                batch.append(import_user)
+            except StopIteration:
+                break
+            except UcsSchoolImportError as exc:
+                self.logger.exception("Error reading %d. user: %s", num, exc)
+                self._add_error(exc)
+            num += 1
+            if len(batch) >= batch_size:
+                num_read += len(batch)
+                yield self._finish_batch(batch)
+                batch = []
+        if batch:
+            num_read += len(batch)
+            yield self._finish_batch(batch)
+        self.logger.info("------ Read %d users from input data. ------", num_read)
+
+    def _finish_batch(self, batch):  # type: (List[ImportUser]) -> List[ImportUser]
+        run_import_pyhooks(PostReadPyHook, "all_entries_read", batch, self.errors)
+        self._remember_imported_users(batch)
+        return batch
+
+    def _remember_imported_users(self, imported_users):  # type: (List[ImportUser]) -> None
+        """Store what :py:meth:`detect_users_to_delete()` needs to know about the input."""
+        for user in imported_users:
+            self.imported_user_ids.add((user.source_uid, user.record_uid))
+            if user.action == "D":
+                self._users_marked_for_deletion.append(
+                    (user.source_uid, user.record_uid, user.input_data)
+                )
+
+    def stream_users(self, batch_size):  # type: (int) -> None
+        """
+        Read, create and modify users batch by batch, then delete users
+        missing in the input.
+
+        Replaces :py:meth:`read_input()`, :py:meth:`detect_users_to_delete()`,
+        :py:meth:`delete_users()` and :py:meth:`create_and_modify_users()`
+        when the configuration key `streaming_batch_size` is set. Only one
+        batch of :py:class:`ImportUser` objects is kept in memory and
+        writing to LDAP starts after the first batch has been read.
+
+        As the input has to be read completely to know which users are
+        missing in it, users are deleted *after* creating and modifying
+        users (not before as in the non-streaming mode). While creating and
+        modifying users the progress stays at 10% (with the number of users
+        done), deleting users reports 90% - 100%.
+
+        :param int batch_size: maximum number of users per batch
+        :return: None
+        """
+        self.logger.info("------ Creating / modifying users... ------")
+        self._streaming = True
+        usernum = 0
+        for batch in self.read_input_batches(batch_size):
+            self.imported_users_len += len(batch)
+            usernum = self._create_and_modify_batch(batch, usernum)
+        self._log_created_and_modified()
+        users_to_delete = self.detect_users_to_delete()
+        self.delete_users(users_to_delete)
+        self.progress_report(
+            description="Finished: 100%.",
+            percentage=100,
+            done=usernum,
+            total=usernum,
+            errors=len(self.errors),
+        )
+
     def create_and_modify_users(self, imported_users):
         # type: (List[ImportUser]) -> Tuple[List[UcsSchoolImportError], Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]  # noqa: E501
         """
@@ -131,6 +299,9 @@ class UserImport(object):
             :py:class:`ImportUser` objects.
         * :py:class:`UcsSchoolImportErrors` are stored in `self.errors` (with failed
             :py:class:`ImportUser` objects in `error.import_user`).
+        * If the configuration key `parallelism` is larger than 1, the users are
+            split by :py:meth:`partition_users()` and the partitions are
+            processed concurrently.
 
         :param imported_users: ImportUser objects
         :type imported_users: :func:`list`
@@ -138,11 +309,67 @@ class UserImport(object):
         :rtype: tuple(list[UcsSchoolImportError], list[dict], list[dict])
         """
         self.logger.info("------ Creating / modifying users... ------")
-        usernum = 0
         self.imported_users_len = len(imported_users)
+        self._create_and_modify_batch(imported_users, 0)
+        self._log_created_and_modified()
+        return self.errors, self.added_users, self.modified_users
+
+    def _create_and_modify_batch(self, imported_users, usernum):
+        # type: (List[ImportUser], int) -> int
+        """
+        Create and modify users of `imported_users`, emptying the list.
+
+        :param imported_users: ImportUser objects
+        :type imported_users: :func:`list`
+        :param int usernum: number of users processed before this batch
+        :return: number of users processed including this batch
+        :rtype: int
+        """
+        self.reserve_name_counters(imported_users)
+        self.load_uniqueness_indexes()
+        parallelism = int(self.config.get("parallelism", 1) or 1)
+        if parallelism > 1 and len(imported_users) > 1:
+            num_users = len(imported_users)
+            self._create_and_modify_users_parallel(imported_users, parallelism, usernum)
+            return usernum + num_users
+        # pop() from the end instead of pop(0) from the front, which is O(n) per user
+        imported_users.reverse()
         while imported_users:
-            imported_user = imported_users.pop(0)
+            imported_user = imported_users.pop()
             usernum += 1
+            self.create_and_modify_user(imported_user, usernum)
+        return usernum
+
+    def _log_created_and_modified(self):  # type: () -> None
+        num_added_users = sum(map(len, self.added_users.values()))
+        num_modified_users = sum(map(len, self.modified_users.values()))
+        self.logger.info(
+            "------ Created %d users, modified %d users. ------",
+            num_added_users,
+            num_modified_users,
+        )
+
+    def create_and_modify_user(self, imported_user, usernum):  # type: (ImportUser, int) -> None
+        """
+        Create or modify a single user.
+
+        * The result is stored in `self.added_users` or `self.modified_users`.
+        * :py:class:`UcsSchoolImportErrors` are stored in `self.errors`.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :param int usernum: position of the user in the list of users to process
+        :return: None
+        """
+        if self._streaming:
+            # total unknown: stay at 10% until deleting users (90% - 100%)
+            self.progress_report(
+                description="Creating and modifying users: {} done.".format(usernum),
+                percentage=10,
+                done=usernum,
+                total=0,
+                errors=len(self.errors),
+            )
+        else:
             percentage = 10 + 90 * usernum // self.imported_users_len  # 10% - 100%
             self.progress_report(
                 description="Creating and modifying users: {}%.".format(percentage),
@@ -151,42 +378,49 @@ class UserImport(object):
                 total=self.imported_users_len,
                 errors=len(self.errors),
             )
-            if imported_user.action == "D":
-                continue
-            try:
-                self.logger.debug(
-                    "Creating / modifying user %d/%d %s...",
-                    usernum,
-                    self.imported_users_len,
-                    imported_user,
-                )
+        if imported_user.action == "D":
+            return
+        input_hash = None
+        if self.delta_state is not None:
+            input_hash = self.get_input_hash(imported_user)
+            if self.is_unchanged(imported_user, input_hash):
+                return
+        try:
+            self.logger.debug(
+                "Creating / modifying user %d/%d %s...",
+                usernum,
+                self.imported_users_len,
+                imported_user,
+            )
+            with get_profiler().phase("determine action"):
                 user = self.determine_add_modify_action(imported_user)
-                cls_name = user.__class__.__name__
+            cls_name = user.__class__.__name__
 
-                try:
-                    action_str = {"A": "Adding", "D": "Deleting", "M": "Modifying"}[user.action]
-                except KeyError:
-                    raise UnknownAction(
-                        "{}  (source_uid:{} record_uid: {}) has unknown action '{}'.".format(
-                            user, user.source_uid, user.record_uid, user.action
-                        ),
-                        entry_count=user.entry_count,
-                        import_user=user,
-                    )
+            try:
+                action_str = {"A": "Adding", "D": "Deleting", "M": "Modifying"}[user.action]
+            except KeyError:
+                raise UnknownAction(
+                    "{}  (source_uid:{} record_uid: {}) has unknown action '{}'.".format(
+                        user, user.source_uid, user.record_uid, user.action
+                    ),
+                    entry_count=user.entry_count,
+                    import_user=user,
+                )
 
-                if user.action in ["A", "M"]:
-                    _user = user.to_dict()  # sorted output
-                    self.logger.info(
-                        "%s %s (source_uid:%s record_uid:%s) attributes: {%s}...",
-                        action_str,
-                        user,
-                        user.source_uid,
-                        user.record_uid,
-                        ", ".join("{!r}: {!r}".format(k, _user[k]) for k in sorted(_user.keys())),
-                    )
-                # save password of new user for later export (NewUserPasswordCsvExporter):
-                password = user.password
-                try:
+            if user.action in ["A", "M"]:
+                _user = user.to_dict()  # sorted output
+                self.logger.info(
+                    "%s %s (source_uid:%s record_uid:%s) attributes: {%s}...",
+                    action_str,
+                    user,
+                    user.source_uid,
+                    user.record_uid,
+                    ", ".join("{!r}: {!r}".format(k, _user[k]) for k in sorted(_user.keys())),
+                )
+            # save password of new user for later export (NewUserPasswordCsvExporter):
+            password = user.password
+            try:
+                with get_profiler().phase("create" if user.action == "A" else "modify"):
                     if user.action == "A":
                         err = CreationError  # type: Union[Type[CreationError], Type[ModificationError]]
                         store = self.added_users[cls_name]  # type: List[Dict[str, Any]]
@@ -224,72 +458,517 @@ class UserImport(object):
                             success = user.modify(lo=self.connection)
                     else:
                         # delete
-                        continue
-                except ValidationError as exc:
-                    six.reraise(
-                        UserValidationError,
-                        UserValidationError(
-                            "ValidationError when {} {} "
-                            "(source_uid:{} record_uid: {}): {}".format(
-                                action_str.lower(),
-                                user,
-                                user.source_uid,
-                                user.record_uid,
-                                exc,
-                            ),
-                            validation_error=exc,
-                            import_user=user,
+                        return
+            except ValidationError as exc:
+                six.reraise(
+                    UserValidationError,
+                    UserValidationError(
+                        "ValidationError when {} {} "
+                        "(source_uid:{} record_uid: {}): {}".format(
+                            action_str.lower(),
+                            user,
+                            user.source_uid,
+                            user.record_uid,
+                            exc,
                         ),
-                        sys.exc_info()[2],
-                    )
+                        validation_error=exc,
+                        import_user=user,
+                    ),
+                    sys.exc_info()[2],
+                )
 
-                if success:
-                    self.logger.info(
-                        "Success %s %d/%d %s (source_uid:%s record_uid: %s).",
+            if success:
+                self.logger.info(
+                    "Success %s %d/%d %s (source_uid:%s record_uid: %s).",
+                    action_str.lower(),
+                    usernum,
+                    self.imported_users_len,
+                    user,
+                    user.source_uid,
+                    user.record_uid,
+                )
+                user.password = password
+                store.append(user.to_dict())
+                self._update_existing_users_index(user)
+                if input_hash:
+                    self._update_delta_state(user, input_hash)
+            else:
+                raise err(
+                    "Error {} {}/{} {} (source_uid:{} record_uid: {}), does probably "
+                    "{}exist.".format(
                         action_str.lower(),
                         usernum,
                         self.imported_users_len,
                         user,
                         user.source_uid,
                         user.record_uid,
-                    )
-                    user.password = password
-                    store.append(user.to_dict())
-                else:
-                    raise err(
-                        "Error {} {}/{} {} (source_uid:{} record_uid: {}), does probably "
-                        "{}exist.".format(
-                            action_str.lower(),
-                            usernum,
-                            len(imported_users),
-                            user,
-                            user.source_uid,
-                            user.record_uid,
-                            "not " if user.action == "M" else "already ",
-                        ),
-                        entry_count=user.entry_count,
-                        import_user=user,
-                    )
+                        "not " if user.action == "M" else "already ",
+                    ),
+                    entry_count=user.entry_count,
+                    import_user=user,
+                )
 
-            except (CreationError, ModificationError) as exc:
-                self.logger.error("Entry #%d: %s", exc.entry_count, exc)  # traceback useless
-                self._add_error(exc)
-            except UcsSchoolImportError as exc:
-                self.logger.exception("Entry #%d: %s", exc.entry_count, exc)
-                self._add_error(exc)
-        num_added_users = sum(map(len, self.added_users.values()))
-        num_modified_users = sum(map(len, self.modified_users.values()))
+        except (CreationError, ModificationError) as exc:
+            self.logger.error("Entry #%d: %s", exc.entry_count, exc)  # traceback useless
+            self._add_error(exc)
+        except UcsSchoolImportError as exc:
+            self.logger.exception("Entry #%d: %s", exc.entry_count, exc)
+            self._add_error(exc)
+
+    def partition_users(self, imported_users, parallelism):
+        # type: (List[ImportUser], int) -> List[List[ImportUser]]
+        """
+        Split users into at most `parallelism` partitions, that can be
+        created and modified concurrently.
+
+        All users of a school are put into the same partition. Schools that
+        are connected by a user (through its `schools` attribute or a school
+        change) are kept together as well. The order of the input is kept
+        inside each partition.
+
+        IMPLEMENTME to change the partitioning.
+
+        :param imported_users: ImportUser objects
+        :type imported_users: :func:`list`
+        :param int parallelism: maximum number of partitions
+        :return: list of partitions
+        :rtype: list(list(ImportUser))
+        """
+        parents = {}  # type: Dict[str, str]
+
+        def find(school):  # type: (str) -> str
+            parents.setdefault(school, school)
+            while parents[school] != school:
+                parents[school] = parents[parents[school]]
+                school = parents[school]
+            return school
+
+        user_schools = []  # type: List[Tuple[ImportUser, str]]
+        for imported_user in imported_users:
+            schools = sorted(self._get_partition_schools(imported_user))
+            for school in schools[1:]:
+                parents[find(school)] = find(schools[0])
+            user_schools.append((imported_user, schools[0]))
+
+        components = defaultdict(list)  # type: Dict[str, List[ImportUser]]
+        for imported_user, school in user_schools:
+            components[find(school)].append(imported_user)
+
+        partitions = [[] for _ in range(min(parallelism, len(components)))]
+        # biggest components first, each into the currently smallest partition
+        for component in sorted(components.values(), key=len, reverse=True):
+            min(partitions, key=len).extend(component)
+        order = {id(imported_user): num for num, imported_user in enumerate(imported_users)}
+        for partition in partitions:
+            partition.sort(key=lambda x: order[id(x)])
+        return partitions
+
+    def _get_partition_schools(self, imported_user):  # type: (ImportUser) -> Set[str]
+        """Names of all schools a user from the input may touch in LDAP (lowercase)."""
+        schools = imported_user.schools or []
+        if isinstance(schools, six.string_types):
+            schools = schools.split(",")
+        schools = set(schools)
+        schools.add(imported_user.school or self.config.get("school") or "")
+        if self.existing_users is not None and imported_user.source_uid and imported_user.record_uid:
+            key = self._import_id_key(imported_user.source_uid, imported_user.record_uid)
+            dn = self._existing_user_dns.get(key)
+            if dn:
+                schools.add(imported_user.get_school_from_dn(dn) or "")
+        return {school.strip().lower() for school in schools}
+
+    @property
+    def connection(self):  # type: () -> LoType
+        """LDAP connection object, each thread of the worker pool uses its own."""
+        return getattr(self._worker_data, "connection", None) or self._connection
+
+    @connection.setter
+    def connection(self, value):  # type: (LoType) -> None
+        self._connection = value
+
+    def _create_and_modify_users_parallel(self, imported_users, parallelism, usernum=0):
+        # type: (List[ImportUser], int, int) -> None
+        """
+        Create and modify users in a pool of `parallelism` threads. Each
+        thread processes one partition from :py:meth:`partition_users()`
+        with its own LDAP connection.
+
+        Results and errors are sorted by their input entry number afterwards,
+        so the outcome does not depend on the scheduling of the threads.
+
+        :param imported_users: ImportUser objects, the list will be emptied
+        :type imported_users: :func:`list`
+        :param int parallelism: number of threads
+        :param int usernum: number of users processed before
+        :return: None
+        """
+        partitions = [p for p in self.partition_users(imported_users, parallelism) if p]
+        del imported_users[:]
         self.logger.info(
-            "------ Created %d users, modified %d users. ------",
-            num_added_users,
-            num_modified_users,
+            "Processing %d users in %d partitions (sizes: %s).",
+            self.imported_users_len,
+            len(partitions),
+            ", ".join(str(len(p)) for p in partitions),
         )
-        return self.errors, self.added_users, self.modified_users
+        num_errors_before = len(self.errors)
+        usernums = itertools.count(usernum + 1)
+        stop = threading.Event()
+
+        def work(partition):  # type: (List[ImportUser]) -> None
+            if not self.dry_run:
+                # the read-only connection used in a dry-run can be shared
+                self._worker_data.connection, _pos = get_new_admin_connection()
+            try:
+                for imported_user in partition:
+                    if stop.is_set():
+                        break
+                    with self._lock:
+                        usernum = next(usernums)
+                    self.create_and_modify_user(imported_user, usernum)
+            except BaseException:
+                stop.set()
+                raise
+            finally:
+                self._worker_data.connection = None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+            futures = [executor.submit(work, partition) for partition in partitions]
+        for store in (self.added_users, self.modified_users):
+            for users in store.values():
+                users.sort(key=itemgetter("entry_count"))
+        self.errors[num_errors_before:] = sorted(
+            self.errors[num_errors_before:], key=lambda exc: exc.entry_count or 0
+        )
+        for future in futures:
+            future.result()  # raises TooManyErrors etc. from the threads
+
+    def prefetch_existing_users(self):  # type: () -> None
+        """
+        Load the IDs and DNs of all existing users of this source database
+        with a few paged LDAP searches.
+
+        :py:meth:`find_importuser_in_ldap()` uses the result to decide
+        without an LDAP search whether a user exists, and
+        :py:meth:`get_ids_of_existing_users()` uses it instead of searching
+        again.
+
+        * :py:attr:`self.existing_users` holds the users matching
+            :py:meth:`get_existing_users_search_filter()`.
+        * All objects with the configured `source_uid` are indexed
+            additionally, regardless of their role or school.
+
+        :return: None
+        """
+        self.logger.info("------ Fetching IDs of existing users... ------")
+        delta_mode = bool(self.config.get("delta_state_file"))
+        csns = {} if delta_mode else None  # type: Optional[Dict[Tuple[str, str], str]]
+        self.existing_users = self._search_import_ids(self.get_existing_users_search_filter(), csns)
+        self._existing_user_dns = {
+            self._import_id_key(*import_id): dn for import_id, dn in self.existing_users.items()
+        }
+        self._existing_import_ids = {
+            self._import_id_key(*import_id)
+            for import_id in self._search_import_ids(
+                filter_format(
+                    "(&(ucsschoolSourceUID=%s)(ucsschoolRecordUID=*))", (self.config["source_uid"],)
+                )
+            )
+        }
+        self.logger.info(
+            "------ Found %d existing users (%d objects with source_uid %r). ------",
+            len(self.existing_users),
+            len(self._existing_import_ids),
+            self.config["source_uid"],
+        )
+        if delta_mode:
+            self._existing_user_csns = {
+                self._import_id_key(*import_id): csn for import_id, csn in csns.items()
+            }
+            self._existing_user_groups_hashes = self._search_groups_hashes(self._existing_user_dns)
+            self.load_delta_state()
+
+    def _search_import_ids(self, filter_s, csns=None):
+        # type: (str, Optional[Dict[Tuple[str, str], str]]) -> Dict[Tuple[str, str], str]
+        attr = ["ucsschoolSourceUID", "ucsschoolRecordUID"]
+        if csns is not None:
+            attr.append("entryCSN")
+        self.logger.debug("Searching with filter=%r", filter_s)
+        res = {}
+        for dn, attrs in paged_search(self.connection, filter_s, attr=attr):
+            import_id = (
+                attrs["ucsschoolSourceUID"][0].decode("utf-8"),
+                attrs["ucsschoolRecordUID"][0].decode("utf-8"),
+            )
+            res[import_id] = dn
+            if csns is not None:
+                csns[import_id] = attrs.get("entryCSN", [b""])[0].decode("utf-8")
+        return res
+
+    def _search_groups_hashes(self, user_dns):
+        # type: (Dict[Tuple[str, str], str]) -> Dict[Tuple[str, str], str]
+        """
+        Find the groups of users with one paged search over the `uniqueMember`
+        attribute of all groups (`memberOf` is not necessarily available).
+
+        :param dict user_dns: mapping of keys to user DNs
+        :return: mapping of the same keys to the hashes of the DNs of the groups of the users,
+            see :py:meth:`_get_groups_hash()`
+        :rtype: dict
+        """
+        groups = defaultdict(list)  # type: Dict[str, List[str]]
+        for dn, attrs in paged_search(self.connection, DELTA_GROUPS_FILTER, attr=["uniqueMember"]):
+            for member in attrs.get("uniqueMember", []):
+                groups[member.decode("UTF-8").lower()].append(dn)
+        return {key: self._get_groups_hash(groups.get(dn.lower(), [])) for key, dn in user_dns.items()}
+
+    @staticmethod
+    def _get_groups_hash(group_dns):  # type: (List[str]) -> str
+        return hashlib.sha256(
+            "\n".join(sorted(dn.lower() for dn in group_dns)).encode("UTF-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _import_id_key(source_uid, record_uid):  # type: (str, str) -> Tuple[str, str]
+        # ucsschoolSourceUID and ucsschoolRecordUID use caseIgnoreMatch in LDAP
+        return source_uid.lower(), record_uid.lower()
+
+    def _update_existing_users_index(self, user):  # type: (ImportUser) -> None
+        """Register a created or moved user in the prefetched index."""
+        if self.existing_users is None or self.dry_run:
+            return
+        key = self._import_id_key(user.source_uid, user.record_uid)
+        self._existing_user_dns[key] = user.dn
+        self._existing_import_ids.add(key)
+
+    def load_delta_state(self):  # type: () -> None
+        """
+        Read the state of the last import from the file configured in
+        `delta_state_file`. This enables the delta mode: users whose input
+        data, LDAP object and group memberships have not changed since the
+        last import are skipped by :py:meth:`create_and_modify_user()`.
+
+        The state is discarded, if the configuration affecting the users or
+        the Python hooks have changed.
+
+        :return: None
+        """
+        filename = self.config["delta_state_file"]
+        self.delta_state = {}
+        try:
+            with open(filename) as fp:
+                state = json.load(fp)
+        except IOError as exc:
+            self.logger.warning("Cannot read delta state file %r: %s", filename, exc)
+            return
+        except ValueError as exc:
+            self.logger.error("Ignoring broken delta state file %r: %s", filename, exc)
+            return
+        if state.get("config") != self._get_config_hash():
+            self.logger.info("Configuration changed since last import, ignoring delta state.")
+            return
+        self.delta_state = {
+            (source_uid, record_uid): DeltaStateEntry(input_hash, csn, name, groups_hash)
+            for source_uid, record_uid, input_hash, csn, name, groups_hash in state.get("users", [])
+        }
+        self.logger.info("Read delta state of %d users from %r.", len(self.delta_state), filename)
+
+    def save_delta_state(self):  # type: () -> None
+        """
+        Write the state of users that were unchanged, created or modified
+        to the file configured in `delta_state_file`.
+
+        :return: None
+        """
+        if self.delta_state is None or self.dry_run:
+            return
+        filename = self.config["delta_state_file"]
+        state = {
+            "config": self._get_config_hash(),
+            "users": sorted(
+                [source_uid, record_uid, entry.input_hash, entry.csn, entry.name, entry.groups_hash]
+                for (source_uid, record_uid), entry in self._new_delta_state.items()
+            ),
+        }
+        tmp_filename = "{}.tmp".format(filename)
+        with open(tmp_filename, "w") as fp:
+            json.dump(state, fp)
+        os.rename(tmp_filename, filename)
+        self.logger.info("Wrote delta state of %d users to %r.", len(self._new_delta_state), filename)
+
+    def get_input_hash(self, imported_user):  # type: (ImportUser) -> str
+        """
+        Hash of the input data of a user.
+
+        IMPLEMENTME if the data of your users does not come from
+        :py:meth:`ImportUser.to_dict()` only.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :return: hex digest
+        :rtype: str
+        """
+        data = imported_user.to_dict()
+        for key in ("entry_count", "in_hook", "old_user"):
+            data.pop(key, None)
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=repr).encode("UTF-8")
+        ).hexdigest()
+
+    def is_unchanged(self, imported_user, input_hash):  # type: (ImportUser, str) -> bool
+        """
+        Check if neither the input data of a user nor its LDAP object nor the
+        groups it is a member of have changed since the last import.
+        Unchanged users are stored in `self.unchanged_users`.
+
+        Changing the members of a group modifies the group, not the user, so
+        the entryCSN of the user is not enough to detect changed memberships.
+
+        :param ImportUser imported_user: ImportUser object from input
+        :param str input_hash: result of :py:meth:`get_input_hash()`
+        :return: whether the user can be skipped
+        :rtype: bool
+        """
+        if not imported_user.source_uid or not imported_user.record_uid:
+            return False
+        key = self._import_id_key(imported_user.source_uid, imported_user.record_uid)
+        entry = self.delta_state.get(key)
+        if (
+            not entry
+            or entry.input_hash != input_hash
+            or not entry.csn
+            or entry.csn != self._existing_user_csns.get(key)
+            or entry.groups_hash != self._existing_user_groups_hashes.get(key)
+        ):
+            return False
+        self.logger.info(
+            "Skipping unchanged user %s (source_uid:%s record_uid:%s).",
+            entry.name,
+            imported_user.source_uid,
+            imported_user.record_uid,
+        )
+        self._new_delta_state[key] = entry
+        user_dict = imported_user.to_dict()
+        user_dict.update({"name": entry.name, "action": "U"})
+        self.unchanged_users[imported_user.__class__.__name__].append(user_dict)
+        return True
+
+    def _update_delta_state(self, user, input_hash):  # type: (ImportUser, str) -> None
+        if self.dry_run:
+            return
+        key = self._import_id_key(user.source_uid, user.record_uid)
+        csn = self.connection.get(user.dn, attr=["entryCSN"]).get("entryCSN", [b""])[0].decode("UTF-8")
+        group_dns = self.connection.searchDn(
+            "(&{}{})".format(DELTA_GROUPS_FILTER, filter_format("(uniqueMember=%s)", [user.dn]))
+        )
+        self._new_delta_state[key] = DeltaStateEntry(
+            input_hash, csn, user.name, self._get_groups_hash(group_dns)
+        )
+
+    def _get_config_hash(self):  # type: () -> str
+        config = {k: v for k, v in self.config.items() if k not in DELTA_VOLATILE_CONFIG_KEYS}
+        return hashlib.sha256(
+            json.dumps(
+                {"config": config, "hooks": self._get_hook_hashes()}, sort_keys=True, default=repr
+            ).encode("UTF-8")
+        ).hexdigest()
+
+    def _get_hook_hashes(self):  # type: () -> Dict[str, str]
+        """SHA-256 hashes of the Python hook files of the import and of the school models."""
+        res = {}
+        for path in (
+            self.config.get("hooks_dir_pyhook", "/usr/share/ucs-school-import/pyhooks"),
+            PYHOOKS_PATH,
+        ):
+            try:
+                filenames = sorted(os.listdir(path))
+            except OSError:
+                continue
+            for filename in filenames:
+                if filename.endswith(".py"):
+                    filename = os.path.join(path, filename)
+                    with open(filename, "rb") as fp:
+                        res[filename] = hashlib.sha256(fp.read()).hexdigest()
+        return res
+
+    def reserve_name_counters(self, imported_users):  # type: (List[ImportUser]) -> None
+        """
+        Pre-pass over the users to create: count how often the counter of
+        each username base will be raised, so the storage backend of the
+        username handler can reserve all of them at once.
+
+        Only users missing in the index of :py:meth:`prefetch_existing_users()`
+        are considered new. The username is created from the scheme on a
+        copy of the user, after the same preparation :py:meth:`ImportUser.prepare_all()`
+        runs before :py:meth:`ImportUser.make_username()`, so the users themselves are
+        not changed.
+
+        :param imported_users: ImportUser objects
+        :type imported_users: :func:`list`
+        :return: None
+        """
+        if self.dry_run or self.existing_users is None:
+            return
+        counts = defaultdict(lambda: defaultdict(int))  # type: Dict[UsernameHandler, Dict[str, int]]
+        for imported_user in imported_users:
+            if imported_user.action == "D" or imported_user.name:
+                continue
+            if imported_user.udm_properties.get("username") or "username" not in self.config["scheme"]:
+                continue
+            key = self._import_id_key(imported_user.source_uid or "", imported_user.record_uid or "")
+            if key in self._existing_import_ids:
+                continue
+            try:
+                username_handler = imported_user.username_handler
+                scheme = imported_user.username_scheme
+                if not username_handler.replacement_variable_pattern.search(scheme):
+                    continue
+                user = copy.deepcopy(imported_user)
+                user.prepare_uids()
+                user.prepare_udm_properties()
+                user.prepare_username_dependencies()
+                name = user.format_from_scheme("username", scheme)
+                name_base = username_handler.get_counter_name_base(name)
+            except Exception as exc:
+                # errors will be handled when the user is actually created
+                self.logger.debug("Cannot determine username base of %s: %s", imported_user, exc)
+                continue
+            if name_base:
+                counts[username_handler][name_base] += 1
+        for username_handler, name_bases in counts.items():
+            self.logger.info(
+                "Reserving username counters for %d name bases (%d users)...",
+                len(name_bases),
+                sum(name_bases.values()),
+            )
+            for name_base, count in name_bases.items():
+                username_handler.storage_backend.reserve(name_base, count)
+
+    def load_uniqueness_indexes(self):  # type: () -> None
+        """
+        Load the username and email uniqueness indexes completely, if that is
+        cheaper than searching LDAP for the names of each user.
+        """
+        if UNIQUENESS in self.config.get("skip_tests", []):
+            return
+        if self.imported_users_len >= FULL_LOAD_THRESHOLD:
+            get_username_index().load(self.connection)
+            get_email_index().load(self.connection)
+
+    def release_name_counters(self):  # type: () -> None
+        """Give back reserved, but unused username and email counters."""
+        a_user = self.factory.make_import_user([])
+        handlers = list(a_user._username_handler_cache.values())
+        handlers.extend(a_user._unique_email_handler_cache.values())
+        for handler in handlers:
+            handler.storage_backend.release()
 
     def find_importuser_in_ldap(self, import_user):  # type: (ImportUser) -> ImportUser
         """
         Fetch fresh :py:class:`ImportUser` object from LDAP.
 
+        If :py:meth:`prefetch_existing_users()` has run, users that do not
+        exist are detected without searching LDAP, and existing users are
+        opened directly by their DN.
+
         :param ImportUser import_user: ImportUser object to use as reference for search
         :return: fresh ImportUser object
         :rtype: ImportUser
@@ -297,6 +976,24 @@ class UserImport(object):
         :raises WrongUserType: if the user in LDAP is not of the same type as the `import_user` object
         """
         try:
+            if self.existing_users is not None and import_user.source_uid and import_user.record_uid:
+                key = self._import_id_key(import_user.source_uid, import_user.record_uid)
+                if key not in self._existing_import_ids:
+                    raise NoObject(
+                        "No {} with source_uid={!r} and record_uid={!r} found.".format(
+                            self.config.get("user_role", "user") or "User",
+                            import_user.source_uid,
+                            import_user.record_uid,
+                        )
+                    )
+                if key in self._existing_user_dns:
+                    try:
+                        return import_user.from_dn(
+                            self._existing_user_dns[key], None, self.connection
+                        )
+                    except noObject:
+                        self.logger.debug("User %r has moved or vanished since prefetch.", key)
+                # exists, but with a different role or in another school: let the search decide
             return import_user.get_by_import_id(
                 self.connection, import_user.source_uid, import_user.record_uid
             )
@@ -368,6 +1065,7 @@ class UserImport(object):
                     imported_user.school,
                 )
                 user = self.school_move(imported_user, user)
+                self._update_existing_users_index(user)
         user.update(imported_user)
         if (
             user.disabled != "0"
@@ -402,20 +1100,14 @@ class UserImport(object):
         """
         Get IDs of existing users.
 
+        Uses the result of :py:meth:`prefetch_existing_users()` if it has run.
+
         :return: list of tuples: [(source_uid, record_uid), ..]
         :rtype: list(tuple(str, str))
         """
-        attr = ["ucsschoolSourceUID", "ucsschoolRecordUID"]
-        filter_s = self.get_existing_users_search_filter()
-        self.logger.debug("Searching with filter=%r", filter_s)
-        ucs_ldap_users = self.connection.search(filter_s, attr=attr)
-        return [
-            (
-                lu[1]["ucsschoolSourceUID"][0].decode("utf-8"),
-                lu[1]["ucsschoolRecordUID"][0].decode("utf-8"),
-            )
-            for lu in ucs_ldap_users
-        ]
+        if self.existing_users is not None:
+            return list(self.existing_users)
+        return list(self._search_import_ids(self.get_existing_users_search_filter()))
 
     def detect_users_to_delete(self):  # type: () -> List[Tuple[str, str, List[str]]]
         """
@@ -431,15 +1123,10 @@ class UserImport(object):
                 "------ Looking only for users with action='D' (no_delete=%r) ------",
                 self.config["no_delete"],
             )
-            return [
-                (user.source_uid, user.record_uid, user.input_data)
-                for user in self.imported_users
-                if user.action == "D"
-            ]
+            return list(self._users_marked_for_deletion)
 
         ucs_user_ids = set(self.get_ids_of_existing_users())
-        imported_user_ids = {(iu.source_uid, iu.record_uid) for iu in self.imported_users}
-        users_to_delete = ucs_user_ids - imported_user_ids
+        users_to_delete = ucs_user_ids - self.imported_user_ids
         users_to_delete = [(u[0], u[1], []) for u in users_to_delete]
         self.logger.debug("users_to_delete=%r", users_to_delete)
         return users_to_delete
@@ -454,6 +1141,9 @@ class UserImport(object):
         * :py:class:`UcsSchoolImportErrors` are stored in `self.errors` (with failed
             :py:class:`ImportUser` object in `error.import_user`).
         * To add or change a deletion strategy overwrite :py:meth:`do_delete()`.
+        * Users are loaded from LDAP in batches of :py:attr:`deletion_batch_size`.
+            With the configuration key `parallelism` > 1, :py:meth:`do_delete()` is
+            executed concurrently by that many threads.
 
         :param users: :func:`list` of tuples: [(source_uid, record_uid, input_data), ..]
         :type users: :func:`list`
@@ -462,66 +1152,142 @@ class UserImport(object):
         """
         self.logger.info("------ Deleting %d users... ------", len(users))
         a_user = self.factory.make_import_user([])
-        for num, (source_uid, record_uid, input_data) in enumerate(users, start=1):
-            percentage = 10 * num // len(users)  # 0% - 10%
-            self.progress_report(
-                description="Deleting users: {}.".format(percentage),
-                percentage=int(percentage),
-                done=num,
-                total=len(users),
-                errors=len(self.errors),
+        # additional_udm_properties are loaded from ldap, so that remove hooks can
+        # work with them the same way as other hooks. For "A" and "M" operations,
+        # udm_properties are set by the reader class.
+        additional_udm_properties = self.reader.get_imported_udm_property_names(a_user)
+        parallelism = self.config.get("parallelism", 1)
+        executor = None
+        if parallelism > 1:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=parallelism, initializer=self._init_deletion_worker
             )
+        # set on the first exception (e.g. TooManyErrors), so queued jobs are skipped
+        stop = threading.Event()
+
+        def delete(job):  # type: (Tuple[ImportUser, int, int]) -> Optional[Dict[str, Any]]
             try:
-                # additional_udm_properties are loaded from ldap, so that remove hooks can
-                # work with them the same way as other hooks. For "A" and "M" operations,
-                # udm_properties are set by the reader class.
-                additional_udm_properties = self.reader.get_imported_udm_property_names(a_user)
-                user = a_user.get_by_import_id(
-                    self.connection,
-                    source_uid,
-                    record_uid,
-                    udm_properties=additional_udm_properties,
-                )
-                user.action = "D"  # mark for logging/csv-output purposes
-                user.input_data = input_data  # most likely empty list
-            except NoObject as exc:
-                self.logger.error(
-                    "Cannot delete non existing user with source_uid=%r, record_uid=%r input_data=%r: "
-                    "%s",
-                    source_uid,
-                    record_uid,
-                    input_data,
-                    exc,
-                )
-                continue
-            try:
-                success = self.do_delete(user)
-                if success:
-                    self.logger.info(
-                        "Success deleting %d/%d %r (source_uid:%s record_uid: %s).",
-                        num,
-                        len(users),
-                        user.name,
-                        user.source_uid,
-                        user.record_uid,
-                    )
+                return self._delete_user(*job, stop=stop)
+            except BaseException:
+                stop.set()
+                raise
+
+        try:
+            for batch_start in range(0, len(users), self.deletion_batch_size):
+                batch = users[batch_start : batch_start + self.deletion_batch_size]
+                to_delete = self._load_users_to_delete(a_user, batch, additional_udm_properties)
+                jobs = [(user, batch_start + num, len(users)) for num, user in to_delete]
+                if executor:
+                    results = executor.map(delete, jobs)
                 else:
-                    raise DeletionError(
-                        "Error deleting user '{}' (source_uid:{} record_uid: {}), has probably already "
-                        "been deleted.".format(user.name, user.source_uid, user.record_uid),
-                        entry_count=user.entry_count,
-                        import_user=user,
-                    )
-                self.deleted_users[user.__class__.__name__].append(user.to_dict())
-            except UcsSchoolImportError as exc:
-                self.logger.exception("Error in entry #%d: %s", exc.entry_count, exc)
-                self._add_error(exc)
+                    results = (self._delete_user(*job) for job in jobs)
+                for (_num, user), user_dict in zip(to_delete, results):
+                    if user_dict:
+                        self.deleted_users[user.__class__.__name__].append(user_dict)
+                done = batch_start + len(batch)
+                # before creating and modifying users: 0% - 10%, after (streaming): 90% - 100%
+                percentage = (90 if self._streaming else 0) + 10 * done // len(users)
+                self.progress_report(
+                    description="Deleting users: {}.".format(percentage),
+                    percentage=int(percentage),
+                    done=done,
+                    total=len(users),
+                    errors=len(self.errors),
+                )
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
         self.logger.info(
             "------ Deleted %d users. ------",
             sum(map(len, self.deleted_users.values())),
         )
         return self.errors, self.deleted_users
 
+    def _load_users_to_delete(self, a_user, users, udm_properties):
+        # type: (ImportUser, List[Tuple[str, str, List[str]]], List[str]) -> List[Tuple[int, ImportUser]]
+        """
+        Load the users of one deletion batch from LDAP with a single search.
+
+        :param ImportUser a_user: ImportUser object used to access class methods
+        :param list users: tuples: [(source_uid, record_uid, input_data), ..]
+        :param list udm_properties: UDM properties to load into `udm_properties`
+        :return: list of tuples: [(number in batch, ImportUser), ..] of existing users
+        :rtype: list
+        """
+        loaded = a_user.get_by_import_ids(
+            self.connection,
+            [(source_uid, record_uid) for source_uid, record_uid, _input_data in users],
+            udm_properties=udm_properties,
+        )
+        res = []
+        for num, (source_uid, record_uid, input_data) in enumerate(users, start=1):
+            user = loaded.get((source_uid.lower(), record_uid.lower()))
+            if user is None:
+                # not found by the bulk search, try once more to get a precise error message
+                try:
+                    user = a_user.get_by_import_id(
+                        self.connection, source_uid, record_uid, udm_properties=udm_properties
+                    )
+                except NoObject as exc:
+                    self.logger.error(
+                        "Cannot delete non existing user with source_uid=%r, record_uid=%r "
+                        "input_data=%r: %s",
+                        source_uid,
+                        record_uid,
+                        input_data,
+                        exc,
+                    )
+                    continue
+            user.action = "D"  # mark for logging/csv-output purposes
+            user.input_data = input_data  # most likely empty list
+            res.append((num, user))
+        return res
+
+    def _init_deletion_worker(self):  # type: () -> None
+        if not self.dry_run:
+            # the read-only connection used in a dry-run can be shared
+            self._worker_data.connection, _pos = get_new_admin_connection()
+
+    def _delete_user(self, user, num, total, stop=None):
+        # type: (ImportUser, int, int, Optional[threading.Event]) -> Optional[Dict[str, Any]]
+        """
+        Delete a single user using :py:meth:`do_delete()`.
+
+        :param ImportUser user: user to delete
+        :param int num: number of user in deletion job (for logging)
+        :param int total: number of users in deletion job (for logging)
+        :param stop: if set, the user is not deleted (used to cancel queued jobs)
+        :type stop: threading.Event or None
+        :return: `user.to_dict()` if the user was deleted, else None
+        :rtype: dict or None
+        """
+        if stop is not None and stop.is_set():
+            return None
+        try:
+            with get_profiler().phase("delete"):
+                success = self.do_delete(user)
+            if success:
+                self.logger.info(
+                    "Success deleting %d/%d %r (source_uid:%s record_uid: %s).",
+                    num,
+                    total,
+                    user.name,
+                    user.source_uid,
+                    user.record_uid,
+                )
+            else:
+                raise DeletionError(
+                    "Error deleting user '{}' (source_uid:{} record_uid: {}), has probably already "
+                    "been deleted.".format(user.name, user.source_uid, user.record_uid),
+                    entry_count=user.entry_count,
+                    import_user=user,
+                )
+            return user.to_dict()
+        except UcsSchoolImportError as exc:
+            self.logger.exception("Error in entry #%d: %s", exc.entry_count, exc)
+            self._add_error(exc)
+        return None
+
     def school_move(self, imported_user, user):  # type: (ImportUser, ImportUser) -> ImportUser
         """
         Change users primary school.
@@ -532,7 +1298,8 @@ class UserImport(object):
         :rtype: ImportUser
         """
         self.logger.info("Moving %s from school %r to %r...", user, user.school, imported_user.school)
-        user = self.do_school_move(imported_user, user)
+        with get_profiler().phase("school move"):
+            user = self.do_school_move(imported_user, user)
         return user
 
     def do_school_move(self, imported_user, user):  # type: (ImportUser, ImportUser) -> ImportUser
@@ -728,12 +1495,13 @@ class UserImport(object):
             return True
 
     def log_stats(self):  # type: () -> str
-        """Log statistics about read, created, modified and deleted users."""
+        """Log statistics about read, created, modified, deleted and unchanged users."""
         self.logger.info("------ User import statistics ------")
         lines = ["Read users from input data: {}".format(self.imported_users_len)]
         cls_names = list(self.added_users)
         cls_names.extend(self.modified_users)
         cls_names.extend(self.deleted_users)
+        cls_names.extend(self.unchanged_users)
         cls_names = set(cls_names)
         columns_default = 4
         columns = self.ucr.get_int("ucsschool/import/log_stats/columns", columns_default)
@@ -770,6 +1538,18 @@ class UserImport(object):
                             [iu["name"] for iu in self.deleted_users[cls_name][i : i + columns]]
                         )
                     )
+            if self.delta_state is not None:
+                lines.append(
+                    "Unchanged {}: {}".format(cls_name, len(self.unchanged_users.get(cls_name, [])))
+                )
+                unchanged_users_len = len(self.unchanged_users[cls_name])
+                if unchanged_users_len <= allowed_user_print_cnt:
+                    for i in range(0, unchanged_users_len, columns):
+                        lines.append(
+                            "  {}".format(
+                                [iu["name"] for iu in self.unchanged_users[cls_name][i : i + columns]]
+                            )
+                        )
         lines.append("Errors: {}".format(len(self.errors)))
         if self.errors:
             username_width = max(
@@ -793,6 +1573,10 @@ class UserImport(object):
                         error,
                     )
                 )
+        profile_report = get_profiler().get_report()
+        if profile_report:
+            lines.append("Timing statistics (phases are nested, times must not be summed up):")
+            lines.extend(profile_report.splitlines())
         for line in lines:
             self.logger.info(line)
         self.logger.info("------ End of user import statistics ------")
@@ -805,8 +1589,10 @@ class UserImport(object):
         :raises TooManyErrors: if the number of countable exceptions exceeds the number of tolerable
             errors
         """
-        self.errors.append(exc)
-        if -1 < self.config["tolerate_errors"] < len([x for x in self.errors if x.is_countable]):
+        with self._lock:
+            self.errors.append(exc)
+            num_errors = len([x for x in self.errors if x.is_countable])
+        if -1 < self.config["tolerate_errors"] < num_errors:
             raise TooManyErrors(
                 "More than {} errors.".format(self.config["tolerate_errors"]),
                 self.errors,
@@ -829,3 +1615,4 @@ class UserImportData(object):
         self.added_users = user_import.added_users  # type: Dict[str, List[Dict[str, Any]]]
         self.modified_users = user_import.modified_users  # type: Dict[str, List[Dict[str, Any]]]
         self.deleted_users = user_import.deleted_users  # type: Dict[str, List[Dict[str, Any]]]
+        self.unchanged_users = user_import.unchanged_users  # type: Dict[str, List[Dict[str, Any]]]
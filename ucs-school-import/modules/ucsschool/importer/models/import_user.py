@@ -34,16 +34,29 @@
 import datetime
 import re
 import string
+import threading
 import warnings
 from collections import defaultdict, namedtuple
-from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Type, Union  # noqa: F401
+from typing import (  # noqa: F401
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import lazy_object_proxy
 from ldap.filter import filter_format
 from six import iteritems, string_types
 
 from ucsschool.lib.models.attributes import RecordUID, SourceUID, ValidationError
-from ucsschool.lib.models.base import NoObject, WrongObjectType
+from ucsschool.lib.models.base import NoObject, UnknownModel, WrongModel, WrongObjectType
 from ucsschool.lib.models.group import Group
 from ucsschool.lib.models.school import School
 from ucsschool.lib.models.user import Staff, Student, Teacher, TeachersAndStaff, User
@@ -56,6 +69,7 @@ from ucsschool.lib.roles import (
     role_staff,
     role_teacher,
 )
+import univention.admin.modules as udm_modules
 from univention.admin import property as uadmin_property
 from univention.admin.syntax import gid as gid_syntax
 from univention.admin.uexceptions import noProperty, valueError, valueInvalidSyntax
@@ -90,6 +104,8 @@ from ..factory import Factory
 from ..utils.format_pyhook import FormatPyHook
 from ..utils.import_pyhook import get_import_pyhooks
 from ..utils.ldap_connection import get_admin_connection, get_readonly_connection
+from ..utils.profiler import get_profiler, profiled
+from ..utils.uniqueness_index import UNIQUENESS, UniquenessTuple
 from ..utils.utils import get_ldap_mapping_for_udm_property
 
 if TYPE_CHECKING:
@@ -103,9 +119,10 @@ if TYPE_CHECKING:
 
 
 FunctionSignature = namedtuple("FunctionSignature", ["name", "args", "kwargs"])
-UsernameUniquenessTuple = namedtuple("UsernameUniquenessTuple", ["record_uid", "source_uid", "dn"])
+# scheme and names of the <properties> used in it, see ImportUser.compile_scheme():
+CompiledScheme = namedtuple("CompiledScheme", ["scheme", "dependencies"])
+UsernameUniquenessTuple = UniquenessTuple
 ALLOWED_CHARS_IN_SCHOOL_CLASS_NAME = set(string.digits + string.ascii_letters + " -._")
-UNIQUENESS = "uniqueness"
 
 
 class ImportUser(User):
@@ -133,6 +150,7 @@ class ImportUser(User):
         no_overwrite_attributes = ["mailPrimaryAddress", "uid"]
     User.logger.debug("Used no-overwrite-attributes: {}".format(no_overwrite_attributes))
     _unique_ids = defaultdict(dict)  # type: Dict[str, Dict[str, str]]
+    _uniqueness_lock = threading.RLock()  # guards _unique_ids in parallel imports
     factory = lazy_object_proxy.Proxy(lambda: Factory())  # type: DefaultUserImportFactory
     ucr = lazy_object_proxy.Proxy(lambda: ImportUser.factory.make_ucr())  # type: ConfigRegistry
     _reader = None
@@ -151,9 +169,12 @@ class ImportUser(User):
     )
     prop = uadmin_property("_replace")
     _all_school_names = None  # type: Iterable[str]
-    _all_usernames = {}  # type: Dict[str, UsernameUniquenessTuple]
     _attribute_udm_names = None  # type: Dict[str, str]
     _prop_regex = re.compile(r"<(.*?)(:.*?)*>")
+    _compiled_schemes = {}  # type: Dict[str, CompiledScheme]
+    _format_hooks = None  # type: Dict[str, List[Callable[..., Any]]]
+    _format_hook_dispatch = {}  # type: Dict[Tuple[str, str], List[Callable[..., Any]]]
+    _format_attribute_names = {}  # type: Dict[Type[ImportUser], Optional[Set[str]]]
     _prop_providers = {
         "birthday": "make_birthday",
         "expiration_date": "make_expiration_date",
@@ -249,6 +270,7 @@ class ImportUser(User):
             dry_run=self.config["dry_run"],
         )  # result is cached on the lib side
         meth_name = "{}_{}".format(hook_time, func_name)
+        profiler = get_profiler()
         try:
             for func in hooks.get(meth_name, []):
                 self.logger.debug(
@@ -258,14 +280,18 @@ class ImportUser(User):
                     func.__func__.__name__,
                     self,
                 )
-                func(self)
+                with profiler.phase(
+                    "pyhook {}.{}".format(func.__self__.__class__.__name__, func.__func__.__name__)
+                ):
+                    func(self)
         finally:
             self.in_hook = False
 
         if self.config["dry_run"]:
             return True
         else:
-            super(ImportUser, self).call_hooks(hook_time, func_name, lo)
+            with profiler.phase("legacy hooks {}".format(meth_name)):
+                super(ImportUser, self).call_hooks(hook_time, func_name, lo)
 
     def call_format_hook(self, prop_name, fields):  # type: (str, Dict[str, Any]) -> Dict[str, Any]
         """
@@ -276,12 +302,9 @@ class ImportUser(User):
         :return: manipulated dictionary
         :rtype: dict
         """
-        hooks = get_import_pyhooks(FormatPyHook)  # result is cached on the lib side
+        profiler = get_profiler()
         res = fields
-        for func in hooks.get("patch_fields_{}".format(self.role_sting), []):
-            if prop_name not in func.__self__.__class__.properties:
-                # ignore properties not in Hook.properties
-                continue
+        for func in self.get_format_hooks(self.role_sting, prop_name):
             self.logger.debug(
                 "Running patch_fields_%s hook %s for property name %r for user %s...",
                 self.role_sting,
@@ -289,9 +312,45 @@ class ImportUser(User):
                 prop_name,
                 self,
             )
-            res = func(prop_name, res)
+            with profiler.phase(
+                "pyhook {}.{}".format(func.__self__.__class__.__name__, func.__func__.__name__)
+            ):
+                res = func(prop_name, res)
         return res
 
+    @classmethod
+    def get_format_hooks(cls, role, prop_name):
+        # type: (str, str) -> List[Callable[[str, Dict[str, Any]], Dict[str, Any]]]
+        """
+        Get the format hook methods to run for a property.
+
+        The result is cached, so the hooks don't have to be filtered for
+        every user.
+
+        :param str role: role string of the user (`student`, `teacher` etc.)
+        :param str prop_name: the property to format
+        :return: `patch_fields_<role>` methods of FormatPyHooks that have `prop_name` in their
+            :py:attr:`properties`
+        :rtype: list
+        """
+        hooks = get_import_pyhooks(FormatPyHook)  # result is cached on the lib side
+        if hooks is not ImportUser._format_hooks:
+            # hooks have been (re)loaded
+            ImportUser._format_hook_dispatch = {}
+            ImportUser._format_hooks = hooks
+        key = (role, prop_name)
+        try:
+            return ImportUser._format_hook_dispatch[key]
+        except KeyError:
+            funcs = [
+                func
+                for func in hooks.get("patch_fields_{}".format(role), [])
+                # ignore properties not in Hook.properties
+                if prop_name in func.__self__.__class__.properties
+            ]
+            ImportUser._format_hook_dispatch[key] = funcs
+            return funcs
+
     def change_school(self, school, lo):  # type: (str, LoType) -> bool
         """
         Change primary school of user.
@@ -311,11 +370,9 @@ class ImportUser(User):
         old_dn = self.old_dn
         res = super(ImportUser, self).change_school(school, lo)
         if res and UNIQUENESS not in self.config.get("skip_tests", []):
-            # rewrite _unique_ids and _all_usernames, replacing old DN with new DN
+            # rewrite _unique_ids and uniqueness indexes, replacing old DN with new DN
             self._unique_ids_replace_dn(old_dn, self.dn)
-            self._all_usernames[self.name] = UsernameUniquenessTuple(
-                self.record_uid, self.source_uid, self.dn
-            )
+            self._update_uniqueness_indexes()
         return res
 
     @classmethod
@@ -380,9 +437,7 @@ class ImportUser(User):
                 lo, validate, check_password_policies=check_password_policies
             )
         if UNIQUENESS not in self.config.get("skip_tests", []):
-            self._all_usernames[self.name] = UsernameUniquenessTuple(
-                self.record_uid, self.source_uid, self.dn
-            )
+            self._update_uniqueness_indexes()
         return res
 
     def create_without_hooks_roles(self, lo):  # type: (LoType) -> None
@@ -457,6 +512,57 @@ class ImportUser(User):
                     )
                 )
 
+    @classmethod
+    def get_by_import_ids(cls, connection, import_ids, udm_properties=None):
+        # type: (LoType, Iterable[Tuple[str, str]], Optional[Iterable]) -> Dict[Tuple[str, str], ImportUser]  # noqa: E501
+        """
+        Retrieve several ImportUsers with a single LDAP search.
+
+        In contrast to :py:meth:`get_by_import_id()` users that cannot be
+        found are silently missing in the result.
+
+        :param univention.admin.uldap.access connection: uldap object
+        :param import_ids: tuples of source DB identifier and source record identifier
+        :type import_ids: iterable(tuple(str, str))
+        :param iterable udm_properties: list of udm attributes to load into self.udm_properties
+        :return: mapping of lowercased `(source_uid, record_uid)` to objects of :py:class:`ImportUser`
+            subclasses loaded from LDAP
+        :rtype: dict
+        """
+        id_filters = [
+            filter_format("(&(ucsschoolSourceUID=%s)(ucsschoolRecordUID=%s))", (source_uid, record_uid))
+            for source_uid, record_uid in import_ids
+            if source_uid and record_uid
+        ]
+        if not id_filters:
+            return {}
+        cls.init_udm_module(connection)
+        udm_filter = cls._meta.udm_filter or ""
+        if udm_filter and not udm_filter.startswith("("):
+            udm_filter = "({})".format(udm_filter)
+        filter_s = "(&{}{}(|{}))".format(
+            udm_filter, cls.get_ldap_filter_for_user_role(), "".join(id_filters)
+        )
+        res = {}  # type: Dict[Tuple[str, str], ImportUser]
+        for udm_obj in udm_modules.lookup(
+            cls._meta.udm_module,
+            None,
+            connection,
+            scope="sub",
+            base=ucr.get("ldap/base"),
+            filter=str(filter_s),
+        ):
+            try:
+                import_obj = cls.from_udm_obj(udm_obj, None, connection)
+            except (UnknownModel, WrongModel) as exc:
+                cls.logger.warning("Ignoring %r: %s", udm_obj.dn, exc)
+                continue
+            if udm_properties:
+                for udm_property in udm_properties:
+                    import_obj.udm_properties[udm_property] = udm_obj[udm_property]
+            res[(import_obj.source_uid.lower(), import_obj.record_uid.lower())] = import_obj
+        return res
+
     def deactivate(self):  # type: () -> None
         """Deactivate user account. Caller must run modify()."""
         self.disabled = "1"
@@ -608,6 +714,7 @@ class ImportUser(User):
         assert not (self.config["dry_run"] and value == cn_admin_dn)
         self._lo = value
 
+    @profiled("prepare_all")
     def prepare_all(self, new_user=False):  # type: (Optional[bool]) -> None
         """
         Necessary preparation to modify a user in UCS.
@@ -627,11 +734,7 @@ class ImportUser(User):
         :param bool new_user: if a password should be created
         :return: None
         """
-        self.make_firstname()
-        self.make_lastname()
-        self.make_school()
-        self.make_schools()
-        self.make_ucsschool_roles()
+        self.prepare_username_dependencies()
         self.make_username()
         if new_user:
             self.make_password()
@@ -641,6 +744,19 @@ class ImportUser(User):
         self.make_email()
         self.make_expiration_date()
 
+    def prepare_username_dependencies(self):  # type: () -> None
+        """
+        Run the make_* functions for the Attributes that are created before the
+        username in :py:meth:`prepare_attributes()`.
+
+        :return: None
+        """
+        self.make_firstname()
+        self.make_lastname()
+        self.make_school()
+        self.make_schools()
+        self.make_ucsschool_roles()
+
     def prepare_udm_properties(self):  # type: () -> None
         """
         Create self.udm_properties from schemes configured in config["scheme"].
@@ -1065,15 +1181,12 @@ class ImportUser(User):
             res = super(ImportUser, self).modify(
                 lo, validate, move_if_necessary, check_password_policies=True
             )
-        if (
-            self.old_user
-            and self.old_user.name != self.name
-            and UNIQUENESS not in self.config.get("skip_tests", [])
-        ):
-            del self._all_usernames[self.old_user.name]
-            self._all_usernames[self.name] = UsernameUniquenessTuple(
-                self.record_uid, self.source_uid, self.dn
-            )
+        if self.old_user and UNIQUENESS not in self.config.get("skip_tests", []):
+            if self.old_user.name != self.name:
+                self.username_handler.uniqueness_index.remove(self.old_user.name)
+            if self.old_user.email and self.old_user.email.lower() != (self.email or "").lower():
+                self.unique_email_handler.uniqueness_index.remove(self.old_user.email)
+            self._update_uniqueness_indexes()
         return res
 
     def modify_without_hooks(self, lo, validate=True, move_if_necessary=None):
@@ -1172,6 +1285,7 @@ class ImportUser(User):
         else:
             return super(ImportUser, self).remove_without_hooks(lo)
 
+    @profiled("validate")
     def validate(self, lo, validate_unlikely_changes=False, check_username=False, check_name=True):
         # type: (LoType, Optional[bool], Optional[bool]) -> None
         """
@@ -1261,37 +1375,38 @@ class ImportUser(User):
 
         # don't run uniqueness checks from within a post_move hook
         if not self.in_hook and UNIQUENESS not in skip_tests:
-            if self._unique_ids["record_uid"].get(self.record_uid, self.dn) != self.dn:
-                raise UniqueIdError(
-                    "record_uid {!r} has already been used in this import by {!r}.".format(
-                        self.record_uid, self._unique_ids["record_uid"][self.record_uid]
-                    ),
-                    entry_count=self.entry_count,
-                    import_user=self,
-                )
-            self._unique_ids["record_uid"][self.record_uid] = self.dn
-
-            if check_username:
-                if self._unique_ids["name"].get(self.name, self.dn) != self.dn:
+            with self._uniqueness_lock:
+                if self._unique_ids["record_uid"].get(self.record_uid, self.dn) != self.dn:
                     raise UniqueIdError(
-                        "Username {!r} has already been used in this import by {!r}.".format(
-                            self.name, self._unique_ids["record_uid"][self.name]
+                        "record_uid {!r} has already been used in this import by {!r}.".format(
+                            self.record_uid, self._unique_ids["record_uid"][self.record_uid]
                         ),
                         entry_count=self.entry_count,
                         import_user=self,
                     )
-                self._unique_ids["name"][self.name] = self.dn
-
-            if self.email:
-                if self._unique_ids["email"].get(self.email, self.dn) != self.dn:
-                    raise UniqueIdError(
-                        "Email address {!r} has already been used in this import by {!r}.".format(
-                            self.email, self._unique_ids["email"][self.email]
-                        ),
-                        entry_count=self.entry_count,
-                        import_user=self,
-                    )
-                self._unique_ids["email"][self.email] = self.dn
+                self._unique_ids["record_uid"][self.record_uid] = self.dn
+
+                if check_username:
+                    if self._unique_ids["name"].get(self.name, self.dn) != self.dn:
+                        raise UniqueIdError(
+                            "Username {!r} has already been used in this import by {!r}.".format(
+                                self.name, self._unique_ids["record_uid"][self.name]
+                            ),
+                            entry_count=self.entry_count,
+                            import_user=self,
+                        )
+                    self._unique_ids["name"][self.name] = self.dn
+
+                if self.email:
+                    if self._unique_ids["email"].get(self.email, self.dn) != self.dn:
+                        raise UniqueIdError(
+                            "Email address {!r} has already been used in this import by {!r}.".format(
+                                self.email, self._unique_ids["email"][self.email]
+                            ),
+                            entry_count=self.entry_count,
+                            import_user=self,
+                        )
+                    self._unique_ids["email"][self.email] = self.dn
 
         if self.email:
             # email_pattern:
@@ -1344,31 +1459,17 @@ class ImportUser(User):
         self.check_schools(lo)
 
         if UNIQUENESS not in skip_tests:
-            if not self._all_usernames:
-                # fetch usernames of all users only once per import job
-                # its faster to filter out computer names in Python than in LDAP
-                # (and we have to loop over the query result anyway)
-                self.__class__._all_usernames = {
-                    attr["uid"][0].decode("UTF-8"): UsernameUniquenessTuple(
-                        attr.get("ucsschoolRecordUID", [b""])[0].decode("UTF-8") or None,
-                        attr.get("ucsschoolSourceUID", [b""])[0].decode("UTF-8") or None,
-                        dn,
-                    )
-                    for dn, attr in lo.search(
-                        "objectClass=posixAccount",
-                        attr=["uid", "ucsschoolRecordUID", "ucsschoolSourceUID"],
-                    )
-                    if not attr["uid"][0].endswith(b"$")
-                }
-            self._check_username_uniqueness()
+            self._check_username_uniqueness(lo)
+            self._check_email_uniqueness(lo)
 
-    def _check_username_uniqueness(self):  # type: () -> None
+    def _check_username_uniqueness(self, lo):  # type: (LoType) -> None
         """
         Check that :py:attr:`self.name` is not already in use by another user.
 
+        :param univention.admin.uldap.access lo: LDAP connection object
         :raises UniqueIdError: if username is already taken by another user
         """
-        uut = self._all_usernames.get(self.name)
+        uut = self.username_handler.uniqueness_index.get(self.name, lo)
         if uut and (uut.record_uid != self.record_uid or uut.source_uid != self.source_uid):
             raise UniqueIdError(
                 "Username {!r} is already in use by {!r} (source_uid: {!r}, record_uid: {!r}).".format(
@@ -1376,6 +1477,34 @@ class ImportUser(User):
                 )
             )
 
+    def _check_email_uniqueness(self, lo):  # type: (LoType) -> None
+        """
+        Check that :py:attr:`self.email` is not already in use by another user.
+
+        :param univention.admin.uldap.access lo: LDAP connection object
+        :raises UniqueIdError: if email address is already taken by another user
+        """
+        if not self.email:
+            return
+        uut = self.unique_email_handler.uniqueness_index.get(self.email, lo)
+        if (
+            uut
+            and uut.dn not in (self.dn, self.old_dn)
+            and (uut.record_uid != self.record_uid or uut.source_uid != self.source_uid)
+        ):
+            raise UniqueIdError(
+                "Email address {!r} is already in use by {!r} (source_uid: {!r}, record_uid: {!r})."
+                "".format(self.email, uut.dn, uut.source_uid, uut.record_uid)
+            )
+
+    def _update_uniqueness_indexes(self):  # type: () -> None
+        """Store username and email address of this user in the uniqueness indexes."""
+        self.username_handler.uniqueness_index.add(self.name, self.record_uid, self.source_uid, self.dn)
+        if self.email:
+            self.unique_email_handler.uniqueness_index.add(
+                self.email, self.record_uid, self.source_uid, self.dn
+            )
+
     def set_purge_timestamp(self, ts):  # type: (str) -> None
         """
         Set the date at which the account whould be deleted by the
@@ -1471,9 +1600,7 @@ class ImportUser(User):
         :param dict kwargs: additional data to use for formatting
         :return: None
         """
-        no_brackets = scheme
-        props_used_in_scheme = [x[0] for x in self._prop_regex.findall(no_brackets) if x[0]]
-        for prop_used_in_scheme in props_used_in_scheme:
+        for prop_used_in_scheme in self.compile_scheme(scheme).dependencies:
             if (
                 hasattr(self, prop_used_in_scheme)
                 and getattr(self, prop_used_in_scheme)
@@ -1539,17 +1666,27 @@ class ImportUser(User):
         :return: formatted string
         :rtype: str
         """
+        compiled_scheme = self.compile_scheme(scheme)
         self.solve_format_dependencies(prop_name, scheme, **kwargs)
-        if self.input_data:
-            all_fields = self.reader.get_data_mapping(self.input_data)
+        attribute_names = self._get_format_attribute_names()
+        if (
+            attribute_names is None
+            or self.get_format_hooks(self.role_sting, prop_name)
+            or not self._has_format_fields(compiled_scheme.dependencies, attribute_names, kwargs)
+        ):
+            # hooks may need all data, fields like "display_name" are only computed by to_dict()
+            if self.input_data:
+                all_fields = self.reader.get_data_mapping(self.input_data)
+            else:
+                all_fields = {}
+            all_fields.update(self.to_dict())
+            all_fields.update(self.udm_properties)
+            if "username" not in all_fields:
+                all_fields["username"] = all_fields["name"]
+            all_fields.update(kwargs)
+            all_fields = self.call_format_hook(prop_name, all_fields)
         else:
-            all_fields = {}
-        all_fields.update(self.to_dict())
-        all_fields.update(self.udm_properties)
-        if "username" not in all_fields:
-            all_fields["username"] = all_fields["name"]
-        all_fields.update(kwargs)
-        all_fields = self.call_format_hook(prop_name, all_fields)
+            all_fields = self._get_format_fields(compiled_scheme.dependencies, attribute_names, kwargs)
 
         res = self.prop._replace(scheme, all_fields)
         if not res:
@@ -1560,6 +1697,95 @@ class ImportUser(User):
             )
         return res
 
+    @classmethod
+    def compile_scheme(cls, scheme):  # type: (str) -> CompiledScheme
+        """
+        Parse a scheme once and cache the result for all users.
+
+        :param str scheme: scheme as used by :py:meth:`format_from_scheme()`
+        :return: the scheme and the names of the <properties> used in it, in order of usage
+        :rtype: CompiledScheme
+        """
+        try:
+            return cls._compiled_schemes[scheme]
+        except KeyError:
+            compiled_scheme = CompiledScheme(
+                scheme, tuple(x[0] for x in cls._prop_regex.findall(scheme) if x[0])
+            )
+            cls._compiled_schemes[scheme] = compiled_scheme
+            return compiled_scheme
+
+    @classmethod
+    def _get_format_attribute_names(cls):  # type: () -> Optional[Set[str]]
+        """
+        Names of the entries of :py:meth:`to_dict()` that are read directly
+        from the object by :py:meth:`_get_format_fields()`.
+
+        :return: names of Attributes and additional properties or None if the class overwrites
+            :py:meth:`to_dict()` or :py:meth:`call_format_hook()`
+        :rtype: set or None
+        """
+        try:
+            return ImportUser._format_attribute_names[cls]
+        except KeyError:
+            if cls.to_dict is ImportUser.to_dict and cls.call_format_hook is ImportUser.call_format_hook:
+                names = {name for name, attr in cls._attributes.items() if not attr.internal}
+                names.update(cls._additional_props)
+                # to_dict() returns them normalized from the group objects
+                names.difference_update(("school_classes", "workgroups"))
+            else:
+                names = None
+            ImportUser._format_attribute_names[cls] = names
+            return names
+
+    def _has_format_fields(self, field_names, attribute_names, kwargs):
+        # type: (Iterable[str], Set[str], Dict[str, Any]) -> bool
+        """
+        Whether :py:meth:`_get_format_fields()` can find all fields of a scheme.
+        Other fields (e.g. `display_name` or columns of the input data) require
+        the complete mapping.
+
+        :param field_names: names of the <properties> used in the scheme
+        :param set attribute_names: result of :py:meth:`_get_format_attribute_names()`
+        :param dict kwargs: additional data to use for formatting
+        :rtype: bool
+        """
+        return all(
+            name in kwargs
+            or name in self.udm_properties
+            or name in attribute_names
+            or name == "username"
+            for name in field_names
+        )
+
+    def _get_format_fields(self, field_names, attribute_names, kwargs):
+        # type: (Iterable[str], Set[str], Dict[str, Any]) -> Dict[str, Any]
+        """
+        Get only the data required for a scheme. Values are looked up with the
+        same precedence as in :py:meth:`format_from_scheme()`: kwargs,
+        udm_properties, Attributes (and input data for `username`). Use only if
+        :py:meth:`_has_format_fields()` returned `True`.
+
+        :param field_names: names of the <properties> used in the scheme
+        :param set attribute_names: result of :py:meth:`_get_format_attribute_names()`
+        :param dict kwargs: additional data to use for formatting
+        :return: mapping of field name to value
+        :rtype: dict
+        """
+        res = {}
+        for name in field_names:
+            if name in kwargs:
+                res[name] = kwargs[name]
+            elif name in self.udm_properties:
+                res[name] = self.udm_properties[name]
+            elif name in attribute_names:
+                res[name] = getattr(self, name)
+            elif name == "username":
+                # from the input data or else "name"
+                data_mapping = self.reader.get_data_mapping(self.input_data) if self.input_data else {}
+                res[name] = data_mapping.get("username", self.udm_properties.get("name", self.name))
+        return res
+
     @classmethod
     def get_class_for_udm_obj(cls, udm_obj, school):
         # type: (UdmObjectType, str) -> Union[None, Type["ImportUser"]]
@@ -40,6 +40,7 @@ from ..factory import Factory
 from ..utils.import_pyhook import run_import_pyhooks
 from ..utils.ldap_connection import get_admin_connection, get_readonly_connection
 from ..utils.post_read_pyhook import PostReadPyHook
+from ..utils.profiler import get_profiler
 
 if TYPE_CHECKING:
     from ..models.import_user import ImportUser  # noqa: F401
@@ -81,8 +82,10 @@ class BaseReader(object):
         :return: ImportUser
         :rtype: ImportUser
         """
+        profiler = get_profiler()
         while True:
-            input_dict = next(self.import_users)
+            with profiler.phase("read entry"):
+                input_dict = next(self.import_users)
             self.logger.debug("Input %d: %r -> %r", self.entry_count, self.input_data, input_dict)
             try:
                 run_import_pyhooks(
@@ -94,11 +97,12 @@ class BaseReader(object):
                     "Skipping input line %d as requested by PostReadPyHook: %s", self.entry_count, exc
                 )
 
-        cur_user_roles = self.get_roles(input_dict)
-        cur_import_user = self.map(input_dict, cur_user_roles)
-        cur_import_user.entry_count = self.entry_count
-        cur_import_user.input_data = self.input_data
-        cur_import_user.prepare_uids()
+        with profiler.phase("map entry"):
+            cur_user_roles = self.get_roles(input_dict)
+            cur_import_user = self.map(input_dict, cur_user_roles)
+            cur_import_user.entry_count = self.entry_count
+            cur_import_user.input_data = self.input_data
+            cur_import_user.prepare_uids()
         return cur_import_user
 
     next = __next__  # py 2
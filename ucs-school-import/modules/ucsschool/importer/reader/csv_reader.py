@@ -32,6 +32,7 @@
 """CSV reader for CSV files using the new import format."""
 
 import codecs
+import re
 import sys
 from csv import Error as CsvError, Sniffer, reader as csv_reader
 from io import IOBase
@@ -64,6 +65,7 @@ from .base_reader import BaseReader
 
 if TYPE_CHECKING:
     from csv import Dialect  # noqa: F401
+    from logging import Logger  # noqa: F401
 
     from ..models.import_user import ImportUser  # noqa: F401
 
@@ -73,6 +75,9 @@ class UnsupportedEncodingError(Exception):
         super().__init__(message)
 
 
+_non_ascii_bytes_regex = re.compile(b"[\x80-\xff]")
+
+
 def py3_decode(data, encoding):  # type: (Union[str, bytes], str) -> str
     return data.decode(encoding) if PY3 and isinstance(data, bytes) else data
 
@@ -93,6 +98,7 @@ class CsvReader(BaseReader):
     _csv_roles_value = "__role"  # mapping value, so column will be used as role
 
     encoding = "utf-8"
+    encoding_detection_size = 1024 * 1024  # bytes read to detect the encoding in the fast reader mode
 
     def __init__(self, filename, header_lines=0, **kwargs):  # type: (str, Optional[int], **Any) -> None
         """
@@ -106,7 +112,8 @@ class CsvReader(BaseReader):
         univention.admin.modules.init(self.lo, self.position, usersmod)
 
     @staticmethod
-    def get_encoding(filename_or_file, logger=None):  # type: (Union[str, BinaryIO]) -> str
+    def get_encoding(filename_or_file, logger=None, max_bytes=None):
+        # type: (Union[str, BinaryIO], Optional[Logger], Optional[int]) -> str
         """
         Get encoding of file ``filename_or_file``.
 
@@ -114,6 +121,9 @@ class CsvReader(BaseReader):
 
         :param filename_or_file: filename or open file
         :type filename_or_file: str or file
+        :param logging.Logger logger: logger to write debug information to
+        :param int max_bytes: if set, detect the encoding from the beginning of the file instead of
+            reading it completely, see :py:meth:`_read_encoding_sample()`
         :return: encoding of filename_or_file
         :rtype: str
         """
@@ -124,10 +134,10 @@ class CsvReader(BaseReader):
 
         if isinstance(filename_or_file, string_types):
             with open(filename_or_file, "rb") as fp:
-                txt = fp.read()
+                txt = CsvReader._read_encoding_sample(fp, max_bytes)
         elif isinstance(filename_or_file, FileType):
             old_pos = filename_or_file.tell()
-            txt = filename_or_file.read()
+            txt = CsvReader._read_encoding_sample(filename_or_file, max_bytes)
             filename_or_file.seek(old_pos)
         else:
             raise ValueError(
@@ -178,6 +188,45 @@ class CsvReader(BaseReader):
 
         return encoding
 
+    @staticmethod
+    def _read_encoding_sample(fp, max_bytes=None):  # type: (BinaryIO, Optional[int]) -> bytes
+        """
+        Read the data used by :py:meth:`get_encoding()` to detect the encoding.
+
+        If `max_bytes` is set, only the first `max_bytes` bytes (cut at the last
+        line break, so no multibyte character is split) are returned. If those
+        contain only ASCII characters, the first line(s) with non-ASCII
+        characters are searched for in the rest of the file (without keeping
+        it in memory), as an ASCII prefix says nothing about the encoding of
+        the remaining file.
+
+        :param file fp: file opened in binary mode
+        :param int max_bytes: maximum sample size, read whole file if not set
+        :return: sample of the file content
+        :rtype: bytes
+        """
+        if not max_bytes:
+            return fp.read()
+        txt = fp.read(max_bytes)
+        if len(txt) < max_bytes:
+            return txt
+        if txt.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return txt[: len(txt) // 2 * 2]
+        if _non_ascii_bytes_regex.search(txt):
+            return txt[: txt.rfind(b"\n") + 1] or txt
+        rest = txt[txt.rfind(b"\n") + 1 :]  # incomplete last line
+        while True:
+            chunk = fp.read(max_bytes)
+            if not chunk:
+                return txt
+            chunk = rest + chunk
+            match = _non_ascii_bytes_regex.search(chunk)
+            if match:
+                start = chunk.rfind(b"\n", 0, match.start()) + 1
+                end = chunk.rfind(b"\n") + 1
+                return chunk[start:end] if end > match.start() else chunk[start:]
+            rest = chunk[chunk.rfind(b"\n") + 1 :]
+
     def get_dialect(self, fp, encoding):  # type: (BinaryIO, str) -> Type[Dialect]
         """
         Overwrite me to force a certain CSV dialect.
@@ -194,6 +243,12 @@ class CsvReader(BaseReader):
         """
         Generate dicts from a CSV file.
 
+        If the configuration key `csv:fast_reader` is set, the encoding is
+        detected from the beginning of the file only and the dicts contain only
+        the columns configured in `csv:mapping` (see
+        :py:meth:`_read_mapped_columns()`). The complete row is always
+        available in :py:attr:`input_data`.
+
         :param args: ignored
         :param dict kwargs: if it has a dict `csv_reader_args`, that will be used as additional
             arguments for the :py:class:`DictReader` constructor.
@@ -201,8 +256,11 @@ class CsvReader(BaseReader):
         :rtype: Iterator
         """
         encoding = None
+        fast_reader = self.config["csv"].get("fast_reader", False)
         with open(self.filename, "rb") as fp:
-            encoding = self.get_encoding(fp, self.logger)
+            encoding = self.get_encoding(
+                fp, self.logger, max_bytes=self.encoding_detection_size if fast_reader else None
+            )
         if encoding == "binary":
             raise UnsupportedEncodingError(
                 "Unsupported encoding 'binary' detected, "
@@ -259,6 +317,10 @@ class CsvReader(BaseReader):
                         missing_columns, self.fieldnames
                     )
                 )
+            if fast_reader:
+                for row in self._read_mapped_columns(reader):
+                    yield row
+                return
             for row in reader:
                 self.entry_count = reader.line_num
                 self.input_data = reader.row
@@ -275,6 +337,33 @@ class CsvReader(BaseReader):
                         if key is not None
                     }
 
+    def _read_mapped_columns(self, reader):  # type: (DictReader) -> Iterator[Dict[Text, Text]]
+        """
+        Generate dicts from a CSV file, containing only the columns configured
+        in `csv:mapping`.
+
+        The positions of the mapped columns are calculated once from the
+        header, the rows are read from the underlying CSV reader without
+        creating intermediate dicts and unmapped cells are not stripped.
+
+        :param DictReader reader: reader whose header has already been read
+        :return: iterator over list of dicts
+        :rtype: Iterator
+        """
+        mapping = self.config["csv"]["mapping"]
+        columns = [
+            (index, name.strip())
+            for index, name in enumerate(self.fieldnames)
+            if mapping.get(name.strip(), "__ignore") != "__ignore"
+        ]
+        for row in reader.reader:
+            if not row:
+                continue
+            self.entry_count = reader.reader.line_num
+            self.input_data = row
+            num_values = len(row)
+            yield {key: row[index].strip() if index < num_values else "" for index, key in columns}
+
     def handle_input(
         self,
         mapping_key,  # type: str
@@ -40,6 +40,7 @@ from ucsschool.lib.pyhooks import PyHook, PyHooksLoader
 
 from ..exceptions import InitialisationError
 from .ldap_connection import get_admin_connection, get_readonly_connection
+from .profiler import get_profiler
 
 if TYPE_CHECKING:
     import univention.admin.uldap  # noqa: F401
@@ -161,9 +162,13 @@ class ImportPyHookLoader(object):
         hooks = self.init_hook(hook_cls)
 
         res = []
+        profiler = get_profiler()
         for func in hooks.get(func_name, []):
             self.logger.info("Running %s %s hook %s ...", self.__class__.__name__, func_name, func)
-            res.append(func(*args, **kwargs))
+            with profiler.phase(
+                "pyhook {}.{}".format(func.__self__.__class__.__name__, func.__func__.__name__)
+            ):
+                res.append(func(*args, **kwargs))
         return res
 
 
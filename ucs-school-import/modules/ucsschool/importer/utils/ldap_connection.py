@@ -69,6 +69,18 @@ def get_admin_connection():  # type: () -> (Tuple[LoType, PoType])
     return _admin_connection, _admin_position
 
 
+def get_new_admin_connection():  # type: () -> (Tuple[LoType, PoType])
+    """
+    New (not cached) read-write cn=admin connection, e.g. for use in a thread.
+
+    :rtype: tuple(univention.admin.uldap.access, univention.admin.uldap.position)
+    """
+    try:
+        return uldap.getAdminConnection()
+    except IOError:
+        raise UcsSchoolImportFatalError("This script must be executed on a Primary Directory Node.")
+
+
 def get_machine_connection():  # type: () -> (Tuple[LoType, PoType])
     """
     Read-write machine connection.
@@ -88,6 +88,8 @@ class PostReadPyHook(ImportPyHook):
         the "entry_read" hook method may skip one or several input records, so
         they may be missing in imported_users.
         errors contains a list of catched errors/exceptions.
+        If the configuration key `streaming_batch_size` is set, this hook is
+        run once for each batch of read entries instead.
 
         :param list[ImportUser] imported_users: list of ImportUser objects created from the input records
         :param list[Exception] errors: list of exceptions that are caught during processing the input
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""
+Measure the time spent in the phases of an import job.
+
+Enabled with the configuration key ``profiling``. Phases may be nested (for
+example ``validate`` runs during ``create``), so their times must not be
+summed up.
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional  # noqa: F401
+
+from ..exceptions import InitialisationError
+from .utils import nullcontext
+
+_profiler = None
+
+
+class ImportProfiler(object):
+    """Collects the durations of the phases of an import job."""
+
+    def __init__(self, enabled=False):  # type: (Optional[bool]) -> None
+        self.enabled = enabled
+        self._durations = defaultdict(list)  # type: Dict[str, List[float]]
+        self._lock = threading.Lock()
+
+    def phase(self, name):
+        """
+        Context manager measuring the time spent in phase `name`.
+
+        :param str name: name of the phase
+        :return: context manager
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name):  # type: (str) -> Iterator[None]
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def add(self, name, duration):  # type: (str, float) -> None
+        """
+        Store the duration of one execution of phase `name`.
+
+        :param str name: name of the phase
+        :param float duration: duration in seconds
+        :return: None
+        """
+        with self._lock:
+            self._durations[name].append(duration)
+
+    def reset(self):  # type: () -> None
+        """Forget all measurements."""
+        with self._lock:
+            self._durations.clear()
+
+    def get_stats(self):  # type: () -> List[Dict[str, Any]]
+        """
+        Statistics of all phases, sorted by total time.
+
+        :return: list of dicts with keys `phase`, `count`, `total`, `p50` and `p95` (seconds)
+        :rtype: list(dict)
+        """
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+        res = [
+            {
+                "phase": name,
+                "count": len(values),
+                "total": sum(values),
+                "p50": self._percentile(values, 50),
+                "p95": self._percentile(values, 95),
+            }
+            for name, values in durations.items()
+        ]
+        res.sort(key=lambda stat: stat["total"], reverse=True)
+        return res
+
+    def get_report(self):  # type: () -> str
+        """
+        Human readable table of :py:meth:`get_stats()`.
+
+        :return: multi-line string, empty if nothing was measured
+        :rtype: str
+        """
+        stats = self.get_stats()
+        if not stats:
+            return ""
+        width = max(len("Phase"), max(len(stat["phase"]) for stat in stats))
+        line_format = "{:<%d} | {:>8} | {:>10} | {:>9} | {:>9}" % (width,)
+        header = line_format.format("Phase", "Count", "Total (s)", "p50 (ms)", "p95 (ms)")
+        lines = [header, "-" * len(header)]
+        for stat in stats:
+            lines.append(
+                line_format.format(
+                    stat["phase"],
+                    stat["count"],
+                    "{:.3f}".format(stat["total"]),
+                    "{:.1f}".format(stat["p50"] * 1000),
+                    "{:.1f}".format(stat["p95"] * 1000),
+                )
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _percentile(sorted_values, percent):  # type: (List[float], int) -> float
+        index = max(0, (len(sorted_values) * percent + 99) // 100 - 1)  # nearest-rank method
+        return sorted_values[index]
+
+
+def get_profiler():  # type: () -> ImportProfiler
+    """
+    Profiler shared by all parts of the import job.
+
+    :return: profiler, enabled if the configuration key `profiling` is set
+    :rtype: ImportProfiler
+    """
+    global _profiler
+    if _profiler is None:
+        from ..configuration import Configuration
+
+        try:
+            enabled = bool(Configuration().get("profiling", False))
+        except InitialisationError:
+            # configuration not loaded yet, don't cache
+            return ImportProfiler()
+        _profiler = ImportProfiler(enabled)
+    return _profiler
+
+
+def profiled(name):  # type: (str) -> Callable[[Callable[..., Any]], Callable[..., Any]]
+    """
+    Decorator measuring the execution time of a function as phase `name`.
+
+    :param str name: name of the phase
+    :return: decorator
+    """
+
+    def decorator(func):  # type: (Callable[..., Any]) -> Callable[..., Any]
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):  # type: (*Any, **Any) -> Any
+            with get_profiler().phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
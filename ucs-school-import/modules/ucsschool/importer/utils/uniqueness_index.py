@@ -0,0 +1,225 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Univention UCS@school
+#
+# Copyright 2024 Univention GmbH
+#
+# https://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""Indexes of usernames and email addresses that must be unique in the domain."""
+
+import logging
+import threading
+from collections import namedtuple
+from typing import TYPE_CHECKING, Dict, List, Optional  # noqa: F401
+
+from ldap.filter import filter_format
+from six.moves import intern
+
+from ucsschool.lib.models.utils import paged_search
+
+if TYPE_CHECKING:
+    from .ldap_connection import LoType  # noqa: F401
+
+UNIQUENESS = "uniqueness"  # name of the test in the configuration key `skip_tests`
+UniquenessTuple = namedtuple("UniquenessTuple", ["record_uid", "source_uid", "dn"])
+
+# number of users in an import job from which on it is cheaper to load an index completely
+FULL_LOAD_THRESHOLD = 500
+
+_username_index = None
+_email_index = None
+
+
+class UniquenessIndex(object):
+    """
+    Index of the users that use the values of an LDAP attribute.
+
+    Values are searched in LDAP on first use and cached (also if they are
+    not in use). After :py:meth:`load()` has run, the index holds all values
+    and LDAP is not searched anymore.
+
+    The index must be updated using :py:meth:`add()` and :py:meth:`remove()`
+    when users are created, renamed or moved.
+    """
+
+    attribute = ""
+    ldap_filter = "objectClass=posixAccount"
+
+    def __init__(self):  # type: () -> None
+        self.loaded = False
+        self._index = {}  # type: Dict[str, Optional[UniquenessTuple]]
+        self._lock = threading.RLock()
+        self.logger = logging.getLogger(__name__)
+
+    def __repr__(self):  # type: () -> str
+        return "{}(attribute={!r}, loaded={!r}, entries={})".format(
+            self.__class__.__name__, self.attribute, self.loaded, len(self._index)
+        )
+
+    def key(self, value):  # type: (str) -> str
+        """Normalized value used as key in the index."""
+        return value
+
+    def is_ignored(self, value):  # type: (str) -> bool
+        """Whether a value found in LDAP should not be stored in the index."""
+        return False
+
+    def load(self, lo):  # type: (LoType) -> None
+        """
+        Read all values from LDAP (using a paged search), if not done before.
+
+        :param univention.admin.uldap.access lo: LDAP connection object
+        :return: None
+        """
+        with self._lock:
+            if self.loaded:
+                return
+            self.logger.info("Loading index of %r values...", self.attribute)
+            index = {}  # type: Dict[str, Optional[UniquenessTuple]]
+            for dn, attrs in paged_search(lo, self.ldap_filter, attr=self._ldap_attributes()):
+                for value in attrs.get(self.attribute, []):
+                    value = value.decode("UTF-8")
+                    if not self.is_ignored(value):
+                        index[self.key(value)] = self._entry(dn, attrs)
+            # keep changes done with add() and remove() after the search started
+            index.update(self._index)
+            self._index = index
+            self.loaded = True
+            self.logger.info("Loaded index of %d %r values.", len(self._index), self.attribute)
+
+    def get(self, value, lo):  # type: (str, LoType) -> Optional[UniquenessTuple]
+        """
+        Get user using `value`.
+
+        :param str value: value to look up
+        :param univention.admin.uldap.access lo: LDAP connection object, used if the index is not
+            loaded completely
+        :return: UniquenessTuple(record_uid, source_uid, dn) or None if `value` is not in use
+        :rtype: UniquenessTuple or None
+        """
+        key = self.key(value)
+        with self._lock:
+            try:
+                return self._index[key]
+            except KeyError:
+                if self.loaded:
+                    return None
+        # search without holding the lock, so threads looking up other values don't wait for it
+        entry = None
+        filter_s = "(&({}){})".format(
+            self.ldap_filter, filter_format("({}=%s)".format(self.attribute), [value])
+        )
+        for dn, attrs in lo.search(filter_s, attr=self._ldap_attributes()):
+            entry = self._entry(dn, attrs)
+        with self._lock:
+            # add() and remove() calls (or another search) during the search take precedence
+            return self._index.setdefault(key, entry)
+
+    def add(self, value, record_uid, source_uid, dn):  # type: (str, str, str, str) -> None
+        """
+        Store user using `value`.
+
+        :param str value: value now in use
+        :param str record_uid: record_uid of user
+        :param str source_uid: source_uid of user
+        :param str dn: DN of user
+        :return: None
+        """
+        if value and not self.is_ignored(value):
+            with self._lock:
+                self._index[self.key(value)] = UniquenessTuple(
+                    record_uid, intern(source_uid) if source_uid else source_uid, dn
+                )
+
+    def remove(self, value):  # type: (str) -> None
+        """
+        Mark `value` as not in use anymore.
+
+        :param str value: value not in use anymore
+        :return: None
+        """
+        if value:
+            with self._lock:
+                self._index[self.key(value)] = None
+
+    def clear(self):  # type: () -> None
+        """Forget everything."""
+        with self._lock:
+            self._index = {}
+            self.loaded = False
+
+    def _ldap_attributes(self):  # type: () -> List[str]
+        return [self.attribute, "ucsschoolRecordUID", "ucsschoolSourceUID"]
+
+    @staticmethod
+    def _entry(dn, attrs):  # type: (str, Dict[str, List[bytes]]) -> UniquenessTuple
+        source_uid = attrs.get("ucsschoolSourceUID", [b""])[0].decode("UTF-8") or None
+        return UniquenessTuple(
+            attrs.get("ucsschoolRecordUID", [b""])[0].decode("UTF-8") or None,
+            intern(source_uid) if source_uid else None,  # there are only a few source_uids
+            dn,
+        )
+
+
+class UsernameIndex(UniquenessIndex):
+    attribute = "uid"
+
+    def is_ignored(self, value):  # type: (str) -> bool
+        # its faster to filter out computer names in Python than in LDAP
+        return value.endswith("$")
+
+
+class EmailIndex(UniquenessIndex):
+    attribute = "mailPrimaryAddress"
+
+    def key(self, value):  # type: (str) -> str
+        return value.lower()
+
+
+def get_username_index():  # type: () -> UsernameIndex
+    """
+    Index of usernames, shared by all users of an import job.
+
+    :rtype: UsernameIndex
+    """
+    global _username_index
+    if _username_index is None:
+        _username_index = UsernameIndex()
+    return _username_index
+
+
+def get_email_index():  # type: () -> EmailIndex
+    """
+    Index of primary email addresses, shared by all users of an import job.
+
+    :rtype: EmailIndex
+    """
+    global _email_index
+    if _email_index is None:
+        _email_index = EmailIndex()
+    return _email_index
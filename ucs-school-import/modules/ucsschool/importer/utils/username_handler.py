@@ -36,21 +36,29 @@ from __future__ import absolute_import
 import logging
 import re
 import string
-from typing import TYPE_CHECKING, Callable, Dict, Optional  # noqa: F401
+import threading
+from collections import defaultdict
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, List, Match, Optional, Tuple  # noqa: F401
 
 import lazy_object_proxy
 from ldap.dn import escape_dn_chars
 from six import PY3, string_types
 
-from univention.admin.uexceptions import noObject, objectExists
+from univention.admin.uexceptions import ldapError, noObject, objectExists
 
 from ..configuration import Configuration
 from ..exceptions import BadValueStored, FormatError, NameKeyExists, NoValueStored
 from .ldap_connection import get_admin_connection, get_unprivileged_connection
+from .uniqueness_index import get_email_index, get_username_index
 
 if TYPE_CHECKING:
     import univention.admin.uldap  # noqa: F401
 
+    from .uniqueness_index import UniquenessIndex  # noqa: F401
+
+# serializes counter updates of parallel import workers
+_counter_lock = threading.Lock()
+
 
 class NameCounterStorageBackend(object):
     def create(self, name, value):  # type: (str, int) -> None
@@ -104,6 +112,25 @@ class NameCounterStorageBackend(object):
         """
         raise NotImplementedError()
 
+    def reserve(self, name, count):  # type: (str, int) -> None
+        """
+        Announce that the value of `name` will be retrieved and raised
+        `count` times. Backends may use this to prefetch values.
+
+        :param str name: name
+        :param int count: number of values that will be needed
+        :return: None
+        """
+        pass
+
+    def release(self):  # type: () -> None
+        """
+        Give back values prefetched by :py:meth:`reserve()` that were not used.
+
+        :return: None
+        """
+        pass
+
 
 class LdapStorageBackend(NameCounterStorageBackend):
     """
@@ -180,6 +207,93 @@ class LdapStorageBackend(NameCounterStorageBackend):
             self.lo.delete(dn)
 
 
+class ReservingLdapStorageBackend(LdapStorageBackend):
+    """
+    LDAP storage backend, that reserves ranges of values in LDAP and hands
+    them out locally.
+
+    Reserving `n` values for a name raises its value in LDAP by `n` with a
+    single modify (compare-and-swap). :py:meth:`retrieve()` and
+    :py:meth:`modify()` then work on the reserved values without LDAP
+    access. :py:meth:`release()` returns unused values, as long as no other
+    process has raised the value in LDAP in the meantime.
+    """
+
+    def __init__(self, attribute_storage_name, lo=None, pos=None, reservation_size=1):
+        # type: (str, Optional[univention.admin.uldap.access], Optional[univention.admin.uldap.position], int) -> None  # noqa: E501
+        """
+        :param str attribute_storage_name: name of LDAP container: `cn=unique-<attribute_storage_name>`
+        :param lo: LDAP connection
+        :param pos: LDAP position
+        :param int reservation_size: number of values to reserve, if no reserved value is left
+        """
+        super(ReservingLdapStorageBackend, self).__init__(attribute_storage_name, lo, pos)
+        self.reservation_size = max(1, reservation_size)
+        self.logger = logging.getLogger(__name__)
+        # name -> [[next, end], ..]:
+        self._reservations = defaultdict(list)  # type: Dict[str, List[List[int]]]
+        # name -> number of values to reserve in create():
+        self._pending = {}  # type: Dict[str, int]
+
+    def create(self, name, value):  # type: (str, int) -> None
+        size = self._pending.pop(name, self.reservation_size - 1)
+        super(ReservingLdapStorageBackend, self).create(name, value + size)
+        if size > 0:
+            self._reservations[name].append([value, value + size])
+
+    def modify(self, name, old_value, new_value):  # type: (str, int, int) -> None
+        reservations = self._reservations.get(name)
+        if reservations and reservations[0][0] == old_value and new_value <= reservations[0][1]:
+            reservations[0][0] = new_value
+            if new_value == reservations[0][1]:
+                reservations.pop(0)
+        else:
+            super(ReservingLdapStorageBackend, self).modify(name, old_value, new_value)
+
+    def retrieve(self, name):  # type: (str) -> int
+        if not self._reservations.get(name):
+            self._reserve(name, self.reservation_size)
+        return self._reservations[name][0][0]
+
+    def remove(self, name):  # type: (str) -> None
+        self._reservations.pop(name, None)
+        self._pending.pop(name, None)
+        super(ReservingLdapStorageBackend, self).remove(name)
+
+    def purge(self):  # type: () -> None
+        self._reservations.clear()
+        self._pending.clear()
+        super(ReservingLdapStorageBackend, self).purge()
+
+    def reserve(self, name, count):  # type: (str, int) -> None
+        available = sum(end - start for start, end in self._reservations.get(name, []))
+        if count <= available:
+            return
+        try:
+            self._reserve(name, count - available)
+        except NoValueStored:
+            # the first value is not stored (see UsernameHandler.get_and_raise())
+            self._pending[name] = count - 1
+
+    def _reserve(self, name, count):  # type: (str, int) -> None
+        num = super(ReservingLdapStorageBackend, self).retrieve(name)
+        super(ReservingLdapStorageBackend, self).modify(name, num, num + count)
+        self._reservations[name].append([num, num + count])
+
+    def release(self):  # type: () -> None
+        for name, reservations in self._reservations.items():
+            for start, end in reversed(reservations):
+                try:
+                    if super(ReservingLdapStorageBackend, self).retrieve(name) != end:
+                        break  # value was raised by someone else, unused values are lost
+                    super(ReservingLdapStorageBackend, self).modify(name, end, start)
+                except (NoValueStored, ldapError) as exc:
+                    self.logger.warning("Could not release reserved values of %r: %s", name, exc)
+                    break
+        self._reservations.clear()
+        self._pending.clear()
+
+
 class MemoryStorageBackend(NameCounterStorageBackend):
     def __init__(self, attribute_storage_name):  # type: (str) -> None
         self._mem_store = {}  # type: Dict[str, int]
@@ -285,6 +399,8 @@ class UsernameHandler(object):
 
     attribute_name = "username"
     attribute_storage_name = "usernames"
+    PATTERN_FUNC_MAXLENGTH = 3  # maximum a counter function can produce is len('999')
+    _allowed_chars_set = None  # type: Optional[FrozenSet[str]]  # cache of allowed_chars
 
     def __init__(self, max_length, dry_run=True):  # type: (int, bool) -> None
         """
@@ -314,6 +430,15 @@ class UsernameHandler(object):
             string.ascii_letters + string.digits + str(self.config["username"]["allowed_special_chars"])
         )
 
+    @property
+    def uniqueness_index(self):  # type: () -> UniquenessIndex
+        """
+        Index of the names already in use in the domain.
+
+        :rtype: UniquenessIndex
+        """
+        return get_username_index()
+
     def get_storage_backend(self):  # type: () -> NameCounterStorageBackend
         """
         :return: NameCounterStorageBackend instance
@@ -322,7 +447,10 @@ class UsernameHandler(object):
         if self.dry_run:
             return MemoryStorageBackend(attribute_storage_name=self.attribute_storage_name)
         else:
-            return LdapStorageBackend(attribute_storage_name=self.attribute_storage_name)
+            return ReservingLdapStorageBackend(
+                attribute_storage_name=self.attribute_storage_name,
+                reservation_size=self.config.get("username", {}).get("counter_reservation_size", 1),
+            )
 
     def remove_bad_chars(self, name):  # type: (str) -> str
         """
@@ -334,10 +462,12 @@ class UsernameHandler(object):
         :return: copy of input, possibly modified
         :rtype: str
         """
-        if not self.allowed_chars:
+        if self._allowed_chars_set is None:
+            self._allowed_chars_set = frozenset(self.allowed_chars)
+        if not self._allowed_chars_set:
             return name
 
-        bad_chars = "".join(set(name).difference(set(self.allowed_chars)))
+        bad_chars = "".join(set(name).difference(self._allowed_chars_set))
         if bad_chars:
             self.logger.warning(
                 "Removing disallowed characters %r from %s %r.",
@@ -377,18 +507,17 @@ class UsernameHandler(object):
         :raises FormatError: if more than one counter variable was found in the scheme
         """
         assert isinstance(name, string_types)
-        PATTERN_FUNC_MAXLENGTH = 3  # maximum a counter function can produce is len('999')
         username = name
         if not max_length:
             max_length = self.max_length
 
-        match = self.replacement_variable_pattern.search(name)
+        matches = list(self.replacement_variable_pattern.finditer(name))
+        match = matches[0] if matches else None
         if match:
             func = self.counter_variable_to_function[match.group().upper()]
-            cut_pos = max(0, max_length - PATTERN_FUNC_MAXLENGTH)
 
             # it's not allowed to have two [COUNTER] patterns
-            if len(self.replacement_variable_pattern.findall(name)) >= 2:
+            if len(matches) >= 2:
                 raise FormatError(
                     "More than one counter variable found in {} scheme {!r}.".format(
                         self.attribute_name, name
@@ -398,14 +527,12 @@ class UsernameHandler(object):
                 )
 
             # the variable must no be the [COUNTER] pattern
-            without_pattern = self.replacement_variable_pattern.sub("", name)
-            without_pattern = self.remove_bad_chars(without_pattern)
+            without_pattern, name_base = self._get_name_base(name, match, max_length)
 
-            if len(without_pattern) > cut_pos:
-                without_pattern = without_pattern[:cut_pos]
-                start, end = without_pattern[: match.start()], without_pattern[match.start() :]
+            if name_base != without_pattern:
+                start, end = name_base[: match.start()], name_base[match.start() :]
                 username = "%s%s%s" % (start, match.group(), end)
-            counter = func(without_pattern) if without_pattern else ""
+            counter = func(name_base) if name_base else ""
             username = self.replacement_variable_pattern.sub(counter, username)
 
         username = self.remove_bad_chars(username)
@@ -417,6 +544,38 @@ class UsernameHandler(object):
         username = username.strip(".")
         return username
 
+    def get_counter_name_base(self, name, max_length=None):
+        # type: (str, Optional[int]) -> Optional[str]
+        """
+        Get the name base, a counter for `name` would be stored by.
+
+        :param str name: username/email, possibly a template
+        :param int max_length: overwrite max length specified at object instanciation time
+        :return: name without the counter variable as used by :py:meth:`format_name()` or None if
+            `name` contains no counter variable
+        :rtype: str or None
+        """
+        match = self.replacement_variable_pattern.search(name)
+        if not match:
+            return None
+        return self._get_name_base(name, match, max_length or self.max_length)[1] or None
+
+    def _get_name_base(self, name, match, max_length):
+        # type: (str, Match[str], int) -> Tuple[str, str]
+        """
+        Remove the counter variable `match` and bad characters from `name` and shorten the result,
+        so that a counter of up to :py:attr:`PATTERN_FUNC_MAXLENGTH` characters fits into
+        `max_length`.
+
+        :param str name: username/email template
+        :param match: match of the counter variable in `name`
+        :param int max_length: maximum length of the name including the counter
+        :return: tuple (name without the counter variable, name base)
+        :rtype: tuple(str, str)
+        """
+        without_pattern = self.remove_bad_chars(name[: match.start()] + name[match.end() :])
+        return without_pattern, without_pattern[: max(0, max_length - self.PATTERN_FUNC_MAXLENGTH)]
+
     def format_username(self, name):  # type: (str) -> str
         """Deprecated method. Please use format_name() instead."""
         return self.format_name(name)
@@ -465,14 +624,15 @@ class UsernameHandler(object):
         :return: current counter value
         :rtype: str
         """
-        try:
-            num = self.storage_backend.retrieve(name_base)
-            self.storage_backend.modify(name_base, num, num + 1)
-            res = str(num)
-        # not handling BadValueStored, because a data corruption should stop the import
-        except NoValueStored:
-            res = initial_value
-            self.storage_backend.create(name_base, 2)
+        with _counter_lock:
+            try:
+                num = self.storage_backend.retrieve(name_base)
+                self.storage_backend.modify(name_base, num, num + 1)
+                res = str(num)
+            # not handling BadValueStored, because a data corruption should stop the import
+            except NoValueStored:
+                res = initial_value
+                self.storage_backend.create(name_base, 2)
         return res
 
 
@@ -499,6 +659,10 @@ class EmailHandler(UsernameHandler):
     def allowed_chars(self):  # type: () -> str
         return ""
 
+    @property
+    def uniqueness_index(self):  # type: () -> UniquenessIndex
+        return get_email_index()
+
     def remove_bad_chars(self, name):  # type: (str) -> str
         """
         Space is actually allowed (inside a quoted string), but we'll remove
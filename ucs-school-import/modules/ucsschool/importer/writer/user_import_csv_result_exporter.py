@@ -72,7 +72,7 @@ class UserImportCsvResultExporter(ResultExporter):
     def get_iter(self, user_import):
         """
         Iterator over all ImportUsers and errors of the user import.
-        First errors, then added, modified and deleted users.
+        First errors, then added, modified, deleted and unchanged users.
 
         :param UserImport user_import: UserImport object used for the import
         :return: iterator over both ImportUsers and UcsSchoolImportError objects
@@ -87,7 +87,12 @@ class UserImportCsvResultExporter(ResultExporter):
             return max(exc.entry_count, entry_count)
 
         li = sorted(user_import.errors, key=exc_count)
-        for users in [user_import.added_users, user_import.modified_users, user_import.deleted_users]:
+        for users in [
+            user_import.added_users,
+            user_import.modified_users,
+            user_import.deleted_users,
+            user_import.unchanged_users,
+        ]:
             for u in users.values():
                 if u:
                     li.extend(u)
@@ -135,6 +135,18 @@ class DefaultConfigurationChecks(ConfigurationChecks):
                 "Using 'user_role' setting and '__role' mapping at the same time is not allowed."
             )
 
+    def test_parallelism(self):
+        parallelism = self.config.get("parallelism", 1)
+        if not isinstance(parallelism, int) or parallelism < 1:
+            raise InitialisationError("Configuration value of 'parallelism' must be an integer > 0.")
+
+    def test_streaming_batch_size(self):
+        batch_size = self.config.get("streaming_batch_size", 0)
+        if not isinstance(batch_size, int) or batch_size < 0:
+            raise InitialisationError(
+                "Configuration value of 'streaming_batch_size' must be an integer >= 0."
+            )
+
     def test_maildomain_is_set(self):
         if "<maildomain>" in self.config.get("scheme", {}).get("email", ""):
             hosted_domains = ucr.get("mail/hosteddomains")
@@ -31,7 +31,9 @@
 # /usr/share/common-licenses/AGPL-3; if not, see
 # <http://www.gnu.org/licenses/>.
 
+import os
 import re
+import threading
 
 from six import string_types
 
@@ -57,6 +59,19 @@ _listTypes = {
 }
 _listTypesInv = {_i[1]: _i[0] for _i in _listTypes.items()}
 
+# regular expression to match UCR variables for the default rule of a group
+_regGroupDefault = re.compile(r"^proxy/filter/groupdefault/(?P<group>.+)$")
+
+# UCR files whose modification time invalidates the rule store
+_ucrFiles = [
+    os.path.join(univention.config_registry.ConfigRegistry.PREFIX, _i)
+    for _i in sorted(univention.config_registry.ConfigRegistry.BASES.values())
+]
+
+_store = None
+_storeMtimes = None
+_storeLock = threading.Lock()
+
 
 class Rule(object):
     def __init__(self, name, type=WHITELIST, priority=0, wlan=False, domains=[], userRule=False):
@@ -113,9 +128,13 @@ class Rule(object):
         only the changed properties will be saved. In case the rules are similar,
         no changes will be done.
         """
-        # load original rule
-        orgRule = load(self.name)
+        save([self])
 
+    def _changes(self, orgRule):
+        """
+        Return the UCR variables to set and to unset in order to change the
+        original rule `orgRule` (may be None) into the current rule.
+        """
         # prepare for saving filter properties
         vars = []
         rmVars = []
@@ -167,80 +186,46 @@ class Rule(object):
                 rmVars.append("%s/%s" % (domainPrefix, orgDomains[iorg][0]))
                 iorg += 1
 
-        # write changes
-        if vars:
-            univention.config_registry.handler_set(vars)
-        if rmVars:
-            univention.config_registry.handler_unset(rmVars)
+        return vars, rmVars
 
 
-def findUCRVariables(filterName=None, userRule=False):
+def _copyRule(rule):
+    """Return a copy of `rule` that can be modified without changing the rule store."""
+    return Rule(rule.name, rule.type, rule.priority, rule.wlan, rule._domains, rule.userRule)
+
+
+class _RuleStore(object):
     """
-    Returns a dict of all UCR variables or all variables matching the
-    specified rule name.
+    All filter rules and default group rules, parsed once from the UCR
+    variables. Rules are indexed by `(userRule, name)`, the default rules
+    by group name.
     """
-    # refresh internal UCR cache
-    ucr.load()
 
-    # iterate over all UCR variables
-    vars = {}
-    for k, v in ucr.items():
-        imatch = _regFilterNames.match(k)
-        if imatch:
-            # we found a filter variable
-            iname = imatch.group("name")
-            if not iname or (filterName is not None and filterName != iname):
-                # empty name or name does not match the specified filter
+    def __init__(self, ucr):
+        self.variables = {}  # (userRule, name) -> {UCR variable: value}
+        self.rules = {}  # (userRule, name) -> Rule
+        self.groupRules = {}  # group name -> rule name
+        for k, v in ucr.items():
+            imatch = _regFilterNames.match(k)
+            if imatch:
+                if imatch.group("name"):
+                    self._addVariable(ucr, imatch, k, v)
                 continue
+            imatch = _regGroupDefault.match(k)
+            if imatch:
+                self.groupRules[imatch.group("group")] = v
 
-            # see whether this is a user specific rule or a general rule
-            if userRule != bool(imatch.group("userPrefix")):
-                continue
-
-            # bingo, we got a match :)
-            vars[k] = v
-
-    # return all matched variables
-    return vars
-
-
-def remove(name, userRule=False):
-    """Removes the UCR variables corresponding to the specified rule."""
-    if not name:
-        return False
-    rmVars = findUCRVariables(name, userRule).keys()
-    if rmVars:
-        univention.config_registry.handler_unset(rmVars)
-        return True
-    return False
-
-
-def load(name, userRule=False):
-    """Wrapper for list(name)."""
-    return list(name, userRule)
-
-
-def list(filterName=None, userRule=False):
-    """
-    Returns a list of all existing rules. If name is given, returns only the
-    rule matching the specified name or None. userRule specifies whether all
-    common rules (=False) or only user-specific rules (=True) are listed.
-    If filterName is specified, only rule matching this name is returned as
-    single object (not as list!).
-    """
-    # iterate over all UCR variables
-    rules = {}
-    for k, v in findUCRVariables(filterName, userRule).items():
-        imatch = _regFilterNames.match(k)
-        if not imatch:
-            # should not happen
-            continue
-
-        # get filter name
+    def _addVariable(self, ucr, imatch, k, v):
+        # get filter name and see whether this is a user specific rule or a general rule
         iname = imatch.group("name")
+        userRule = bool(imatch.group("userPrefix"))
+        key = (userRule, iname)
+        self.variables.setdefault(key, {})[k] = v
 
         # get the rule from our cache
-        irule = rules.get(iname, Rule(iname))
+        irule = self.rules.get(key)
+        if irule is None:
+            irule = self.rules[key] = Rule(iname, userRule=userRule)
 
         # update the rule with the given property
         # NOTE: URL black-/whitelists are not supported anymore, only domain lists
@@ -268,7 +253,7 @@ def list(filterName=None, userRule=False):
             idx = -1
             try:
                 idx = int(imatch.group("index"))
-            except ValueError:
+            except (TypeError, ValueError):
                 pass
 
             # get list type (blacklisted or whitelisted)
@@ -277,18 +262,115 @@ def list(filterName=None, userRule=False):
             # add domain to list of domains
             irule.addDomain(v, idx, listType)
 
-        # save the rule back to our cache
-        rules[iname] = irule
 
-    if filterName:
+def _getUCRMtimes():
+    """Return the modification times and sizes of the UCR files."""
+    mtimes = []
+    for ifile in _ucrFiles:
+        try:
+            istat = os.stat(ifile)
+        except OSError:
+            mtimes.append(None)
+        else:
+            mtimes.append((istat.st_mtime_ns, istat.st_size))
+    return tuple(mtimes)
+
+
+def _getStore():
+    """
+    Return the rule store. It is rebuilt from UCR only if one of the UCR
+    files has been modified since it was built.
+    """
+    global _store, _storeMtimes
+    with _storeLock:
+        mtimes = _getUCRMtimes()
+        if _store is None or mtimes != _storeMtimes:
+            # refresh internal UCR cache
+            ucr.load()
+            _store = _RuleStore(ucr)
+            _storeMtimes = mtimes
+        return _store
+
+
+def _invalidateStore():
+    """Force a rebuild of the rule store after UCR variables have been changed."""
+    global _store
+    with _storeLock:
+        _store = None
+
+
+def findUCRVariables(filterName=None, userRule=False):
+    """
+    Returns a dict of all UCR variables or all variables matching the
+    specified rule name.
+    """
+    store = _getStore()
+    if filterName is not None:
+        return dict(store.variables.get((userRule, filterName), {}))
+    vars = {}
+    for (iuserRule, _iname), ivars in store.variables.items():
+        if iuserRule == userRule:
+            vars.update(ivars)
+    return vars
+
+
+def remove(name, userRule=False):
+    """Removes the UCR variables corresponding to the specified rule."""
+    if not name:
+        return False
+    rmVars = findUCRVariables(name, userRule).keys()
+    if rmVars:
+        univention.config_registry.handler_unset(rmVars)
+        _invalidateStore()
+        return True
+    return False
+
+
+def load(name, userRule=False):
+    """Wrapper for list(name)."""
+    return list(name, userRule)
+
+
+def list(filterName=None, userRule=False):
+    """
+    Returns a list of all existing rules. If name is given, returns only the
+    rule matching the specified name or None. userRule specifies whether all
+    common rules (=False) or only user-specific rules (=True) are listed.
+    If filterName is specified, only rule matching this name is returned as
+    single object (not as list!).
+    """
+    store = _getStore()
+    if filterName is not None:
         # handle case for filtered search
-        if not rules:
+        irule = store.rules.get((userRule, filterName))
+        if irule is None:
             # no match
             return None
-        # return single element
-        return next(r for r in rules.values())
+        return _copyRule(irule)
+
+    return [_copyRule(r) for (iuserRule, _iname), r in store.rules.items() if iuserRule == userRule]
+
 
-    return [r for r in rules.values()]
+def save(rules):
+    """
+    Save several rules with a single UCR write. Only the properties that
+    differ from the stored rules are changed (see :py:meth:`Rule.save()`).
+    """
+    store = _getStore()
+    vars = []
+    rmVars = []
+    for irule in rules:
+        ivars, irmVars = irule._changes(store.rules.get((irule.userRule, irule.name)))
+        vars.extend(ivars)
+        rmVars.extend(irmVars)
+
+    # write changes
+    if vars:
+        univention.config_registry.handler_set(vars)
+    if rmVars:
+        univention.config_registry.handler_unset(rmVars)
+    if vars or rmVars:
+        _invalidateStore()
 
 
 def getGroupRuleName(groupNames):
@@ -301,10 +383,10 @@ def getGroupRuleName(groupNames):
     or:
         `getGroupRuleName(<groupName) -> <ruleName>`
     """
-    ucr.load()
+    groupRules = _getStore().groupRules
     if not isinstance(groupNames, type([])):
-        return ucr.get("proxy/filter/groupdefault/%s" % groupNames)
-    return {iname: ucr.get("proxy/filter/groupdefault/%s" % iname) for iname in groupNames}
+        return groupRules.get(groupNames)
+    return {iname: groupRules.get(iname) for iname in groupNames}
 
 
 def unsetGroupRuleName(groupNames):
@@ -323,6 +405,7 @@ def unsetGroupRuleName(groupNames):
     else:
         vars = ["proxy/filter/groupdefault/%s" % iname for iname in groupNames]
     univention.config_registry.handler_unset(vars)
+    _invalidateStore()
 
 
 def setGroupRuleName(*args):
@@ -341,3 +424,4 @@ def setGroupRuleName(*args):
     else:
         vars = ["proxy/filter/groupdefault/%s=%s" % (iname, irule) for iname, irule in args[0].items()]
     univention.config_registry.handler_set(vars)
+    _invalidateStore()
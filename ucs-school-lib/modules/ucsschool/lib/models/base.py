@@ -31,11 +31,13 @@
 # <http://www.gnu.org/licenses/>.
 
 from copy import deepcopy
+from types import MappingProxyType
 from typing import (
     TYPE_CHECKING,
     Any,  # noqa: F401
     Dict,  # noqa: F401
     Iterable,  # noqa: F401
+    Iterator,  # noqa: F401
     List,  # noqa: F401
     Optional,  # noqa: F401
     Sequence,  # noqa: F401
@@ -62,8 +64,9 @@ from ..pyhooks.pyhooks_loader import PyHooksLoader
 from ..roles import all_roles, create_ucsschool_role_string
 from ..schoolldap import SchoolSearchBase
 from .attributes import CommonName, Roles, SchoolAttribute, ValidationError
+from .cache import ModelCache
 from .meta import UCSSchoolHelperMetaClass
-from .utils import _, ucr
+from .utils import LDAP_PAGE_SIZE, _, paged_search, ucr
 from .validator import validate
 
 if TYPE_CHECKING:
@@ -127,6 +130,73 @@ class MultipleObjectsError(Exception):
         self.objs = objs
 
 
+class ReadOnlyModel(object):
+    """
+    Immutable, lightweight view of a model object, created by
+    :py:meth:`UCSSchoolHelperAbstractClass.from_ldap_attrs()`.
+
+    There is one subclass per model class, with a slot for each of its
+    attributes (see :py:meth:`UCSSchoolHelperAbstractClass.get_read_model_class()`).
+    Lists are stored as tuples and dicts as read-only mappings.
+    """
+
+    __slots__ = ("dn",)
+    attribute_names = ()  # type: Tuple[str, ...]
+    model = None  # type: Type[UCSSchoolHelperAbstractClass]
+
+    def __init__(self, dn, **kwargs):  # type: (str, **Any) -> None
+        object.__setattr__(self, "dn", dn)
+        for name in self.attribute_names:
+            object.__setattr__(self, name, self._freeze(kwargs.get(name)))
+
+    def __setattr__(self, name, value):  # type: (str, Any) -> None
+        raise AttributeError("{} objects are read-only.".format(self.__class__.__name__))
+
+    def __delattr__(self, name):  # type: (str) -> None
+        raise AttributeError("{} objects are read-only.".format(self.__class__.__name__))
+
+    def __repr__(self):  # type: () -> str
+        if "school" in self.attribute_names:
+            return "{}(name={!r}, school={!r}, dn={!r})".format(
+                self.__class__.__name__, self.name, self.school, self.dn
+            )
+        return "{}(name={!r}, dn={!r})".format(self.__class__.__name__, self.name, self.dn)
+
+    def __eq__(self, other):  # type: (Any) -> bool
+        return type(self) is type(other) and self.dn == other.dn
+
+    def __ne__(self, other):  # type: (Any) -> bool
+        return not self == other
+
+    def __hash__(self):  # type: () -> int
+        return hash(self.dn)
+
+    def to_dict(self):  # type: () -> Dict[str, Any]
+        """Same format as :py:meth:`UCSSchoolHelperAbstractClass.to_dict()`."""
+        ret = {"$dn$": self.dn, "objectType": self.model._meta.udm_module}
+        for name, attr in iteritems(self.model._attributes):
+            if not attr.internal:
+                ret[name] = getattr(self, name)
+        return ret
+
+    def get_model(self, lo):  # type: (LoType) -> UCSSchoolModel
+        """
+        Load the complete, modifiable object from LDAP.
+
+        :param lo: LDAP connection object
+        :return: object of class `self.model`
+        """
+        return self.model.from_dn(self.dn, getattr(self, "school", None), lo)
+
+    @classmethod
+    def _freeze(cls, value):  # type: (Any) -> Any
+        if isinstance(value, list):
+            return tuple(cls._freeze(v) for v in value)
+        if isinstance(value, dict):
+            return MappingProxyType({k: cls._freeze(v) for k, v in iteritems(value)})
+        return value
+
+
 @add_metaclass(UCSSchoolHelperMetaClass)
 class UCSSchoolHelperAbstractClass(object):
     """
@@ -231,10 +301,15 @@ class UCSSchoolHelperAbstractClass(object):
                 hook_path = 'computer'
     """
 
-    _cache = {}  # type: Dict[Tuple[str, Tuple[str, str]], UCSSchoolModel]
+    _cache = ModelCache(
+        "models", type_of_key=lambda key: key[0]
+    )  # type: Dict[Tuple[str, Tuple[str, str]], UCSSchoolModel]
     _machine_connection = None  # type: LoType
-    _search_base_cache = {}  # type: Dict[str, SchoolSearchBase]
+    _search_base_cache = ModelCache(
+        "search_bases", max_size=1000, ttl=3600
+    )  # type: Dict[str, SchoolSearchBase]
     _initialized_udm_modules = []  # type: List[str]
+    _read_model_classes = {}  # type: Dict[Type[UCSSchoolModel], Type[ReadOnlyModel]]
 
     hook_sep_char = "\t"
 
@@ -258,10 +333,11 @@ class UCSSchoolHelperAbstractClass(object):
             (k, kwargs[k]) for k in sorted(kwargs)
         ]  # TODO: rewrite: sorted(kwargs.items())
         key = tuple(key)
-        if key not in cls._cache:
+        obj = cls._cache.get(key)
+        if obj is None:
             obj = cls(**kwargs)
             cls._cache[key] = obj
-        return cls._cache[key]
+        return obj
 
     @classmethod
     def invalidate_all_caches(cls):  # type: () -> None
@@ -270,7 +346,7 @@ class UCSSchoolHelperAbstractClass(object):
         from ucsschool.lib.models.utils import _pw_length_cache
 
         cls._cache.clear()
-        # cls._search_base_cache.clear() # useless to clear
+        cls._search_base_cache.clear()
         _pw_length_cache.clear()
         Network._netmask_cache.clear()
         User._profile_path_cache.clear()
@@ -278,9 +354,17 @@ class UCSSchoolHelperAbstractClass(object):
 
     @classmethod
     def invalidate_cache(cls):  # type: () -> None
-        keys_to_remove = [key for key in cls._cache.keys() if key[0] == cls.__name__]
-        for key in keys_to_remove:
-            del cls._cache[key]
+        cls._cache.invalidate(lambda key: key[0] == cls.__name__)
+
+    def invalidate_cached_object(self):  # type: () -> None
+        """
+        Remove the cache entries of this object (with its current and its old
+        name). Called after the object was created, modified, moved or removed.
+        Subclasses extend this to clean caches that depend on the object.
+        """
+        cls_name = self.__class__.__name__
+        names = {self.name, self.get_name_from_dn(self.old_dn)} - {None}
+        self._cache.invalidate(lambda key: key[0] == cls_name and dict(key[1:]).get("name") in names)
 
     @classmethod
     def supports_school(cls):  # type: () -> bool
@@ -586,7 +670,7 @@ class UCSSchoolHelperAbstractClass(object):
             self.logger.info("%r successfully created", self)
             return True
         finally:
-            self.invalidate_cache()
+            self.invalidate_cached_object()
 
     def create_without_hooks_roles(self, lo):  # type: (LoType) -> bool
         """
@@ -659,7 +743,7 @@ class UCSSchoolHelperAbstractClass(object):
             # return not same
             return True
         finally:
-            self.invalidate_cache()
+            self.invalidate_cached_object()
 
     def modify_without_hooks_roles(self, udm_obj):  # type: (UdmObject) -> bool
         """Run by py:meth:`modify_without_hooks()` before py:meth:`do_modify()`."""
@@ -713,7 +797,7 @@ class UCSSchoolHelperAbstractClass(object):
             try:
                 self.do_move(udm_obj, lo)
             finally:
-                self.invalidate_cache()
+                self.invalidate_cached_object()
             self.set_dn(self.dn)
         else:
             self.logger.warning("Would like to move %s to %r. But it is not allowed!", udm_obj.dn, self)
@@ -775,7 +859,7 @@ class UCSSchoolHelperAbstractClass(object):
                 self.logger.info("%r successfully removed", self)
                 return True
             finally:
-                self.invalidate_cache()
+                self.invalidate_cached_object()
         self.logger.info("%r does not exist!", self)
         return False
 
@@ -891,10 +975,12 @@ class UCSSchoolHelperAbstractClass(object):
     def get_search_base(cls, school_name):  # type: (str) -> SchoolSearchBase
         from ucsschool.lib.models.school import School
 
-        if school_name not in cls._search_base_cache:
+        search_base = cls._search_base_cache.get(school_name)
+        if search_base is None:
             school = School(name=school_name)
-            cls._search_base_cache[school_name] = SchoolSearchBase([school.name], dn=school.dn)
-        return cls._search_base_cache[school_name]
+            search_base = SchoolSearchBase([school.name], dn=school.dn)
+            cls._search_base_cache[school_name] = search_base
+        return search_base
 
     @classmethod
     def init_udm_module(cls, lo):  # type: (LoType) -> None
@@ -916,6 +1002,108 @@ class UCSSchoolHelperAbstractClass(object):
         queried for that string (so that it should be the value)
         """
         cls.init_udm_module(lo)
+        complete_filter = cls._get_all_filter(school, filter_str, easy_filter, school_prefix)
+        cls.logger.debug("Getting all %s of %s with filter %r", cls.__name__, school, complete_filter)
+        ret = []
+        for udm_obj in cls.lookup(lo, school, complete_filter, superordinate=superordinate):
+            try:
+                ret.append(cls.from_udm_obj(udm_obj, school, lo))
+            except NoObject:
+                continue
+        return ret
+
+    @classmethod
+    def iter_all(
+        cls,
+        lo,
+        school,
+        filter_str=None,
+        easy_filter=False,
+        superordinate=None,
+        school_prefix=False,
+        page_size=LDAP_PAGE_SIZE,
+        attrs=None,
+    ):
+        # type: (LoType, str, Optional[str], Optional[bool], Optional[SuperOrdinateType], Optional[bool], Optional[int], Optional[Iterable[str]]) -> Iterator[Union[UCSSchoolModel, ReadOnlyModel]]  # noqa: E501
+        """
+        Like :py:meth:`get_all()`, but searches LDAP page by page and yields the
+        objects one by one, instead of loading all of them into memory.
+
+        If `attrs` is given, only those attributes are read from LDAP and
+        read-only objects are created with :py:meth:`from_ldap_attrs()`,
+        without opening UDM objects.
+
+        :param lo: LDAP connection object
+        :param str school: name of the school (OU)
+        :param str filter_str: filter, see :py:meth:`get_all()`
+        :param bool easy_filter: see :py:meth:`get_all()`
+        :param superordinate: UDM superordinate object
+        :param bool school_prefix: see :py:meth:`get_all()`
+        :param int page_size: number of LDAP entries to request per page
+        :param attrs: names of the attributes of the model to read, `None` to create full objects
+        :type attrs: list(str) or None
+        :return: iterator over objects
+        :rtype: Iterator[UCSSchoolModel or ReadOnlyModel]
+        """
+        cls.init_udm_module(lo)
+        module = udm_modules.get(cls._meta.udm_module)
+        complete_filter = cls._get_all_filter(school, filter_str, easy_filter, school_prefix)
+        ldap_attrs = None if attrs is None else cls.get_ldap_attribute_names(attrs)
+        member_groups = None if attrs is None else cls.get_member_groups(lo, school, attrs)
+        seen = set()  # type: Set[str]
+        for udm_filter, base in cls._iter_lookup_filter_and_base(school, complete_filter):
+            ldap_filter = str(module.lookup_filter(udm_filter, lo))
+            cls.logger.debug(
+                "Iterating over all %s of %s with filter %r in %r",
+                cls.__name__,
+                school,
+                ldap_filter,
+                base,
+            )
+            try:
+                for dn, entry in paged_search(
+                    lo, ldap_filter, attr=ldap_attrs, base=base, page_size=page_size
+                ):
+                    if dn in seen:
+                        continue
+                    seen.add(dn)
+                    try:
+                        if attrs is None:
+                            udm_obj = udm_objects.get(
+                                module, None, lo, None, dn, superordinate=superordinate, attributes=entry
+                            )
+                            obj = cls.from_udm_obj(udm_obj, school, lo)
+                        else:
+                            obj = cls.from_ldap_attrs(dn, entry, school, member_groups)
+                    except NoObject:
+                        continue
+                    yield obj
+            except noObject as exc:
+                cls.logger.warning(
+                    "Error while getting all %s of %s (probably %r does not exist): %s",
+                    cls.__name__,
+                    school,
+                    base,
+                    exc,
+                )
+
+    @classmethod
+    def _iter_lookup_filter_and_base(cls, school, filter_s):
+        # type: (str, str) -> List[Tuple[str, str]]
+        """
+        Searches done by :py:meth:`iter_all()`. They must find the same objects as
+        :py:meth:`lookup()`, so subclasses overriding one have to override the other.
+
+        :param str school: name of the school (OU)
+        :param str filter_s: UDM filter, see :py:meth:`_get_all_filter()`
+        :return: list of tuples (UDM filter, search base), an empty base means the LDAP base
+        :rtype: list(tuple(str, str))
+        """
+        return [(filter_s, cls.get_container(school))]
+
+    @classmethod
+    def _get_all_filter(cls, school, filter_str=None, easy_filter=False, school_prefix=False):
+        # type: (str, Optional[str], Optional[bool], Optional[bool]) -> str
         complete_filter = cls._meta.udm_filter
         if school_prefix:
             filter_str = school + "-" + filter_str
@@ -932,15 +1120,128 @@ class UCSSchoolHelperAbstractClass(object):
                 complete_filter = conjunction("&", [complete_filter, filter_from_filter_str])
             else:
                 complete_filter = filter_from_filter_str
-        complete_filter = str(complete_filter)
-        cls.logger.debug("Getting all %s of %s with filter %r", cls.__name__, school, complete_filter)
-        ret = []
-        for udm_obj in cls.lookup(lo, school, complete_filter, superordinate=superordinate):
-            try:
-                ret.append(cls.from_udm_obj(udm_obj, school, lo))
-            except NoObject:
-                continue
-        return ret
+        return str(complete_filter)
+
+    @classmethod
+    def from_ldap_attrs(cls, dn, ldap_attrs, school=None, member_groups=None):
+        # type: (str, Dict[str, List[bytes]], Optional[str], Optional[Dict[str, List[str]]]) -> ReadOnlyModel  # noqa: E501
+        """
+        Creates a read-only object from the raw attributes of an LDAP search
+        result, without opening a UDM object.
+
+        The values are converted using the mapping of the UDM module (it must
+        have been initialized with :py:meth:`init_udm_module()`). Attributes not
+        found in `ldap_attrs` and properties computed by UDM are `None`. Use
+        :py:meth:`get_ldap_attribute_names()` to get the LDAP attributes to search
+        for and :py:meth:`get_member_groups()` to get the group memberships.
+
+        :param str dn: DN of the LDAP object
+        :param dict ldap_attrs: raw LDAP attributes
+        :param str school: name of the school (OU), if it cannot be found in `dn`
+        :param dict member_groups: group memberships returned by :py:meth:`get_member_groups()`
+        :return: read-only object, its `model` attribute is `cls`
+        :rtype: ReadOnlyModel
+        """
+        klass = cls._get_class_for_ldap_attrs(dn, ldap_attrs, school)
+        if klass is None:
+            raise UnknownModel(dn, cls)
+        if klass is not cls:
+            if not issubclass(klass, cls):
+                raise WrongModel(dn, klass, cls)
+            return klass.from_ldap_attrs(dn, ldap_attrs, school, member_groups)
+        return cls.get_read_model_class()(
+            dn, **cls._values_from_ldap_attrs(dn, ldap_attrs, school, member_groups)
+        )
+
+    @classmethod
+    def get_ldap_attribute_names(cls, attrs):  # type: (Iterable[str]) -> List[str]
+        """
+        Names of the LDAP attributes needed by :py:meth:`from_ldap_attrs()` to
+        set the model attributes `attrs`.
+
+        :param attrs: names of model attributes
+        :type attrs: list(str)
+        :return: names of LDAP attributes
+        :rtype: list(str)
+        """
+        mapping = udm_modules.get(cls._meta.udm_module).mapping
+        udm_names = [cls._attributes[name].udm_name for name in attrs if name in cls._attributes]
+        if cls.supports_schools():
+            udm_names.append("school")
+        ldap_names = {mapping.mapName(udm_name) for udm_name in udm_names if udm_name}
+        ldap_names.discard("")
+        ldap_names.discard(None)
+        return sorted(ldap_names)
+
+    @classmethod
+    def get_member_groups(cls, lo, school, attrs):
+        # type: (LoType, str, Iterable[str]) -> Optional[Dict[str, List[str]]]
+        """
+        Group memberships needed by :py:meth:`from_ldap_attrs()` to set the
+        model attributes `attrs`. They are read from the `uniqueMember`
+        attribute of the groups, as `memberOf` is not available on every
+        system.
+
+        :param lo: LDAP connection object
+        :param str school: name of the school (OU)
+        :param attrs: names of model attributes
+        :type attrs: list(str)
+        :return: DNs of the groups by lowercased member DN, `None` if `attrs` need no groups
+        :rtype: dict(str, list(str)) or None
+        """
+        return None
+
+    @staticmethod
+    def _search_member_groups(lo, base, scope="sub"):  # type: (LoType, str, str) -> Dict[str, List[str]]
+        member_groups = {}  # type: Dict[str, List[str]]
+        filter_s = "(&(objectClass=univentionGroup)(uniqueMember=*))"
+        for group_dn, group_attrs in paged_search(
+            lo, filter_s, attr=["uniqueMember"], base=base, scope=scope
+        ):
+            for member_dn in group_attrs.get("uniqueMember", []):
+                member_groups.setdefault(member_dn.decode("UTF-8").lower(), []).append(group_dn)
+        return member_groups
+
+    @classmethod
+    def get_read_model_class(cls):  # type: () -> Type[ReadOnlyModel]
+        """
+        Read-only class with a slot for each attribute of `cls`, used by
+        :py:meth:`from_ldap_attrs()`.
+
+        :rtype: type
+        """
+        try:
+            return cls._read_model_classes[cls]
+        except KeyError:
+            attribute_names = tuple(cls._attributes)
+            klass = type(
+                "{}ReadModel".format(cls.__name__),
+                (ReadOnlyModel,),
+                {"__slots__": attribute_names, "attribute_names": attribute_names, "model": cls},
+            )
+            cls._read_model_classes[cls] = klass
+            return klass
+
+    @classmethod
+    def _get_class_for_ldap_attrs(cls, dn, ldap_attrs, school):
+        # type: (str, Dict[str, List[bytes]], Optional[str]) -> Optional[Type[UCSSchoolModel]]
+        """Like :py:meth:`get_class_for_udm_obj()` for :py:meth:`from_ldap_attrs()`."""
+        return cls
+
+    @classmethod
+    def _values_from_ldap_attrs(cls, dn, ldap_attrs, school, member_groups):
+        # type: (str, Dict[str, List[bytes]], Optional[str], Optional[Dict[str, List[str]]]) -> Dict[str, Any]  # noqa: E501
+        mapping = udm_modules.get(cls._meta.udm_module).mapping
+        values = {"name": cls.get_name_from_dn(dn), "school": cls.get_school_from_dn(dn) or school}
+        udm_names = [(name, attr.udm_name) for name, attr in iteritems(cls._attributes) if attr.udm_name]
+        if cls.supports_schools():
+            udm_names.append(("schools", "school"))
+        for name, udm_name in udm_names:
+            ldap_name = mapping.mapName(udm_name)
+            if ldap_name and ldap_name in ldap_attrs:
+                value = mapping.unmapValue(udm_name, ldap_attrs[ldap_name])
+                values[name] = None if value == "" else value
+        return values
 
     @classmethod
     def lookup(cls, lo, school, filter_s="", superordinate=None):
@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# UCS@school python lib: models
+#
+# Copyright 2024 Univention GmbH
+#
+# http://www.univention.de/
+#
+# All rights reserved.
+#
+# The source code of this program is made available
+# under the terms of the GNU Affero General Public License version 3
+# (GNU AGPL V3) as published by the Free Software Foundation.
+#
+# Binary versions of this program provided by Univention to you as
+# well as other copyrighted, protected or trademarked materials like
+# Logos, graphics, fonts, specific documentations and configurations,
+# cryptographic keys etc. are subject to a license agreement between
+# you and Univention and not subject to the GNU AGPL V3.
+#
+# In the case you use this program under the terms of the GNU AGPL V3,
+# the program is provided in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License with the Debian GNU/Linux or Univention distribution in file
+# /usr/share/common-licenses/AGPL-3; if not, see
+# <http://www.gnu.org/licenses/>.
+
+"""
+Size limited caches with expiring entries, used by the models.
+
+The caches live as long as the process (UMC module, import job, Celery
+worker). The size limit and the time to live keep them from growing
+forever and from serving data that was changed by other processes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional  # noqa: F401
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 600  # seconds
+
+NOT_CACHED = object()  # returned by ModelCache.get() if used as default and key is not in cache
+
+_caches = []  # type: List[ModelCache]
+
+
+class ModelCache(object):
+    """
+    Dict like, thread safe LRU cache with a maximum size and a time to live.
+
+    Entries that are older than `ttl` seconds are treated as missing. When
+    more than `max_size` entries are stored, the least recently used ones
+    are removed. Hits and misses are counted per type of key, see
+    :py:meth:`get_stats()`.
+    """
+
+    def __init__(self, name, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, type_of_key=None):
+        # type: (str, Optional[int], Optional[float], Optional[Callable[[Hashable], str]]) -> None
+        """
+        :param str name: name of the cache, used in the statistics
+        :param int max_size: maximum number of entries, `None` for no limit
+        :param float ttl: seconds after which an entry expires, `None` for never
+        :param type_of_key: function returning the type of an entry (e.g. the model class
+            name) from its key, used to group the statistics, defaults to `name`
+        """
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._type_of_key = type_of_key or (lambda key: name)
+        self._data = OrderedDict()  # type: Dict[Hashable, Any]
+        self._expires = {}  # type: Dict[Hashable, float]
+        self._stats = {}  # type: Dict[str, Dict[str, int]]
+        self._lock = threading.RLock()
+        _caches.append(self)
+
+    def __repr__(self):  # type: () -> str
+        return "{}(name={!r}, entries={}, max_size={!r}, ttl={!r})".format(
+            self.__class__.__name__, self.name, len(self._data), self.max_size, self.ttl
+        )
+
+    def get(self, key, default=None):  # type: (Hashable, Any) -> Any
+        """
+        Get a value from the cache and count the hit or miss.
+
+        :param key: key of the entry
+        :param default: value to return, if `key` is not in the cache or has expired
+        :return: the cached value or `default`
+        """
+        with self._lock:
+            if key in self._data and not self._expire(key):
+                self._data.move_to_end(key)
+                self._count(key, "hits")
+                return self._data[key]
+            self._count(key, "misses")
+            return default
+
+    def __getitem__(self, key):  # type: (Hashable) -> Any
+        value = self.get(key, NOT_CACHED)
+        if value is NOT_CACHED:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):  # type: (Hashable, Any) -> None
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            while self.max_size is not None and len(self._data) > self.max_size:
+                old_key, _value = self._data.popitem(last=False)
+                self._expires.pop(old_key, None)
+                self._count(old_key, "evictions")
+
+    def __delitem__(self, key):  # type: (Hashable) -> None
+        with self._lock:
+            del self._data[key]
+            self._expires.pop(key, None)
+
+    def __contains__(self, key):  # type: (Hashable) -> bool
+        with self._lock:
+            return key in self._data and not self._expire(key)
+
+    def __len__(self):  # type: () -> int
+        return len(self._data)
+
+    def keys(self):  # type: () -> List[Hashable]
+        with self._lock:
+            return [key for key in list(self._data) if not self._expire(key)]
+
+    def pop(self, key, default=None):  # type: (Hashable, Any) -> Any
+        with self._lock:
+            if key in self._data and not self._expire(key):
+                self._expires.pop(key, None)
+                return self._data.pop(key)
+            return default
+
+    def clear(self):  # type: () -> None
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    def invalidate(self, predicate):  # type: (Callable[[Hashable], bool]) -> int
+        """
+        Remove all entries whose key matches `predicate`.
+
+        :param predicate: function called with the key of each entry
+        :return: number of removed entries
+        :rtype: int
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+                self._expires.pop(key, None)
+                self._count(key, "invalidations")
+        return len(keys)
+
+    def get_stats(self):  # type: () -> Dict[str, Dict[str, int]]
+        """
+        Statistics per type of key.
+
+        :return: dict: type of key -> dict with the counters `hits`, `misses`, `evictions`,
+            `expirations` and `invalidations`
+        :rtype: dict
+        """
+        with self._lock:
+            return {type_of_key: dict(counters) for type_of_key, counters in self._stats.items()}
+
+    def reset_stats(self):  # type: () -> None
+        with self._lock:
+            self._stats.clear()
+
+    def _expire(self, key):  # type: (Hashable) -> bool
+        # must be called with self._lock held
+        expires = self._expires.get(key)
+        if expires is None or expires > time.monotonic():
+            return False
+        del self._data[key]
+        del self._expires[key]
+        self._count(key, "expirations")
+        return True
+
+    def _count(self, key, counter):  # type: (Hashable, str) -> None
+        counters = self._stats.setdefault(
+            self._type_of_key(key),
+            {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0},
+        )
+        counters[counter] += 1
+
+
+def get_cache_stats():  # type: () -> Dict[str, Dict[str, Dict[str, int]]]
+    """
+    Statistics of all caches of the models.
+
+    :return: dict: cache name -> statistics (see :py:meth:`ModelCache.get_stats()`)
+    :rtype: dict
+    """
+    return {cache.name: cache.get_stats() for cache in _caches}
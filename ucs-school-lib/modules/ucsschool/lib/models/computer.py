@@ -32,12 +32,12 @@
 
 import re
 from ipaddress import AddressValueError, IPv4Interface, NetmaskValueError
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type  # noqa: F401
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Type  # noqa: F401
 
 import six
 from ldap.filter import filter_format
 
-from univention.admin.uexceptions import nextFreeIp
+from univention.admin.uexceptions import nextFreeIp, noObject
 
 from ..roles import (
     create_ucsschool_role_string,
@@ -185,7 +185,7 @@ class SchoolDCSlave(RoleSupportMixin, SchoolDC):
             self.logger.info("Move complete")
             self.logger.warning("The Replica Directory Node has to be rejoined into the domain!")
         finally:
-            self.invalidate_cache()
+            self.invalidate_cached_object()
         return True
 
     def update_ucsschool_roles(self, lo):  # type: (LoType) -> None
@@ -405,7 +405,18 @@ class SchoolComputer(UCSSchoolHelperAbstractClass):
     @classmethod
     def get_class_for_udm_obj(cls, udm_obj, school):  # type: (UdmObject, str) -> Type[SchoolComputer]
         oc = udm_obj.lo.get(udm_obj.dn, ["objectClass"])
-        object_classes = oc.get("objectClass", [])
+        return cls._get_class_for_object_classes(oc.get("objectClass", []))
+
+    @classmethod
+    def _get_class_for_ldap_attrs(cls, dn, ldap_attrs, school):
+        # type: (str, Dict[str, List[bytes]], Optional[str]) -> Optional[Type[SchoolComputer]]
+        if cls._meta.udm_module != SchoolComputer._meta.udm_module:
+            return cls
+        return cls._get_class_for_object_classes(ldap_attrs.get("objectClass", []))
+
+    @classmethod
+    def _get_class_for_object_classes(cls, object_classes):
+        # type: (List[bytes]) -> Optional[Type[SchoolComputer]]
         if b"univentionWindows" in object_classes:
             return WindowsComputer
         if b"univentionMacOSClient" in object_classes:
@@ -419,21 +430,9 @@ class SchoolComputer(UCSSchoolHelperAbstractClass):
 
     @classmethod
     def from_udm_obj(cls, udm_obj, school, lo):  # type: (UdmObject, str, LoType) -> SchoolComputer
-        from ucsschool.lib.models.school import School
-
         obj = super(SchoolComputer, cls).from_udm_obj(udm_obj, school, lo)
         obj.ip_address = udm_obj["ip"]
-        school_obj = School.cache(obj.school)  # type: School
-        edukativnetz_group = school_obj.get_administrative_group_name(
-            "educational", domain_controller=False, as_dn=True
-        )
-        if edukativnetz_group in udm_obj["groups"]:
-            obj.zone = "edukativ"
-        verwaltungsnetz_group = school_obj.get_administrative_group_name(
-            "administrative", domain_controller=False, as_dn=True
-        )
-        if verwaltungsnetz_group in udm_obj["groups"]:
-            obj.zone = "verwaltung"
+        obj.zone = cls._get_zone(obj.school, udm_obj["groups"]) or obj.zone
         network_dn = udm_obj["network"]
         if network_dn:
             netmask = Network.get_netmask(network_dn, school, lo)
@@ -441,6 +440,60 @@ class SchoolComputer(UCSSchoolHelperAbstractClass):
         obj.inventory_number = ", ".join(udm_obj["inventoryNumber"])
         return obj
 
+    @classmethod
+    def _get_zone(cls, school, group_dns):  # type: (str, List[str]) -> Optional[str]
+        from ucsschool.lib.models.school import School
+
+        school_obj = School.cache(school)  # type: School
+        zone = None
+        edukativnetz_group = school_obj.get_administrative_group_name(
+            "educational", domain_controller=False, as_dn=True
+        )
+        if edukativnetz_group in group_dns:
+            zone = "edukativ"
+        verwaltungsnetz_group = school_obj.get_administrative_group_name(
+            "administrative", domain_controller=False, as_dn=True
+        )
+        if verwaltungsnetz_group in group_dns:
+            zone = "verwaltung"
+        return zone
+
+    @classmethod
+    def get_ldap_attribute_names(cls, attrs):  # type: (Iterable[str]) -> List[str]
+        return sorted(set(super(SchoolComputer, cls).get_ldap_attribute_names(attrs) + ["objectClass"]))
+
+    @classmethod
+    def get_member_groups(cls, lo, school, attrs):
+        # type: (LoType, str, Iterable[str]) -> Optional[Dict[str, List[str]]]
+        """Reads the members of the administrative groups of `school` for the `zone` of the computers."""
+        from ucsschool.lib.models.school import School
+
+        if "zone" not in attrs:
+            return None
+        school_obj = School.cache(school)  # type: School
+        member_groups = {}  # type: Dict[str, List[str]]
+        for zone in ("educational", "administrative"):
+            group_dn = school_obj.get_administrative_group_name(
+                zone, domain_controller=False, as_dn=True
+            )
+            try:
+                zone_groups = cls._search_member_groups(lo, group_dn, scope="base")
+            except noObject:
+                continue
+            for member_dn, group_dns in zone_groups.items():
+                member_groups.setdefault(member_dn, []).extend(group_dns)
+        return member_groups
+
+    @classmethod
+    def _values_from_ldap_attrs(cls, dn, ldap_attrs, school, member_groups):
+        # type: (str, Dict[str, List[bytes]], Optional[str], Optional[Dict[str, List[str]]]) -> Dict[str, Any]  # noqa: E501
+        values = super(SchoolComputer, cls)._values_from_ldap_attrs(
+            dn, ldap_attrs, school, member_groups
+        )
+        if member_groups is not None and values["school"]:
+            values["zone"] = cls._get_zone(values["school"], member_groups.get(dn.lower(), []))
+        return values
+
     def to_dict(self):  # type: () -> Dict[str, Any]
         ret = super(SchoolComputer, self).to_dict()
         ret["type_name"] = self.type_name
@@ -134,13 +134,22 @@ class Group(RoleSupportMixin, UCSSchoolHelperAbstractClass):
 
     @classmethod
     def get_class_for_udm_obj(cls, udm_obj, school):  # type: (UdmObject, str) -> Type["Group"]
-        if cls.is_school_class(school, udm_obj.dn):
+        return cls._get_class_for_dn(udm_obj.dn, school)
+
+    @classmethod
+    def _get_class_for_ldap_attrs(cls, dn, ldap_attrs, school):
+        # type: (str, Dict[str, List[bytes]], Optional[str]) -> Optional[Type["Group"]]
+        return cls._get_class_for_dn(dn, cls.get_school_from_dn(dn) or school)
+
+    @classmethod
+    def _get_class_for_dn(cls, dn, school):  # type: (str, str) -> Optional[Type["Group"]]
+        if cls.is_school_class(school, dn):
             return SchoolClass
-        elif cls.is_computer_room(school, udm_obj.dn):
+        elif cls.is_computer_room(school, dn):
             return ComputerRoom
-        elif cls.is_school_workgroup(school, udm_obj.dn):
+        elif cls.is_school_workgroup(school, dn):
             return WorkGroup
-        elif cls.is_school_group(school, udm_obj.dn):
+        elif cls.is_school_group(school, dn):
             return SchoolGroup
         return cls
 
@@ -298,9 +307,8 @@ class SchoolClass(Group, _MayHaveSchoolPrefix):
         return ret
 
     @classmethod
-    def get_class_for_udm_obj(cls, udm_obj, school):
-        # type: (UdmObject, str) -> Optional[Type[SchoolClass]]
-        if not cls.is_school_class(school, udm_obj.dn):
+    def _get_class_for_dn(cls, dn, school):  # type: (str, str) -> Optional[Type[SchoolClass]]
+        if not cls.is_school_class(school, dn):
             return  # is a workgroup
         return cls
 
@@ -340,9 +348,8 @@ class WorkGroup(EmailAttributesMixin, SchoolClass, _MayHaveSchoolPrefix):
         return cls.get_search_base(school).workgroups
 
     @classmethod
-    def get_class_for_udm_obj(cls, udm_obj, school):
-        # type: (UdmObject, str) -> Optional[Type[WorkGroup]]
-        if not cls.is_school_workgroup(school, udm_obj.dn):
+    def _get_class_for_dn(cls, dn, school):  # type: (str, str) -> Optional[Type[WorkGroup]]
+        if not cls.is_school_workgroup(school, dn):
             return
         return cls
 
@@ -38,6 +38,7 @@ from univention.admin.uexceptions import noObject
 
 from .attributes import Netmask, NetworkAttribute, NetworkBroadcastAddress, SubnetName
 from .base import UCSSchoolHelperAbstractClass
+from .cache import NOT_CACHED, ModelCache
 from .dhcp import DHCPSubnet
 from .utils import _, ucr
 
@@ -47,7 +48,7 @@ class Network(UCSSchoolHelperAbstractClass):
     network = NetworkAttribute(_("Network"))
     broadcast = NetworkBroadcastAddress(_("Broadcast"))
 
-    _netmask_cache = {}
+    _netmask_cache = ModelCache("netmasks", max_size=1000)
 
     @classmethod
     def get_container(cls, school):
@@ -122,9 +123,15 @@ class Network(UCSSchoolHelperAbstractClass):
         super(Network, cls).invalidate_cache()
         cls._netmask_cache.clear()
 
+    def invalidate_cached_object(self):
+        super(Network, self).invalidate_cached_object()
+        self._netmask_cache.pop(self.dn, None)
+        self._netmask_cache.pop(self.old_dn, None)
+
     @classmethod
     def get_netmask(cls, dn, school, lo):
-        if dn not in cls._netmask_cache:
+        netmask = cls._netmask_cache.get(dn, NOT_CACHED)
+        if netmask is NOT_CACHED:
             try:
                 network = cls.from_dn(dn, school, lo)
             except noObject:
@@ -139,7 +146,7 @@ class Network(UCSSchoolHelperAbstractClass):
                 netmask = str(ipv4_network.netmask)  # e.g. '255.255.255.0'
             cls.logger.debug("Network mask: %r is %r", dn, netmask)
             cls._netmask_cache[dn] = netmask
-        return cls._netmask_cache[dn]
+        return netmask
 
     class Meta:
         udm_module = "networks/network"
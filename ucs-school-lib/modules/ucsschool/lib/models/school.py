@@ -745,6 +745,16 @@ class School(RoleSupportMixin, UCSSchoolHelperAbstractClass):
         super(School, cls).invalidate_cache()
         User._samba_home_path_cache.clear()
 
+    def invalidate_cached_object(self):  # type: () -> None
+        from ucsschool.lib.models.user import User
+
+        super(School, self).invalidate_cached_object()
+        for name in {self.name, self.get_name_from_dn(self.old_dn)} - {None}:
+            self._search_base_cache.pop(name, None)
+        for dn in {self.dn, self.old_dn} - {None}:
+            User._samba_home_path_cache.pop(dn, None)
+            User._profile_path_cache.pop(dn, None)
+
     def set_ucsschool_role_for_dc(self, lo):  # type: (LoType) -> None
         """
         Set the ucsschool role for the computer on which the
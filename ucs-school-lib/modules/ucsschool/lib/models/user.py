@@ -32,9 +32,20 @@
 
 import os.path
 from collections import Mapping
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple, Type  # noqa: F401
+from typing import (  # noqa: F401
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
 
-from ldap.dn import escape_dn_chars, explode_rdn
+from ldap.dn import escape_dn_chars, explode_dn, explode_rdn
 from ldap.filter import filter_format
 from six import iteritems
 
@@ -44,6 +55,7 @@ from univention.admin.filter import conjunction, parse
 from univention.admin.uexceptions import noObject, valueError
 
 from ..roles import role_exam_user, role_pupil, role_school_admin, role_staff, role_student, role_teacher
+from ..schoolldap import SchoolSearchBase
 from .attributes import (
     Birthday,
     Disabled,
@@ -58,6 +70,7 @@ from .attributes import (
     WorkgroupsAttribute,
 )
 from .base import NoObject, RoleSupportMixin, UCSSchoolHelperAbstractClass, UnknownModel, WrongModel
+from .cache import NOT_CACHED, ModelCache
 from .computer import AnyComputer
 from .group import BasicGroup, Group, SchoolClass, SchoolGroup, WorkGroup
 from .misc import MailDomain
@@ -104,9 +117,9 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
         "(|(objectClass=ucsschoolTeacher)(objectClass=ucsschoolStaff)(objectClass=ucsschoolStudent))"
     )
 
-    _profile_path_cache = {}  # type: Dict[str, str]
-    _samba_home_path_cache = {}  # type: Dict[str, str]
-    # _samba_home_path_cache is invalidated in School.invalidate_cache()
+    _profile_path_cache = ModelCache("profile_paths", max_size=1000)  # type: Dict[str, str]
+    _samba_home_path_cache = ModelCache("samba_home_paths", max_size=1000)  # type: Dict[str, str]
+    # the path caches are invalidated in School.invalidate_cache() and School.invalidate_cached_object()
 
     roles = []  # type: List[str]
     default_roles = []  # type: List[str]
@@ -144,17 +157,17 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
         elif ucr.is_true("ucsschool/singlemaster", False):
             # in single server environments the Primary Directory Node is always the fileserver
             samba_home_path = r"\\%s" % ucr.get("hostname")
-        # if there's a cached result then use it
-        elif school.dn not in self._samba_home_path_cache:
-            samba_home_path = None
-            # get windows home server from OU object
-            school = self.get_school_obj(lo)
-            home_share_file_server = school.home_share_file_server
-            if home_share_file_server:
-                samba_home_path = r"\\%s" % self.get_name_from_dn(home_share_file_server)
-            self._samba_home_path_cache[school.dn] = samba_home_path
         else:
-            samba_home_path = self._samba_home_path_cache[school.dn]
+            # if there's a cached result then use it
+            samba_home_path = self._samba_home_path_cache.get(school.dn, NOT_CACHED)
+            if samba_home_path is NOT_CACHED:
+                samba_home_path = None
+                # get windows home server from OU object
+                school = self.get_school_obj(lo)
+                home_share_file_server = school.home_share_file_server
+                if home_share_file_server:
+                    samba_home_path = r"\\%s" % self.get_name_from_dn(home_share_file_server)
+                self._samba_home_path_cache[school.dn] = samba_home_path
         if samba_home_path is not None:
             return r"%s\%s" % (samba_home_path, self.name)
 
@@ -163,7 +176,8 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
         if ucr_variable is not None:
             return ucr_variable
         school = School.cache(self.school)
-        if school.dn not in self._profile_path_cache:
+        profile_path = self._profile_path_cache.get(school.dn)
+        if profile_path is None:
             profile_path = r"%s\%%USERNAME%%\windows-profiles\default"
             for computer in AnyComputer.get_all(
                 lo, self.school, "univentionService=Windows Profile Server"
@@ -173,7 +187,7 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
             else:
                 profile_path = profile_path % "%LOGONSERVER%"
             self._profile_path_cache[school.dn] = profile_path
-        return self._profile_path_cache[school.dn]
+        return profile_path
 
     def is_student(self, lo):  # type: (LoType) -> bool
         return self.__check_object_class(lo, "ucsschoolStudent", self._legacy_is_student)
@@ -234,19 +248,9 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
 
     @classmethod
     def get_class_for_udm_obj(cls, udm_obj, school):  # type: (UdmObject, str) -> Type["User"]
-        ocs = {x.decode("UTF-8") for x in udm_obj.oldattr.get("objectClass", [])}
-        if ocs >= {"ucsschoolTeacher", "ucsschoolStaff"}:
-            return TeachersAndStaff
-        if ocs >= {"ucsschoolExam", "ucsschoolStudent"}:
-            return ExamStudent
-        if "ucsschoolTeacher" in ocs:
-            return Teacher
-        if "ucsschoolStaff" in ocs:
-            return Staff
-        if "ucsschoolStudent" in ocs:
-            return Student
-        if "ucsschoolAdministrator" in ocs:
-            return SchoolAdmin
+        klass = cls._get_class_for_object_classes(udm_obj.oldattr.get("objectClass", []))
+        if klass:
+            return klass
 
         # legacy DN based checks
         if cls._legacy_is_student(school, udm_obj.dn):
@@ -262,6 +266,63 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
 
         return User
 
+    @classmethod
+    def _get_class_for_object_classes(cls, object_classes):
+        # type: (Iterable[bytes]) -> Optional[Type["User"]]
+        ocs = {x.decode("UTF-8") for x in object_classes}
+        if ocs >= {"ucsschoolTeacher", "ucsschoolStaff"}:
+            return TeachersAndStaff
+        if ocs >= {"ucsschoolExam", "ucsschoolStudent"}:
+            return ExamStudent
+        if "ucsschoolTeacher" in ocs:
+            return Teacher
+        if "ucsschoolStaff" in ocs:
+            return Staff
+        if "ucsschoolStudent" in ocs:
+            return Student
+        if "ucsschoolAdministrator" in ocs:
+            return SchoolAdmin
+
+    @classmethod
+    def _get_class_for_ldap_attrs(cls, dn, ldap_attrs, school):
+        # type: (str, Dict[str, List[bytes]], Optional[str]) -> Optional[Type["User"]]
+        return cls._get_class_for_object_classes(ldap_attrs.get("objectClass", [])) or cls
+
+    @classmethod
+    def get_ldap_attribute_names(cls, attrs):  # type: (Iterable[str]) -> List[str]
+        return sorted(set(super(User, cls).get_ldap_attribute_names(attrs) + ["objectClass"]))
+
+    @classmethod
+    def get_member_groups(cls, lo, school, attrs):
+        # type: (LoType, str, Iterable[str]) -> Optional[Dict[str, List[str]]]
+        """
+        Searches the groups of `school` for the `school_classes` and
+        `workgroups` of the users. Classes and workgroups of other schools are
+        not found.
+        """
+        attrs = list(attrs)
+        if "school_classes" not in attrs and "workgroups" not in attrs:
+            return None
+        return cls._search_member_groups(lo, cls.get_search_base(school).groups)
+
+    @classmethod
+    def _values_from_ldap_attrs(cls, dn, ldap_attrs, school, member_groups):
+        # type: (str, Dict[str, List[bytes]], Optional[str], Optional[Dict[str, List[str]]]) -> Dict[str, Any]  # noqa: E501
+        values = super(User, cls)._values_from_ldap_attrs(dn, ldap_attrs, school, member_groups)
+        if member_groups is not None:
+            school_classes = {}  # type: Dict[str, List[str]]
+            workgroups = {}  # type: Dict[str, List[str]]
+            schools = [x for x in values.get("schools") or [values["school"]] if x]
+            for group_dn in member_groups.get(dn.lower(), []):
+                for _school in schools:
+                    if Group.is_school_class(_school, group_dn):
+                        school_classes.setdefault(_school, []).append(cls.get_name_from_dn(group_dn))
+                    elif Group.is_school_workgroup(_school, group_dn):
+                        workgroups.setdefault(_school, []).append(cls.get_name_from_dn(group_dn))
+            values["school_classes"] = school_classes
+            values["workgroups"] = workgroups
+        return values
+
     @classmethod
     def from_udm_obj(cls, udm_obj, school, lo):  # type: (UdmObject, str, LoType) -> "User"
         obj = super(User, cls).from_udm_obj(udm_obj, school, lo)
@@ -339,37 +400,7 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
                 self.logger.error("Error removing %r from school %r.", self, removed_school)
                 return
 
-        # remove SchoolClasses or WorkGroups the user is not part of anymore
-        # ignore all others (global groups and $OU-groups)
-        mandatory_groups = self.groups_used(lo)
-        for group_dn in [dn for dn in udm_obj["groups"] if dn not in mandatory_groups]:
-            try:
-                school_class = SchoolClass.from_dn(group_dn, None, lo)
-                classes = self.school_classes.get(school_class.school, [])
-                if school_class.name not in classes and school_class.get_relative_name() not in classes:
-                    self.logger.debug("Removing %r from SchoolClass %r.", self, group_dn)
-                    udm_obj["groups"].remove(group_dn)
-            # it's not a class but could be a workgroup
-            except noObject:
-                try:
-                    workgroup = WorkGroup.from_dn(group_dn, None, lo)
-                    workgroups = self.workgroups.get(workgroup.school, [])
-                    if (
-                        workgroup.name not in workgroups
-                        and workgroup.get_relative_name() not in workgroups
-                    ):
-                        self.logger.debug("Removing %r from WorkGroup %r.", self, group_dn)
-                        udm_obj["groups"].remove(group_dn)
-                except noObject:
-                    continue
-
-        # make sure user is in all mandatory groups and school classes
-        current_groups = {grp_dn.lower() for grp_dn in udm_obj["groups"]}
-        groups_to_add = [dn for dn in mandatory_groups if dn.lower() not in current_groups]
-        # [dn for dn in mandatory_groups if dn.lower() not in current_groups]
-        if groups_to_add:
-            self.logger.debug("Adding %r to groups %r.", self, groups_to_add)
-            udm_obj["groups"].extend(groups_to_add)
+        self.reconcile_group_memberships(udm_obj, lo)
         if self.check_password_policies:
             udm_obj["overridePWHistory"] = "0"
             udm_obj["overridePWLength"] = "0"
@@ -389,10 +420,8 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
         self.workgroups.pop(old_school, None)
         udm_obj = self.get_udm_object(lo)
         udm_obj["primaryGroup"] = self.primary_group_dn(lo)
-        groups = set(udm_obj["groups"])
-        at_least_groups = set(self.groups_used(lo))
-        if (groups | at_least_groups) != groups:
-            udm_obj["groups"] = list(groups | at_least_groups)
+        # only add the user to the groups of the new school
+        self.reconcile_group_memberships(udm_obj, lo, remove=False)
         subdir = self.get_roleshare_home_subdir()
         udm_obj["unixhome"] = "/home/" + os.path.join(subdir, self.name)
         samba_home = self.get_samba_home_path(lo)
@@ -415,6 +444,51 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
             udm_obj["school"].remove(old_school)
         udm_obj.modify(ignore_license=True)
 
+    def reconcile_group_memberships(self, udm_obj, lo, remove=True):
+        # type: (UdmObject, LoType, Optional[bool]) -> Tuple[List[str], List[str]]
+        """
+        Make the group memberships in `udm_obj["groups"]` match :py:meth:`groups_used()`.
+
+        SchoolClasses and WorkGroups the user is not part of anymore are
+        removed (unless `remove` is `False`), missing mandatory groups are
+        added. All other groups (global groups and $OU-groups) are ignored.
+        Groups are classified by their position in LDAP, so no group object
+        has to be opened. `udm_obj` is not saved.
+
+        :param udm_obj: UDM object of the user
+        :param lo: LDAP connection object
+        :param bool remove: whether to remove SchoolClasses and WorkGroups
+        :return: the group DNs removed and the group DNs added
+        :rtype: tuple(list(str), list(str))
+        """
+        mandatory_groups = self.groups_used(lo)
+        mandatory_groups_lower = {dn.lower() for dn in mandatory_groups}
+        school_class_regex = SchoolSearchBase.get_schoolclass_pos_regex()
+        workgroup_regex = SchoolSearchBase.get_workgroup_pos_regex()
+        current_groups = udm_obj["groups"]
+        groups_to_remove = []
+        for group_dn in current_groups:
+            if not remove or group_dn.lower() in mandatory_groups_lower:
+                continue
+            position = ",".join(explode_dn(group_dn)[1:])
+            if school_class_regex.match(position):
+                self.logger.debug("Removing %r from SchoolClass %r.", self, group_dn)
+            elif workgroup_regex.match(position):
+                self.logger.debug("Removing %r from WorkGroup %r.", self, group_dn)
+            else:
+                continue
+            groups_to_remove.append(group_dn)
+
+        current_groups_lower = {dn.lower() for dn in current_groups}
+        groups_to_add = [dn for dn in mandatory_groups if dn.lower() not in current_groups_lower]
+        if groups_to_add:
+            self.logger.debug("Adding %r to groups %r.", self, groups_to_add)
+        if groups_to_remove or groups_to_add:
+            udm_obj["groups"] = [
+                dn for dn in current_groups if dn not in groups_to_remove
+            ] + groups_to_add
+        return groups_to_remove, groups_to_add
+
     def _alter_udm_obj(self, udm_obj):  # type: (UdmObject) -> None
         if self.email is not None:
             udm_obj["e-mail"] = self.email
@@ -789,20 +863,11 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
     @classmethod
     def lookup(cls, lo, school, filter_s="", superordinate=None):
         # type: (LoType, str, Optional[UldapFilter], Optional[SuperOrdinateType]) -> List[UdmObject]
-        filter_object_type = conjunction(
-            "&",
-            [
-                parse(cls.type_filter),
-                parse(filter_format("ucsschoolSchool=%s", [school])),
-            ],
-        )
-        if filter_s:
-            filter_object_type = conjunction("&", [filter_object_type, parse(filter_s)])
         objects = udm_modules.lookup(
             cls._meta.udm_module,
             None,
             lo,
-            filter="{}".format(filter_object_type),
+            filter=cls._get_school_type_filter(school, filter_s),
             scope="sub",
             superordinate=superordinate,
         )
@@ -813,6 +878,28 @@ class User(RoleSupportMixin, UCSSchoolHelperAbstractClass):
         )
         return objects
 
+    @classmethod
+    def _iter_lookup_filter_and_base(cls, school, filter_s):
+        # type: (str, str) -> List[Tuple[str, str]]
+        # like lookup(): users of this type in `school` anywhere in LDAP, then all in the container
+        return [(cls._get_school_type_filter(school, filter_s), "")] + super(
+            User, cls
+        )._iter_lookup_filter_and_base(school, filter_s)
+
+    @classmethod
+    def _get_school_type_filter(cls, school, filter_s=""):
+        # type: (str, Optional[UldapFilter]) -> str
+        filter_object_type = conjunction(
+            "&",
+            [
+                parse(cls.type_filter),
+                parse(filter_format("ucsschoolSchool=%s", [school])),
+            ],
+        )
+        if filter_s:
+            filter_object_type = conjunction("&", [filter_object_type, parse(filter_s)])
+        return "{}".format(filter_object_type)
+
     class Meta:
         udm_module = "users/user"
         name_is_unique = True
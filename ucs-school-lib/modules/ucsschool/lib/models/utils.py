@@ -43,15 +43,31 @@ from contextlib import contextmanager
 from io import IOBase
 from logging.handlers import MemoryHandler, TimedRotatingFileHandler
 from random import choice, shuffle
-from typing import IO, Any, Dict, List, Optional, Sequence, Tuple, Union  # noqa: F401
+from typing import (  # noqa: F401
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import apt
 import colorlog
 import lazy_object_proxy
+import ldap
 import ruamel.yaml
+from ldap.controls import SimplePagedResultsControl
+from ldap.dn import dn2str, str2dn
+from ldap.filter import filter_format
 from six import string_types
 
 import univention.debug as ud
+from univention.admin.uexceptions import noObject
 from univention.config_registry import ConfigRegistry, handler_set
 from univention.lib.i18n import Translation
 from univention.lib.policy_result import policy_result
@@ -104,6 +120,9 @@ FILE_LOG_FORMATS = lazy_object_proxy.Proxy(lambda: _logging_config["file"])  # t
 LOG_DATETIME_FORMAT = lazy_object_proxy.Proxy(lambda: _logging_config["date"])  # type: str
 LOG_COLORS = lazy_object_proxy.Proxy(lambda: _logging_config["colors"])  # type: Dict[str, str]
 
+LDAP_PAGE_SIZE = 1000
+MAX_FILTER_TERMS = 500
+
 _handler_cache = {}  # type: Dict[str, logging.Handler]
 _pw_length_cache = {}  # type: Dict[str, int]
 ucr = lazy_object_proxy.Proxy(_ucr)  # type: ConfigRegistry  # "global" ucr for ucsschool.lib.models
@@ -407,6 +426,87 @@ def flatten(list_of_lists):  # type: (List[List[Any]]) -> List[Any]
     return ret
 
 
+def paged_search(lo, filter_s, attr=None, base="", scope="sub", page_size=LDAP_PAGE_SIZE):
+    # type: (Any, str, Optional[List[str]], Optional[str], Optional[str], Optional[int]) -> Iterator[Tuple[str, Dict[str, List[bytes]]]]  # noqa: E501
+    """
+    Search LDAP using the simple paged results control (RFC 2696).
+
+    Results are yielded page by page, so the caller can process large
+    result sets without holding all of them in memory and the LDAP server
+    does not hit its size limit.
+
+    :param lo: LDAP connection object (`univention.admin.uldap.access`)
+    :param str filter_s: LDAP filter
+    :param attr: LDAP attributes to fetch, `None` for all
+    :type attr: list(str) or None
+    :param str base: search base, defaults to LDAP base of `lo`
+    :param str scope: search scope (`base`, `one` or `sub`)
+    :param int page_size: number of entries to request per page
+    :return: iterator over `(dn, attrs)` tuples
+    :rtype: Iterator[tuple(str, dict(str, list(bytes)))]
+    """
+    page_ctrl = SimplePagedResultsControl(True, size=page_size, cookie="")
+    while True:
+        response = {}
+        results = lo.search(
+            filter_s, base=base, scope=scope, attr=attr or [], serverctrls=[page_ctrl], response=response
+        )
+        for result in results:
+            yield result
+        page_ctrl.cookie = ""
+        for ctrl in response.get("ctrls", []):
+            if ctrl.controlType == SimplePagedResultsControl.controlType:
+                page_ctrl.cookie = ctrl.cookie
+        if not page_ctrl.cookie:
+            break
+
+
+def search_by_dn(lo, dns, filter_s="", attr=None, max_filter_terms=MAX_FILTER_TERMS):
+    # type: (Any, Iterable[str], Optional[str], Optional[List[str]], Optional[int]) -> Iterator[Tuple[str, Dict[str, List[bytes]]]]  # noqa: E501
+    """
+    Search the LDAP objects `dns` with one search per parent container and
+    `max_filter_terms` objects, using an OR filter of their RDNs, instead of
+    reading every object on its own.
+
+    Objects that don't exist, whose container doesn't exist or that don't
+    match `filter_s` are skipped.
+
+    :param lo: LDAP connection object (`univention.admin.uldap.access`)
+    :param dns: DNs of the objects to search
+    :type dns: list(str)
+    :param str filter_s: LDAP filter the objects must match additionally
+    :param attr: LDAP attributes to fetch, `None` for all, `["dn"]` for none
+    :type attr: list(str) or None
+    :param int max_filter_terms: maximum number of RDNs in one LDAP filter
+    :return: iterator over `(dn, attrs)` tuples, `dn` as given in `dns`
+    :rtype: Iterator[tuple(str, dict(str, list(bytes)))]
+    """
+    # lower case parent container -> lower case RDN -> DNs as given
+    dns_by_parent = collections.defaultdict(dict)  # type: Dict[str, Dict[str, List[str]]]
+    for dn in set(dns):
+        rdns = str2dn(dn)
+        dns_by_parent[dn2str(rdns[1:]).lower()].setdefault(dn2str(rdns[:1]).lower(), []).append(dn)
+    for parent, dns_by_rdn in dns_by_parent.items():
+        rdns = sorted(dns_by_rdn)
+        for start in range(0, len(rdns), max_filter_terms):
+            rdn_filter = "(|{})".format(
+                "".join(_rdn_filter(rdn) for rdn in rdns[start : start + max_filter_terms])
+            )
+            search_filter = "(&{}{})".format(filter_s, rdn_filter) if filter_s else rdn_filter
+            try:
+                results = lo.search(search_filter, base=parent, scope="one", attr=attr or [])
+            except (noObject, ldap.NO_SUCH_OBJECT):
+                break  # the container doesn't exist
+            for result_dn, attrs in results:
+                for dn in dns_by_rdn.get(dn2str(str2dn(result_dn)[:1]).lower(), []):
+                    yield dn, attrs
+
+
+def _rdn_filter(rdn):  # type: (str) -> str
+    terms = [filter_format("(%s=%s)", (attr, value)) for attr, value, _flags in str2dn(rdn)[0]]
+    return terms[0] if len(terms) == 1 else "(&{})".format("".join(terms))
+
+
 def loglevel_int2str(level):  # type: (Union[int, str]) -> str
     """Convert numeric loglevel to string name."""
     if isinstance(level, int):
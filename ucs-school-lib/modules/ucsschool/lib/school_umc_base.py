@@ -31,8 +31,9 @@
 # <http://www.gnu.org/licenses/>.
 
 import re
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple  # noqa: F401
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Type  # noqa: F401
 
+from ldap.dn import str2dn
 from ldap.filter import escape_filter_chars, filter_format
 
 import univention.admin.modules as udm_modules
@@ -51,6 +52,9 @@ if TYPE_CHECKING:
     from univention.admin.handlers import simpleLdap as UdmObject  # noqa: F401
     from univention.admin.uldap import access as LoType  # noqa: F401
 
+    from .models.base import ReadOnlyModel  # noqa: F401
+    from .models.user import User  # noqa: F401
+
 # load UDM modules
 udm_modules.update()
 
@@ -58,6 +62,9 @@ __bind_callback = None
 
 _ = Translation("python-ucs-school").translate
 
+# attributes of the objects returned by SchoolBaseModule._user_records()
+USER_RECORD_ATTRS = ("name", "school", "schools", "firstname", "lastname", "ucsschool_roles")
+
 
 class SchoolSanitizer(StringSanitizer):
     def _sanitize(self, value, name, further_args):
@@ -212,67 +219,66 @@ class SchoolBaseModule(Base):
         )
 
     def _users(self, ldap_connection, school, group=None, user_type=None, pattern=""):
-        # type: (LoType, str, Optional[str], Optional[str], Optional[str]) -> List[ucsschool.lib.models.User]  # noqa: E501
-        """Returns a list of all users given 'pattern', 'school' (search base) and 'group'"""
-        import ucsschool.lib.models
+        # type: (LoType, str, Optional[str], Optional[str], Optional[str]) -> List[UdmObject]
+        """
+        Returns a list of all users given 'pattern', 'school' (search base) and 'group' as UDM
+        objects.
 
-        if not user_type:
-            classes = [ucsschool.lib.models.User]
-        elif user_type.lower() in ("teachers", "teacher"):
-            classes = [ucsschool.lib.models.Teacher, ucsschool.lib.models.TeachersAndStaff]
-        elif user_type.lower() in ("student", "students", "pupil", "pupils"):
-            classes = [ucsschool.lib.models.Student]
-        else:
-            raise TypeError("user_type %r unknown." % (user_type,))
-
-        # open the group
-        groupObj = None
-        if group not in (None, "None"):
-            groupModule = udm_modules.get("groups/group")
-            groupObj = groupModule.object(None, ldap_connection, None, group)
-            groupObj.open()
-
-            # lazy loading of exception classes to prevent import loop
-            from ucsschool.lib.models.base import UnknownModel, WrongModel
-
-            # The following code block prevents a massive performance loss if the group
-            # contains far less users than all available users. The else-block opens
-            # all available users ==> high LDAP load! (Bug #42167)
-            users = []
-            for userdn in set(groupObj["users"]):
-                search_filter_list = [LDAP_Filter.forSchool(school)]
-                if pattern:
-                    search_filter_list.append(LDAP_Filter.forUsers(pattern))
-                # concatenate LDAP filters
-                search_filter = u"{}".format(
-                    conjunction("&", [parse(subfilter) for subfilter in search_filter_list])
-                )
-                for cls in classes:
-                    try:
-                        udm_obj = cls.get_only_udm_obj(ldap_connection, search_filter, base=userdn)
-                    except noObject:
-                        MODULE.error(
-                            "Possible group inconsistency detected: %r contains member %r but member "
-                            "was not found in LDAP" % (group, userdn)
-                        )
-                        udm_obj = None
-
-                    if udm_obj is not None:
-                        # make sure that the found UDM object is of requested user type
-                        try:
-                            cls.from_udm_obj(udm_obj, school, ldap_connection)
-                        except (UnknownModel, WrongModel):
-                            continue
-
-                        users.append(udm_obj)
-        else:
-            # be aware that this search opens all user objects of specified type and may take some time!
-            users = []
-            for cls in classes:
-                _users = cls.get_all(ldap_connection, school, LDAP_Filter.forUsers(pattern))
-                users.extend(user.get_udm_object(ldap_connection) for user in _users)
+        Use :py:meth:`_user_records()` if the names of the users are sufficient, it does not open
+        UDM objects.
+        """
+        import univention.admin.objects as udm_objects
+        from ucsschool.lib.models.user import User
+
+        User.init_udm_module(ldap_connection)
+        user_module = udm_modules.get("users/user")
+        results, missing = self._search_users(ldap_connection, school, group, user_type, pattern)
+        self._log_missing_members(group, missing)
+        users = []
+        for dn, attrs in results:
+            udm_obj = udm_objects.get(user_module, None, ldap_connection, None, dn, attributes=attrs)
+            udm_obj.open()
+            users.append(udm_obj)
         return users
 
+    def _user_records(
+        self, ldap_connection, school, group=None, user_type=None, pattern="", attrs=USER_RECORD_ATTRS
+    ):
+        # type: (LoType, str, Optional[str], Optional[str], Optional[str], Iterable[str]) -> List[ReadOnlyModel]  # noqa: E501
+        """
+        Returns a list of all users given 'pattern', 'school' (search base) and 'group' as
+        lightweight, read-only objects (see
+        :py:meth:`ucsschool.lib.models.base.UCSSchoolHelperAbstractClass.from_ldap_attrs()`).
+
+        Only the LDAP attributes needed for the model attributes `attrs` are read. The class of
+        the objects (e.g. `Student` or `Teacher`) is determined by their LDAP object classes and
+        can be found in their `model` attribute.
+        """
+        from ucsschool.lib.models.base import UnknownModel, WrongModel
+        from ucsschool.lib.models.user import User
+
+        User.init_udm_module(ldap_connection)
+        results, missing = self._search_users(
+            ldap_connection, school, group, user_type, pattern, User.get_ldap_attribute_names(attrs)
+        )
+        self._log_missing_members(group, missing)
+        member_groups = User.get_member_groups(ldap_connection, school, attrs)
+        users = []
+        for dn, ldap_attrs in results:
+            try:
+                users.append(User.from_ldap_attrs(dn, ldap_attrs, school, member_groups))
+            except (UnknownModel, WrongModel):
+                continue
+        return users
+
+    @staticmethod
+    def _log_missing_members(group, missing):  # type: (Optional[str], List[str]) -> None
+        for userdn in missing:
+            MODULE.error(
+                "Possible group inconsistency detected: %r contains member %r but member "
+                "was not found in LDAP" % (group, userdn)
+            )
+
     def _users_ldap(self, ldap_connection, school, group=None, user_type=None, pattern="", attr=None):
         # type: (LoType, str, Optional[str], Optional[str], Optional[str], Optional[str]) -> List[Tuple[str, Dict[str, Any]]]  # noqa: E501
         """
@@ -304,88 +310,99 @@ class SchoolBaseModule(Base):
         Returns a list of LDAP query result tuples (dn, attr) of all users
         given  `pattern`, `school` (search base) and `group`.
         """
+        results, missing = self._search_users(
+            ldap_connection, school, group, user_type, pattern, attr or [], escape_pattern=False
+        )
+        users = [{"dn": dn, "attrs": attrs} for dn, attrs in results]
+        for userdn in missing:
+            # Bug #50231 prevent crashing
+            users.append(
+                {
+                    "dn": userdn,
+                    "attrs": noObject(
+                        "User with DN: {} was not found in the group {}."
+                        " Please make sure it is a valid UCS@school user"
+                        " and is member of all "
+                        "necessary groups. For more information visit https://help.univention.com"
+                        "/t/how-an-ucs-school-user-should-look-like/15630".format(userdn, group)
+                    ),
+                }
+            )
+        # members that are not of the requested user type or don't match the pattern are ignored
+        return users
+
+    @staticmethod
+    def _get_user_classes(user_type):  # type: (Optional[str]) -> List[Type[User]]
         import ucsschool.lib.models
 
         if not user_type:
-            classes = [ucsschool.lib.models.User]
+            return [ucsschool.lib.models.User]
         elif user_type.lower() in ("teachers", "teacher"):
-            classes = [ucsschool.lib.models.Teacher, ucsschool.lib.models.TeachersAndStaff]
+            return [ucsschool.lib.models.Teacher, ucsschool.lib.models.TeachersAndStaff]
         elif user_type.lower() in ("student", "students", "pupil", "pupils"):
-            classes = [ucsschool.lib.models.Student]
+            return [ucsschool.lib.models.Student]
         elif user_type.lower() in ("staff",):
-            classes = [ucsschool.lib.models.Staff, ucsschool.lib.models.TeachersAndStaff]
-        else:
-            raise TypeError("user_type %r unknown." % (user_type,))
+            return [ucsschool.lib.models.Staff, ucsschool.lib.models.TeachersAndStaff]
+        raise TypeError("user_type %r unknown." % (user_type,))
+
+    def _search_users(
+        self,
+        ldap_connection,
+        school,
+        group=None,
+        user_type=None,
+        pattern="",
+        attr=None,
+        escape_pattern=True,
+        max_filter_terms=None,
+    ):
+        # type: (LoType, str, Optional[str], Optional[str], Optional[str], Optional[List[str]], Optional[bool], Optional[int]) -> Tuple[List[Tuple[str, Dict[str, List[bytes]]]], List[str]]  # noqa: E501
+        """
+        Search the users given `pattern`, `school` and `group` with as few LDAP searches as
+        possible: all users of a school with one paged search, the members of a group with one
+        search per container and `max_filter_terms` members (see
+        :py:func:`ucsschool.lib.models.utils.search_by_dn()`). Before, each member was searched
+        separately with a base search per user class (Bug #42167).
+
+        :param attr: LDAP attributes to fetch, `None` for all
+        :return: tuple: list of LDAP search results `(dn, attrs)` and list of the DNs of group
+            members that don't exist in LDAP
+        :raises noObject: if `group` does not exist
+        """
+        from ucsschool.lib.models.utils import MAX_FILTER_TERMS, paged_search, search_by_dn
 
-        attr = attr or []
-        users = []
-        user_module = udm_modules.get("users/user")
-        if group not in (None, "None"):
-            # The following code block prevents a massive performance loss if the group
-            # contains far less users than all available users. The else-block opens
-            # all available users ==> high LDAP load! (Bug #42167)
-
-            user_dns = [
-                member.decode("utf-8") for member in ldap_connection.get(group).get("uniqueMember", [])
-            ]
-
-            for userdn in set(user_dns):
-                search_filter_list = [LDAP_Filter.forSchool(school)]
-                if pattern:
-                    search_filter_list.append(LDAP_Filter.forUsers(pattern, False))
-                for cls in classes:
-                    search_filter_list.append(cls.type_filter)
-                    # concatenate LDAP filters
-                    search_filter = u"{}".format(
-                        user_module.lookup_filter(
-                            conjunction("&", [parse(subfilter) for subfilter in search_filter_list])
-                        )
-                    )
-
-                    try:
-                        ldap_objs = ldap_connection.search(search_filter, base=userdn, attr=attr)
-                    except noObject:
-                        # Bug #50231 prevent crashing
-                        ldap_objs = [
-                            (
-                                userdn,
-                                noObject(
-                                    "User with DN: {} was not found in the group {}."
-                                    " Please make sure it is a valid UCS@school user"
-                                    " and is member of all "
-                                    "necessary groups. For more information visit https://help.univention.com"
-                                    "/t/how-an-ucs-school-user-should-look-like/15630".format(
-                                        userdn, group
-                                    )
-                                ),
-                            )
-                        ]
-                    if len(ldap_objs) == 1:
-                        users.append({"dn": ldap_objs[0][0], "attrs": ldap_objs[0][1]})
-                    # else:
-                    # either: 'Possible group inconsistency detected: %r contains member %r but member
-                    # was not found in LDAP' % (group, userdn))
-                    # or: DN does not belong to teacher/student (WrongModel)
-                    # in both cases: ignore user
-        else:
-            for cls in classes:
-                filter_s = u"{}".format(
-                    user_module.lookup_filter(
-                        conjunction(
-                            "&",
-                            [
-                                parse(LDAP_Filter.forSchool(school)),
-                                parse(LDAP_Filter.forUsers(pattern, False)),
-                                parse(cls.type_filter),
-                            ],
-                        )
-                    )
-                )
-                # Bug #50231 prevent crashing
-                # previous list extend needs to be reformatted
-                for dn, _attr in ldap_connection.search(filter=filter_s, attr=attr):
-                    users.append({"dn": dn, "attrs": _attr})
-        return users
+        max_filter_terms = max_filter_terms or MAX_FILTER_TERMS
+        classes = self._get_user_classes(user_type)
+        search_filter_list = [LDAP_Filter.forSchool(school)]
+        if pattern:
+            search_filter_list.append(LDAP_Filter.forUsers(pattern, escape_pattern))
+        search_filter_list.append("(|%s)" % "".join(cls.type_filter for cls in classes))
+        filter_s = u"{}".format(
+            udm_modules.get("users/user").lookup_filter(
+                conjunction("&", [parse(subfilter) for subfilter in search_filter_list])
+            )
+        )
+        if group in (None, "None"):
+            return list(paged_search(ldap_connection, filter_s, attr=attr)), []
+
+        group_attrs = ldap_connection.get(group, attr=["uniqueMember"], required=True)  # or noObject
+        member_dns = []  # type: List[str]
+        for member in group_attrs.get("uniqueMember", []):
+            dn = member.decode("UTF-8")
+            if str2dn(dn)[0][0][0].lower() == "uid":  # other members (e.g. computers) can't be users
+                member_dns.append(dn)
+
+        results = list(search_by_dn(ldap_connection, member_dns, filter_s, attr, max_filter_terms))
+        found = {dn for dn, _attrs in results}
+        # the remaining members either don't match the filter or don't exist
+        not_found = [dn for dn in member_dns if dn not in found]
+        existing = {
+            dn
+            for dn, _attrs in search_by_dn(
+                ldap_connection, not_found, attr=["dn"], max_filter_terms=max_filter_terms
+            )
+        }
+        return results, [dn for dn in not_found if dn not in existing]
 
 
 class LDAP_Filter:
@@ -469,6 +486,14 @@ class Display:
 
         return fullname + " (%(username)s)" % udm_object
 
+    @staticmethod
+    def user_record(record):  # type: (ReadOnlyModel) -> str
+        fullname = record.lastname or ""
+        if record.firstname:
+            fullname += ", %s" % record.firstname
+
+        return fullname + " (%s)" % record.name
+
     @staticmethod
     def user_ldap(ldap_object):  # type: (Dict[str, Any]) -> str
         fullname = ldap_object.get("sn", [b""])[0].decode("utf-8")
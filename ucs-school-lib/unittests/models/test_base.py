@@ -0,0 +1,109 @@
+import sys
+
+import pytest
+
+sys.path.insert(1, "modules")
+from ucsschool.lib.models import base  # noqa: E402
+from ucsschool.lib.models.group import SchoolClass  # noqa: E402
+from ucsschool.lib.models.user import ExamStudent, Student, Teacher  # noqa: E402
+from ucsschool.lib.models.utils import ucr  # noqa: E402
+
+ldapbase = ucr.get("ldap/base")
+school_name = "MustermannSchule"
+
+
+class FakeModule(object):
+    @staticmethod
+    def lookup_filter(filter_s, lo):
+        return filter_s
+
+
+class FakeUdmObj(object):
+    def __init__(self, dn):
+        self.dn = dn
+
+
+@pytest.fixture
+def fake_ldap(monkeypatch):
+    """Results per search (filter, base), the searches are recorded in `searches`."""
+    directory = {"results": {}, "searches": []}
+
+    def search(filter_s, base):
+        base = base or ""
+        directory["searches"].append((str(filter_s), base))
+        return directory["results"].get((str(filter_s), base), [])
+
+    def udm_lookup(module, co, lo, filter="", base="", scope="sub", superordinate=None):
+        return [FakeUdmObj(dn) for dn in search(filter, base)]
+
+    def paged_search(lo, filter_s, attr=None, base="", page_size=None):
+        return ((dn, {}) for dn in search(filter_s, base))
+
+    monkeypatch.setattr(base.udm_modules, "lookup", udm_lookup)
+    monkeypatch.setattr(base.udm_modules, "get", lambda name: FakeModule)
+    monkeypatch.setattr(base, "paged_search", paged_search)
+    return directory
+
+
+def prepare_model(monkeypatch, model):
+    monkeypatch.setattr(model, "init_udm_module", classmethod(lambda cls, lo: None))
+    monkeypatch.setattr(model, "get_ldap_attribute_names", classmethod(lambda cls, attrs: []))
+    monkeypatch.setattr(model, "get_member_groups", classmethod(lambda cls, lo, school, attrs: None))
+    monkeypatch.setattr(model, "from_udm_obj", classmethod(lambda cls, udm_obj, school, lo: udm_obj.dn))
+    monkeypatch.setattr(
+        model, "from_ldap_attrs", classmethod(lambda cls, dn, attrs, school=None, member_groups=None: dn)
+    )
+
+
+@pytest.mark.parametrize("model", [Student, ExamStudent, Teacher])
+def test_iter_all_finds_the_same_users_as_get_all(fake_ldap, monkeypatch, model):
+    prepare_model(monkeypatch, model)
+    filter_s = model._get_all_filter(school_name)
+    container = model.get_container(school_name)
+    in_other_ou = "uid=multi,cn=users,ou=OtherSchool,{}".format(ldapbase)
+    in_both = "uid=both,{}".format(container)
+    in_container = "uid=local,{}".format(container)
+    fake_ldap["results"] = {
+        (model._get_school_type_filter(school_name, filter_s), ""): [in_other_ou, in_both],
+        (filter_s, container): [in_both, in_container],
+    }
+
+    udm_users = model.get_all(None, school_name)
+    udm_searches = sorted(fake_ldap["searches"])
+    del fake_ldap["searches"][:]
+    read_users = list(model.iter_all(None, school_name, attrs=["name"]))
+
+    assert sorted(fake_ldap["searches"]) == udm_searches
+    assert read_users == udm_users == [in_other_ou, in_both, in_container]
+
+
+def test_iter_all_searches_container(fake_ldap, monkeypatch):
+    prepare_model(monkeypatch, SchoolClass)
+    filter_s = SchoolClass._get_all_filter(school_name, "name=foo")
+    container = SchoolClass.get_container(school_name)
+    class_dn = "cn={}-foo,{}".format(school_name, container)
+    fake_ldap["results"] = {(filter_s, container): [class_dn]}
+
+    assert SchoolClass.get_all(None, school_name, "name=foo") == [class_dn]
+    assert list(SchoolClass.iter_all(None, school_name, "name=foo", attrs=["name"])) == [class_dn]
+    assert fake_ldap["searches"] == [(filter_s, container)] * 2
+
+
+def test_user_member_groups_are_read_from_unique_member(monkeypatch):
+    search_base = Student.get_search_base(school_name)
+    class_dn = "cn={}-1a,{}".format(school_name, search_base.classes)
+    user_dn = "uid=demo.student,cn=schueler,cn=users,{}".format(search_base.schoolDN)
+    searches = []
+
+    def paged_search(lo, filter_s, attr=None, base="", scope="sub", page_size=None):
+        searches.append((attr, base))
+        return iter([(class_dn, {"uniqueMember": [user_dn.upper().encode("UTF-8")]})])
+
+    monkeypatch.setattr(base, "paged_search", paged_search)
+
+    assert Student.get_member_groups(None, school_name, ["name"]) is None
+    assert searches == []
+    assert Student.get_member_groups(None, school_name, ["name", "school_classes"]) == {
+        user_dn.lower(): [class_dn]
+    }
+    assert searches == [(["uniqueMember"], search_base.groups)]
@@ -0,0 +1,47 @@
+import sys
+
+sys.path.insert(1, "modules")
+from ucsschool.lib.models import cache  # noqa: E402
+from ucsschool.lib.models.cache import NOT_CACHED, ModelCache  # noqa: E402
+
+
+def test_max_size_evicts_least_recently_used():
+    model_cache = ModelCache("test_max_size", max_size=2, ttl=None)
+    model_cache["a"] = 1
+    model_cache["b"] = 2
+    assert model_cache.get("a") == 1
+    model_cache["c"] = 3
+    assert model_cache.keys() == ["a", "c"]
+    assert model_cache.get("b", NOT_CACHED) is NOT_CACHED
+    assert model_cache.get_stats() == {
+        "test_max_size": {"hits": 1, "misses": 1, "evictions": 1, "expirations": 0, "invalidations": 0}
+    }
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    model_cache = ModelCache("test_ttl", ttl=10)
+    model_cache["a"] = None
+    now[0] += 9
+    assert "a" in model_cache
+    assert model_cache.get("a", NOT_CACHED) is None
+    now[0] += 1
+    assert "a" not in model_cache
+    assert model_cache.get("a", NOT_CACHED) is NOT_CACHED
+    assert model_cache.get_stats()["test_ttl"]["expirations"] == 1
+
+
+def test_invalidate_and_stats_per_type():
+    model_cache = ModelCache("test_invalidate", type_of_key=lambda key: key[0])
+    model_cache[("School", ("name", "ou1"))] = 1
+    model_cache[("School", ("name", "ou2"))] = 2
+    model_cache[("Student", ("name", "ou1"))] = 3
+    assert model_cache.invalidate(lambda key: key[0] == "School" and key[1] == ("name", "ou1")) == 1
+    assert model_cache.get(("School", ("name", "ou1"))) is None
+    assert model_cache.get(("Student", ("name", "ou1"))) == 3
+    stats = model_cache.get_stats()
+    assert stats["School"]["invalidations"] == 1
+    assert stats["School"]["misses"] == 1
+    assert stats["Student"]["hits"] == 1
+    assert "test_invalidate" in cache.get_cache_stats()
@@ -0,0 +1,48 @@
+import sys
+
+sys.path.insert(1, "modules")
+from ucsschool.lib.models.user import Teacher  # noqa: E402
+from ucsschool.lib.models.utils import ucr  # noqa: E402
+
+ldapbase = ucr.get("ldap/base")
+school_name = "MustermannSchule"
+school_dn = "ou={},{}".format(school_name, ldapbase)
+
+
+def group_dn(name, container="cn=groups"):
+    return "cn={},{},{}".format(name, container, school_dn)
+
+
+def test_reconcile_group_memberships(monkeypatch):
+    class_keep = group_dn("{}-1a".format(school_name), "cn=klassen,cn=schueler,cn=groups")
+    class_old = group_dn("{}-2b".format(school_name), "cn=klassen,cn=schueler,cn=groups")
+    class_new = group_dn("{}-3c".format(school_name), "cn=klassen,cn=schueler,cn=groups")
+    workgroup_old = group_dn("{}-chess".format(school_name), "cn=schueler,cn=groups")
+    school_group = group_dn("lehrer-{}".format(school_name.lower()))
+    global_group = "cn=Domain Users,cn=groups,{}".format(ldapbase)
+    mandatory_groups = [class_keep, class_new, school_group.upper()]
+    user = Teacher(name="msmith", school=school_name)
+    monkeypatch.setattr(user, "groups_used", lambda lo: mandatory_groups)
+    udm_obj = {"groups": [global_group, class_keep, class_old, workgroup_old, school_group]}
+
+    removed, added = user.reconcile_group_memberships(udm_obj, None)
+
+    assert removed == [class_old, workgroup_old]
+    assert added == [class_new]
+    assert udm_obj["groups"] == [global_group, class_keep, school_group, class_new]
+
+
+def test_reconcile_group_memberships_add_only(monkeypatch):
+    class_old_school = "cn=OldSchule-1a,cn=klassen,cn=schueler,cn=groups,ou=OldSchule,{}".format(
+        ldapbase
+    )
+    class_new = group_dn("{}-3c".format(school_name), "cn=klassen,cn=schueler,cn=groups")
+    user = Teacher(name="msmith", school=school_name)
+    monkeypatch.setattr(user, "groups_used", lambda lo: [class_new])
+    udm_obj = {"groups": [class_old_school]}
+
+    removed, added = user.reconcile_group_memberships(udm_obj, None, remove=False)
+
+    assert removed == []
+    assert added == [class_new]
+    assert udm_obj["groups"] == [class_old_school, class_new]
@@ -0,0 +1,59 @@
+import sys
+
+sys.path.insert(1, "modules")
+from ucsschool.lib.models.utils import search_by_dn  # noqa: E402
+from univention.admin.uexceptions import noObject  # noqa: E402
+
+ldapbase = "dc=example,dc=com"
+users = "cn=users,ou=School1,{}".format(ldapbase)
+computers = "cn=computers,ou=School1,{}".format(ldapbase)
+
+
+class FakeLo(object):
+    def __init__(self, objects):
+        self.objects = objects
+        self.searches = []
+
+    def search(self, filter_s, base="", scope="sub", attr=None):
+        self.searches.append((filter_s, base, scope))
+        in_base = [dn for dn in self.objects if dn.lower().endswith(",{}".format(base.lower()))]
+        if not in_base:
+            raise noObject(base)
+        return [(dn, {}) for dn in in_base if "({})".format(dn.split(",", 1)[0]) in filter_s]
+
+
+def test_search_by_dn_searches_once_per_container_and_chunk():
+    user_dns = ["uid=user{},{}".format(num, users) for num in range(5)]
+    computer_dn = "cn=pc01,{}".format(computers)
+    lo = FakeLo(user_dns + [computer_dn])
+
+    result = dict(search_by_dn(lo, user_dns + [computer_dn], max_filter_terms=2))
+
+    assert sorted(result) == sorted(user_dns + [computer_dn])
+    bases = sorted(base for _filter, base, _scope in lo.searches)
+    assert bases == [computers.lower()] + [users.lower()] * 3
+    assert {scope for _filter, _base, scope in lo.searches} == {"one"}
+    assert sorted(filter_s.count("(uid=") for filter_s, _base, _scope in lo.searches) == [0, 1, 2, 2]
+
+
+def test_search_by_dn_returns_dns_as_given():
+    lo = FakeLo(["uid=demo,{}".format(users)])
+
+    result = [dn for dn, _attrs in search_by_dn(lo, ["UID=Demo,{}".format(users.upper())])]
+
+    assert result == ["UID=Demo,{}".format(users.upper())]
+
+
+def test_search_by_dn_adds_filter():
+    lo = FakeLo(["uid=demo,{}".format(users)])
+
+    list(search_by_dn(lo, ["uid=demo,{}".format(users)], "(objectClass=ucsschoolTeacher)"))
+
+    assert lo.searches == [("(&(objectClass=ucsschoolTeacher)(|(uid=demo)))", users.lower(), "one")]
+
+
+def test_search_by_dn_skips_missing_objects_and_containers():
+    lo = FakeLo(["uid=demo,{}".format(users)])
+    dns = ["uid=missing,{}".format(users), "uid=demo,cn=missing,{}".format(ldapbase)]
+
+    assert list(search_by_dn(lo, dns)) == []
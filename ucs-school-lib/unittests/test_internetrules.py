@@ -0,0 +1,152 @@
+import logging
+import sys
+import time
+
+import pytest
+
+sys.path.insert(1, "modules")
+from ucsschool.lib import internetrules  # noqa: E402
+
+NUM_RULES = 300
+NUM_DOMAINS = 50
+NUM_GROUPS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class FakeUCR(dict):
+    def __init__(self, *args, **kwargs):
+        super(FakeUCR, self).__init__(*args, **kwargs)
+        self.loads = 0
+        self.mtime = 0
+
+    def load(self):
+        self.loads += 1
+
+    def is_true(self, key):
+        return self.get(key, "").lower() in ("yes", "true", "1", "enable", "enabled", "on")
+
+    def handler_set(self, args):
+        for arg in args:
+            key, value = arg.split("=", 1)
+            self[key] = value
+        self.mtime += 1
+
+    def handler_unset(self, args):
+        for key in args:
+            self.pop(key, None)
+        self.mtime += 1
+
+
+@pytest.fixture
+def fake_ucr(monkeypatch):
+    ucr = FakeUCR()
+    monkeypatch.setattr(internetrules, "ucr", ucr)
+    monkeypatch.setattr(internetrules, "_store", None)
+    monkeypatch.setattr(internetrules, "_getUCRMtimes", lambda: ucr.mtime)
+    monkeypatch.setattr(internetrules.univention.config_registry, "handler_set", ucr.handler_set)
+    monkeypatch.setattr(internetrules.univention.config_registry, "handler_unset", ucr.handler_unset)
+    return ucr
+
+
+def synthetic_rules(ucr, num_rules=NUM_RULES, num_domains=NUM_DOMAINS, num_groups=NUM_GROUPS):
+    for i in range(num_rules):
+        prefix = "proxy/filter/setting/rule%d" % i
+        ucr["%s/filtertype" % prefix] = "whitelist-block" if i % 2 else "blacklist-pass"
+        ucr["%s/priority" % prefix] = str(i % 10)
+        ucr["%s/wlan" % prefix] = "true" if i % 3 else "false"
+        list_type = "whitelisted" if i % 2 else "blacklisted"
+        for j in range(num_domains):
+            ucr["%s/domain/%s/%d" % (prefix, list_type, j + 1)] = "www.domain%d-%d.example" % (i, j)
+    for i in range(num_groups):
+        ucr["proxy/filter/groupdefault/group%d" % i] = "rule%d" % (i % num_rules)
+    ucr["proxy/filter/setting-user/teacher1/filtertype"] = "whitelist-block"
+    ucr["proxy/filter/setting-user/teacher1/domain/whitelisted/1"] = "www.custom.example"
+
+
+def test_load_rule(fake_ucr):
+    synthetic_rules(fake_ucr, num_rules=3, num_domains=3, num_groups=3)
+    rule = internetrules.load("rule1")
+    assert rule.type == internetrules.WHITELIST
+    assert rule.priority == 1
+    assert rule.wlan
+    assert rule.domains == ["www.domain1-%d.example" % j for j in range(3)]
+    assert internetrules.load("rule3") is None
+    assert sorted(r.name for r in internetrules.list()) == ["rule0", "rule1", "rule2"]
+    user_rule = internetrules.load("teacher1", userRule=True)
+    assert user_rule.userRule
+    assert user_rule.domains == ["www.custom.example"]
+    assert internetrules.getGroupRuleName("group2") == "rule2"
+    assert internetrules.getGroupRuleName(["group0", "group3"]) == {"group0": "rule0", "group3": None}
+    assert fake_ucr.loads == 1
+
+
+def test_loaded_rule_is_a_copy(fake_ucr):
+    synthetic_rules(fake_ucr, num_rules=1, num_domains=2, num_groups=0)
+    rule = internetrules.load("rule0")
+    rule.addDomain("www.other.example")
+    rule.priority = 9
+    assert internetrules.load("rule0").priority == 0
+    assert "www.other.example" not in internetrules.load("rule0").domains
+
+
+def test_save_many_rules_in_one_write(fake_ucr, monkeypatch):
+    synthetic_rules(fake_ucr, num_rules=2, num_domains=3, num_groups=0)
+    calls = []
+    monkeypatch.setattr(
+        internetrules.univention.config_registry,
+        "handler_set",
+        lambda args: calls.append(args) or fake_ucr.handler_set(args),
+    )
+    rule0 = internetrules.load("rule0")
+    rule0.domains = rule0.domains[:2]
+    rule1 = internetrules.load("rule1")
+    rule1.priority = 7
+    new_rule = internetrules.Rule("rule2", domains=["www.new.example"])
+
+    internetrules.save([rule0, rule1, new_rule])
+
+    assert len(calls) == 1
+    assert "proxy/filter/setting/rule0/domain/blacklisted/3" not in fake_ucr
+    assert internetrules.load("rule0").domains == rule0.domains
+    assert internetrules.load("rule1").priority == 7
+    assert internetrules.load("rule2").domains == ["www.new.example"]
+
+
+def test_store_is_rebuilt_after_ucr_change(fake_ucr):
+    synthetic_rules(fake_ucr, num_rules=1, num_domains=1, num_groups=1)
+    assert internetrules.getGroupRuleName("group0") == "rule0"
+    internetrules.setGroupRuleName("group0", "rule1")
+    assert internetrules.getGroupRuleName("group0") == "rule1"
+    fake_ucr["proxy/filter/groupdefault/group0"] = "rule2"  # changed by another process
+    assert internetrules.getGroupRuleName("group0") == "rule1"
+    fake_ucr.mtime += 1
+    assert internetrules.getGroupRuleName("group0") == "rule2"
+    assert internetrules.remove("rule0")
+    assert internetrules.load("rule0") is None
+
+
+def test_benchmark_store(fake_ucr, monkeypatch):
+    synthetic_rules(fake_ucr)
+    num_calls = 20
+
+    def lookups():
+        t0 = time.perf_counter()
+        for i in range(num_calls):
+            assert internetrules.load("rule%d" % i).name == "rule%d" % i
+            assert internetrules.getGroupRuleName("group%d" % i) == "rule%d" % i
+        return time.perf_counter() - t0
+
+    store_time = lookups()
+    # rebuilding the store on every call is what the lookups cost without an index
+    monkeypatch.setattr(internetrules, "_getUCRMtimes", lambda: time.perf_counter())
+    rebuild_time = lookups()
+    logger.info(
+        "%d lookups in %d rules with %d domains: indexed: %.3fs rebuilt: %.3fs",
+        num_calls,
+        NUM_RULES,
+        NUM_DOMAINS,
+        store_time,
+        rebuild_time,
+    )
+    assert fake_ucr.loads == 1 + 2 * num_calls
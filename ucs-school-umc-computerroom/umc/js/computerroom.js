@@ -431,16 +431,20 @@ define([
 		},
 
 		_lockInput: function(lock, ids, items) {
+			var computers = [];
 			array.forEach(items, lang.hitch(this, function(comp) {
 				if (this._canExecuteLockInput(comp, !lock)) {
-					this.umcpCommand('computerroom/lock', {
-						computer: comp.id,
-						device: 'input',
-						lock: lock
-					});
+					computers.push(comp.id);
 					this._objStore.put({ id: comp.id, InputLock: null });
 				}
 			}));
+			if (computers.length) {
+				this.umcpCommand('computerroom/lock', {
+					computers: computers,
+					device: 'input',
+					lock: lock
+				});
+			}
 			this.addNotification(lock ? _('The selected computers are being locked.') : _('The selected computers are being unlocked.'));
 		},
 
@@ -452,6 +456,7 @@ define([
 		},
 
 		_lockScreen: function(lock, ids, items) {
+			var computers = [];
 			array.forEach(items, lang.hitch(this, function(comp) {
 				if (this._canExecuteLockScreen(comp, !lock)) {
 					if (!lock && this._toScreenLock[comp.id]) {
@@ -459,14 +464,17 @@ define([
 					} else if (lock) {
 						this._toScreenLock[comp.id] = comp
 					}
-					this.umcpCommand('computerroom/lock', {
-						computer: comp.id,
-						device: 'screen',
-						lock: lock
-					});
+					computers.push(comp.id);
 					this._objStore.put({ id: comp.id, ScreenLock: null });
 				}
 			}));
+			if (computers.length) {
+				this.umcpCommand('computerroom/lock', {
+					computers: computers,
+					device: 'screen',
+					lock: lock
+				});
+			}
 			this.addNotification(lock ? _('The selected computers are being locked.') : _('The selected computers are being unlocked.'));
 		},
 
@@ -1205,14 +1213,15 @@ define([
 		},
 
 		_screenLockInterval: function() {
-			for (var id of Object.keys(this._toScreenLock)) {
-				if (this._canExecuteLockScreen(this._toScreenLock[id], false)) {
-					this.umcpCommand('computerroom/lock', {
-						computer: id,
-						device: 'screen',
-						lock: true
-					});
-				}
+			var computers = Object.keys(this._toScreenLock).filter(lang.hitch(this, function(id) {
+				return this._canExecuteLockScreen(this._toScreenLock[id], false);
+			}));
+			if (computers.length) {
+				this.umcpCommand('computerroom/lock', {
+					computers: computers,
+					device: 'screen',
+					lock: true
+				});
 			}
 		},
 
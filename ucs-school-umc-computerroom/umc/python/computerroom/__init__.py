@@ -39,7 +39,6 @@ import itertools
 import os
 import signal
 import subprocess
-import time
 import traceback
 from ipaddress import ip_address
 from pipes import quote
@@ -65,7 +64,7 @@ from ucsschool.lib.school_umc_base import Display, SchoolBaseModule, SchoolSanit
 from ucsschool.lib.school_umc_ldap_connection import LDAP_Connection
 from ucsschool.lib.schoollessons import SchoolLessons
 from ucsschool.lib.smbstatus import SMB_Status
-from ucsschool.veyon_client.models import VeyonConnectionError
+from ucsschool.veyon_client.models import Feature, VeyonConnectionError
 from univention.admin.syntax import gid
 from univention.admin.uldap import getMachineConnection
 from univention.config_registry import handler_set, handler_unset
@@ -91,6 +90,7 @@ ROOMDIR = "/var/cache/ucs-school-umc-computerroom"
 _SCREENSHOT_DIR = "/usr/share/univention-management-console-frontend/js/dijit/themes/umc/icons/scalable"
 FN_SCREENSHOT_DENIED = os.path.join(_SCREENSHOT_DIR, _("screenshot_denied.svg"))
 FN_SCREENSHOT_NOTREADY = os.path.join(_SCREENSHOT_DIR, _("screenshot_notready.svg"))
+_SCREENSHOT_IMAGES = {}
 
 
 def compare_dn(a, b):
@@ -200,6 +200,18 @@ def _freeRoom(roomDN, userDN):
             MODULE.warn("Failed to remove room lock file: %s" % roomFile)
 
 
+def _read_screenshot_image(filename):
+    """Read one of the placeholder images. They are kept in memory after the first request."""
+    if filename not in _SCREENSHOT_IMAGES:
+        try:
+            with open(filename, "rb") as fd:
+                _SCREENSHOT_IMAGES[filename] = fd.read()
+        except EnvironmentError as exc:
+            MODULE.error("Unable to load screenshot file %r: %s" % (filename, exc))
+            return b""
+    return _SCREENSHOT_IMAGES[filename]
+
+
 def check_room_access(func):
     """Block access to session from other users"""
 
@@ -374,9 +386,11 @@ class Instance(SchoolBaseModule):
                 _freeRoom(self._computerroom.roomDN, self.__init_user_dn)
             for comp in self._computerroom.values():
                 comp.should_run = False
-            while any(comp.is_alive() for comp in self._computerroom.values()):
-                time.sleep(0.1)
+            self._computerroom.stop_polling()
             MODULE.info("All threads dead!")
+            MODULE.info(
+                "Screenshot cache statistics: %r" % (self._computerroom.screenshot_cache.get_stats(),)
+            )
 
     def lessons(self, request):
         """Returns a list of school lessons. Lessons in the past are filtered out"""
@@ -629,18 +643,25 @@ class Instance(SchoolBaseModule):
 
     @check_room_access
     @sanitize(
-        computer=ComputerSanitizer(required=True),
+        computers=ListSanitizer(sanitizer=ComputerSanitizer(), min_elements=1),
+        computer=ComputerSanitizer(),
         device=ChoicesSanitizer(["screen", "input"], required=True),
         lock=BooleanSanitizer(required=True),
     )
     @simple_response
-    def lock(self, computer, device, lock):
-        """Lock or Unlock the screen or input of a specific computer"""
+    def lock(self, device, lock, computers=None, computer=None):
+        """
+        Lock or Unlock the screen or input of the given computers. A single computer given as
+        `computer` (the option used by older versions of the frontend) is still accepted.
+        """
+        computers = list(computers or [])
+        if computer is not None:
+            computers.append(computer)
+        if not computers:
+            raise UMC_Error(_("no computer selected"))
         MODULE.warn("Locking device %s" % (device,))
-        if device == "screen":
-            computer.lockScreen(lock)
-        else:
-            computer.lockInput(lock)
+        feature = Feature.SCREEN_LOCK if device == "screen" else Feature.INPUT_DEVICE_LOCK
+        self._computerroom.set_feature(computers, feature, active=lock)
 
     @allow_get_request
     @check_room_access
@@ -651,28 +672,17 @@ class Instance(SchoolBaseModule):
         or a premade SVG image for special situations like when a screenshots is not ready yet
         """
         computer = request.options["computer"]
-        tmpfile = computer.screenshot(size=request.options.get("size", None))
+        MODULE.info("screenshot(%s): hide screenshot = %r" % (computer.name, computer.hide_screenshot))
         if computer.hide_screenshot:
             mimetype = "image/svg+xml"
-            filename = FN_SCREENSHOT_DENIED
-        elif tmpfile is None:
-            mimetype = "image/svg+xml"
-            filename = FN_SCREENSHOT_NOTREADY
+            response = _read_screenshot_image(FN_SCREENSHOT_DENIED)
         else:
-            mimetype = "image/jpeg"
-            filename = tmpfile.name
-
-        MODULE.info("screenshot(%s): hide screenshot = %r" % (computer.name, computer.hide_screenshot))
-        try:
-            with open(filename, "rb") as fd:
-                response = fd.read()
-        except EnvironmentError as exc:
-            MODULE.error("Unable to load screenshot file %r: %s" % (filename, exc))
-        try:
-            if tmpfile:
-                os.unlink(tmpfile.name)
-        except EnvironmentError as exc:
-            MODULE.error("Unable to remove temporary screenshot file %r: %s" % (tmpfile.name, exc))
+            response = computer.screenshot(size=request.options.get("size", None))
+            if response is None:
+                mimetype = "image/svg+xml"
+                response = _read_screenshot_image(FN_SCREENSHOT_NOTREADY)
+            else:
+                mimetype = "image/jpeg"
 
         self.finished(request.id, response, mimetype=mimetype)
 
@@ -708,11 +718,8 @@ class Instance(SchoolBaseModule):
             rule = "custom"
         shareMode = ucr.get("samba/sharemode/room/%s" % self._computerroom.room, "all")
         # load custom rule:
-        key_prefix = "proxy/filter/setting-user/%s/domain/whitelisted/" % request.username
-        custom_rules = []
-        for key in ucr:
-            if key.startswith(key_prefix):
-                custom_rules.append(ucr[key])
+        custom_rule = internetrules.load(request.username, userRule=True)
+        custom_rules = custom_rule.domains if custom_rule else []
 
         printMode = ucr.get("samba/printmode/room/%s" % self._computerroom.room, "default")
 
@@ -31,15 +31,28 @@
 # /usr/share/common-licenses/AGPL-3; if not, see
 # <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import copy
 import random
 import re
-import tempfile
 import threading
 import time
 import traceback
 import uuid
-from typing import TYPE_CHECKING, Any, List, Optional, TypeVar  # noqa: F401
+from collections import OrderedDict
+from typing import (  # noqa: F401
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
 import ldap
 from ldap.dn import explode_rdn
@@ -75,6 +88,8 @@ VEYON_USER_REGEX = r"(?P<domain>.*)\\(?P<username>[^\(\\]+)$"
 
 VEYON_KEY_FILE = "/etc/ucsschool-veyon/key.pem"
 
+MAX_POLL_BACKOFF = 30.0  # seconds
+
 
 class ComputerRoomError(Exception):
     pass
@@ -227,6 +242,110 @@ class LockableAttribute(object):
         self.unlock()
 
 
+class ScreenshotCache(object):
+    """
+    In-memory cache for the screenshots of the computers of a room.
+
+    Images are stored per computer and size and expire after `max_age` seconds. If the
+    cached images need more than `max_bytes`, the least recently used ones are dropped.
+    Concurrent requests for the same computer and size wait for a single download.
+    """
+
+    def __init__(self, max_age=None, max_bytes=None):  # type: (Optional[float], Optional[int]) -> None
+        self.max_age = self.get_max_age() if max_age is None else max_age
+        self.max_bytes = self.get_max_bytes() if max_bytes is None else max_bytes
+        self._images = OrderedDict()  # type: Dict[Hashable, Tuple[float, bytes]]
+        self._pending = {}  # type: Dict[Hashable, List[Any]]
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "deduplicated": 0, "evictions": 0}
+
+    @staticmethod
+    def get_max_age():  # type: () -> int
+        try:
+            return int(ucr.get("ucsschool/umc/computerroom/screenshot/cache/max-age", 2))
+        except ValueError:
+            MODULE.warning("ucsschool/umc/computerroom/screenshot/cache/max-age is not a valid integer")
+            return 2
+
+    @staticmethod
+    def get_max_bytes():  # type: () -> int
+        try:
+            return int(ucr.get("ucsschool/umc/computerroom/screenshot/cache/size", 32)) * 1024 ** 2
+        except ValueError:
+            MODULE.warning("ucsschool/umc/computerroom/screenshot/cache/size is not a valid integer")
+            return 32 * 1024 ** 2
+
+    def get(self, key, fetch):  # type: (Hashable, Callable[[], Optional[bytes]]) -> Optional[bytes]
+        """
+        Get an image from the cache or download it.
+
+        :param key: computer name and size of the screenshot
+        :param fetch: function downloading the image, called if `key` is not cached
+        :return: the image or `None` if none is available
+        """
+        fetching = False
+        with self._lock:
+            entry = self._images.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._images.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            pending = self._pending.get(key)
+            if pending:
+                self._stats["deduplicated"] += 1
+            else:
+                # [event set when the download finished, downloaded image]
+                pending = self._pending[key] = [threading.Event(), None]
+                self._stats["misses"] += 1
+                fetching = True
+        if not fetching:
+            pending[0].wait()
+            return pending[1]
+        image = None
+        try:
+            image = fetch()
+        finally:
+            pending[1] = image
+            with self._lock:
+                del self._pending[key]
+                if image:
+                    self._store(key, image)
+            pending[0].set()
+        return image
+
+    def clear(self):  # type: () -> None
+        with self._lock:
+            self._images.clear()
+            self._size = 0
+
+    def get_stats(self):  # type: () -> Dict[str, int]
+        """
+        :return: the counters `hits`, `misses`, `deduplicated` (requests that waited for a running
+            download) and `evictions` and the number of `images` and `bytes` in the cache
+        :rtype: dict
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(images=len(self._images), bytes=self._size)
+        return stats
+
+    def _store(self, key, image):  # type: (Hashable, bytes) -> None
+        # must be called with self._lock held
+        if key in self._images:
+            self._remove(key)
+        self._images[key] = (time.monotonic() + self.max_age, image)
+        self._size += len(image)
+        while self._size > self.max_bytes and self._images:
+            self._remove(next(iter(self._images)))
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):  # type: (Hashable) -> None
+        # must be called with self._lock held
+        _expires, image = self._images.pop(key)
+        self._size -= len(image)
+
+
 class ComputerRoomManager(dict):
     SCHOOL = None
     ROOM = None
@@ -237,6 +356,8 @@ class ComputerRoomManager(dict):
         dict.__init__(self)
         self._user_map = UserMap(VEYON_USER_REGEX)
         self._veyon_client = None  # type: Optional[VeyonClient]
+        self._poller = VeyonPoller()
+        self.screenshot_cache = ScreenshotCache()
         self.screenshot_dimension = self.get_screenshot_dimension()
 
     @staticmethod
@@ -336,8 +457,15 @@ class ComputerRoomManager(dict):
 
         return [x.ipAddress for x in values]
 
+    def stop_polling(self):  # type: () -> None
+        """Stop updating the information of the computers and wait for running updates."""
+        self._poller.stop()
+
     def _clear(self):
         if ComputerRoomManager.ROOM:
+            self._poller.clear()
+            MODULE.info("Screenshot cache statistics: {!r}".format(self.screenshot_cache.get_stats()))
+            self.screenshot_cache.clear()
             for computer in self.values():
                 computer.stop()
                 computer.close()
@@ -390,9 +518,10 @@ class ComputerRoomManager(dict):
                     self.veyon_client,
                     self._user_map,
                     self.screenshot_dimension,
+                    self.screenshot_cache,
                 )
-                comp.start()
                 self.__setitem__(comp.name, comp)
+                self._poller.add(comp)
             except ComputerRoomError as exc:
                 MODULE.warn("Computer could not be added: {}".format(exc))
 
@@ -436,27 +565,173 @@ class ComputerRoomManager(dict):
         MODULE.info("Demo clients (teachers): %s" % ", ".join(teachers))
         demo_access_token = str(uuid.uuid4())
         server.startDemoServer(token=demo_access_token)
-        for client in clients:
-            client.startDemoClient(
-                server=server,
-                token=demo_access_token,
-                full_screen=False if client.name in teachers else fullscreen,
-            )
+        arguments = {"demoAccessToken": demo_access_token, "demoServerHost": server.ipAddress}
+        MODULE.process(
+            "Starting demo clients with token %s, server %s and fullscreen: %s"
+            % (demo_access_token, server.ipAddress, fullscreen)
+        )
+        full_screen_clients = [x for x in clients if fullscreen and x.name not in teachers]
+        windowed_clients = [x for x in clients if x not in full_screen_clients]
+        self.set_feature(full_screen_clients, Feature.DEMO_CLIENT_FULLSCREEN, arguments=arguments)
+        self.set_feature(windowed_clients, Feature.DEMO_CLIENT_WINDOWED, arguments=arguments)
 
     def stopDemo(self):
         if self.demoServer is not None:
             self.demoServer.stopDemoServer()
         # This is necessary since Veyon has a considerable delay with exposing its demo client status.
         # So we just end the demo client on all computers.
-        clients = self.values()
-        for client in clients:
-            client.stopDemoClient()
+        clients = list(self.values())
+        self.set_feature(clients, Feature.DEMO_CLIENT_FULLSCREEN, active=False)
+        self.set_feature(clients, Feature.DEMO_CLIENT_WINDOWED, active=False)
+
+    def set_feature(self, computers, feature, active=True, arguments=None):
+        # type: (Iterable[VeyonComputer], Feature, bool, Optional[Dict[str, str]]) -> None
+        """
+        De-/Activate a Veyon feature on multiple computers in parallel. Computers that are
+        offline are skipped, errors are logged.
+        """
+        hosts = {}
+        for computer in computers:
+            if computer.connected:
+                hosts[computer.ipAddress] = computer
+            else:
+                MODULE.debug(
+                    "Not setting feature {} as computer {} is offline.".format(
+                        repr(feature), computer.name
+                    )
+                )
+        if not hosts:
+            return
+        errors = self.veyon_client.set_feature_on_hosts(
+            feature, hosts, active=active, arguments=arguments
+        )
+        for host, exc in errors.items():
+            if exc is None:
+                continue
+            if isinstance(exc, VeyonError):
+                MODULE.warning(
+                    "{} could not be reached - skipped setting feature {}".format(
+                        hosts[host].name, feature
+                    )
+                )
+            elif isinstance(exc, VeyonConnectionError):
+                MODULE.warning(
+                    "Error connecting with the veyon proxy - skipped setting feature {} for {}".format(
+                        feature, hosts[host].name
+                    )
+                )
+            else:
+                raise exc
 
 
-class VeyonComputer(threading.Thread):
-    def __init__(self, computer, veyon_client, user_map, screenshot_dimension):
-        # type: (Any, VeyonClient, UserMap) -> None
-        super(VeyonComputer, self).__init__()
+class VeyonPoller(object):
+    """
+    Periodically updates the information of the computers of a room.
+
+    A single scheduler thread hands the computers that are due to a small pool of worker
+    threads, instead of running one thread per computer. Computers that cannot be reached
+    are polled less often (exponential backoff up to `MAX_POLL_BACKOFF` seconds).
+    """
+
+    def __init__(self, max_workers=None):  # type: (Optional[int]) -> None
+        self.max_workers = max_workers or self.get_max_workers()
+        self._due = {}  # type: Dict[VeyonComputer, float]
+        self._running = set()  # type: Set[VeyonComputer]
+        self._condition = threading.Condition()
+        self._executor = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+        self._thread = None  # type: Optional[threading.Thread]
+        self._should_run = False
+
+    @staticmethod
+    def get_max_workers():  # type: () -> int
+        try:
+            max_workers = int(ucr.get("ucsschool/umc/computerroom/update-workers", 8))
+        except ValueError:
+            MODULE.warning("ucsschool/umc/computerroom/update-workers is not a valid integer")
+            max_workers = 8
+        return max(max_workers, 1)
+
+    def add(self, computer):  # type: (VeyonComputer) -> None
+        """Start polling `computer`, starting the scheduler thread if necessary."""
+        with self._condition:
+            self._due[computer] = time.monotonic()
+            if not self._should_run:
+                self._start()
+            self._condition.notify()
+
+    def remove(self, computer):  # type: (VeyonComputer) -> None
+        with self._condition:
+            self._due.pop(computer, None)
+
+    def clear(self):  # type: () -> None
+        with self._condition:
+            self._due.clear()
+
+    def is_alive(self):  # type: () -> bool
+        return bool(self._thread and self._thread.is_alive())
+
+    def stop(self):  # type: () -> None
+        """Stop polling all computers and wait until running updates have finished."""
+        with self._condition:
+            self._due.clear()
+            self._should_run = False
+            self._condition.notify()
+        thread, executor = self._thread, self._executor
+        if thread:
+            thread.join()
+        if executor:
+            executor.shutdown(wait=True)
+        self._thread = self._executor = None
+
+    def _start(self):  # type: () -> None
+        # must be called with self._condition held
+        self._should_run = True
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="VeyonPoller"
+        )
+        self._thread = threading.Thread(target=self._run, name="VeyonPollerScheduler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):  # type: () -> None
+        while True:
+            with self._condition:
+                if not self._should_run:
+                    return
+                now = time.monotonic()
+                waiting = {
+                    computer: due
+                    for computer, due in self._due.items()
+                    if computer not in self._running
+                }
+                ready = [computer for computer, due in waiting.items() if due <= now]
+                if not ready:
+                    timeout = min(waiting.values()) - now if waiting else None
+                    self._condition.wait(timeout)
+                    continue
+                self._running.update(ready)
+                executor = self._executor
+            for computer in ready:
+                executor.submit(self._poll, computer)
+
+    def _poll(self, computer):  # type: (VeyonComputer) -> None
+        try:
+            computer.poll()
+        except Exception:
+            MODULE.error(
+                "Error polling information of {}: {}".format(computer.name, traceback.format_exc())
+            )
+        finally:
+            with self._condition:
+                self._running.discard(computer)
+                if computer in self._due:
+                    self._due[computer] = time.monotonic() + computer.next_poll_delay()
+                self._condition.notify()
+
+
+class VeyonComputer(object):
+    def __init__(self, computer, veyon_client, user_map, screenshot_dimension, screenshot_cache=None):
+        # type: (Any, VeyonClient, UserMap, Optional[Dimension], Optional[ScreenshotCache]) -> None
         self._computer = computer  # type: Any
         self._veyon_client = veyon_client  # type: VeyonClient
         self._user_map = user_map
@@ -476,16 +751,28 @@ class VeyonComputer(threading.Thread):
         self._update_interval = None
         self._update_paused = False
         self._last_use_of_info = time.monotonic()
+        self._failed_polls = 0
         self.should_run = True
         self.screenshot_dimension = screenshot_dimension
+        self._screenshot_cache = screenshot_cache or ScreenshotCache()
 
-    def run(self):
-        while self.should_run:
-            if not self.update_paused():
-                self._check_connection()
-                if self.connected:
-                    self.update()
-            time.sleep(self.update_interval + random.uniform(0, 1))  # nosec
+    def poll(self):  # type: () -> None
+        """Check the connection and update the information once, called by :py:class:`VeyonPoller`."""
+        if not self.should_run or self.update_paused():
+            return
+        self._check_connection()
+        if self.connected:
+            self.update()
+        if self.connected and self.state.current == "connected":
+            self._failed_polls = 0
+        else:
+            self._failed_polls += 1
+
+    def next_poll_delay(self):  # type: () -> float
+        """Seconds until the next :py:meth:`poll()`, growing while the computer is unreachable."""
+        if self._failed_polls:
+            return min(self.update_interval * 2 ** min(self._failed_polls, 5), MAX_POLL_BACKOFF)
+        return self.update_interval + random.uniform(0, 1)  # nosec
 
     def _find_reachable_ip_address(self):
         if self._reachable_ip:
@@ -622,10 +909,16 @@ class VeyonComputer(threading.Thread):
             )
         )
 
-    def screenshot(self, size=None):
+    def screenshot(self, size=None):  # type: (Optional[str]) -> Optional[bytes]
         if not self.connected:
             MODULE.warn("{} not connected - skipping screenshot".format(self.name))
             return None
+        image = self._screenshot_cache.get((self.name, size), lambda: self._fetch_screenshot(size))
+        if not image:
+            MODULE.warn("{}: no screenshot available yet".format(self.name))
+        return image
+
+    def _fetch_screenshot(self, size):  # type: (Optional[str]) -> Optional[bytes]
         width = getattr(self.screenshot_dimension, "width", None)
         height = getattr(self.screenshot_dimension, "height", None)
         size_to_width = {"2": 640, "3": 480, "4": 320}
@@ -642,13 +935,7 @@ class VeyonComputer(threading.Thread):
             )
         except VeyonError:
             pass  # might just be a non reachable IP. TODO: Catch errors other than 404
-        if image:
-            tmp_file = tempfile.NamedTemporaryFile(delete=False)
-            tmp_file.write(image)
-            return tmp_file
-        else:
-            MODULE.warn("{}: no screenshot available yet".format(self.name))
-            return None
+        return image
 
     @property
     def hide_screenshot(self):
@@ -724,6 +1011,16 @@ class VeyonComputer(threading.Thread):
             MODULE.error("Fetching feature status failed: {}".format(exc))
         return None
 
+    def _fetch_feature_statuses(self, features):
+        # type: (Iterable[Feature]) -> Dict[Feature, Optional[bool]]
+        features = list(features)
+        try:
+            return self._veyon_client.get_feature_statuses(features, host=self.ipAddress)
+        except VeyonError as exc:
+            MODULE.error("Fetching feature statuses failed: {}".format(exc))
+        # find out which of the features failed
+        return {feature: self._fetch_feature_status(feature) for feature in features}
+
     def update(self):
         MODULE.info("{}: updating information.".format(self.name))
         try:
@@ -734,14 +1031,20 @@ class VeyonComputer(threading.Thread):
             demo_client = None
             try:
                 veyon_user = self._veyon_client.get_user_info(host=self.ipAddress)
-                input_lock = self._fetch_feature_status(Feature.INPUT_DEVICE_LOCK)
-                screen_lock = self._fetch_feature_status(Feature.SCREEN_LOCK)
-                demo_server = self._fetch_feature_status(Feature.DEMO_SERVER)
+                statuses = self._fetch_feature_statuses(
+                    (
+                        Feature.INPUT_DEVICE_LOCK,
+                        Feature.SCREEN_LOCK,
+                        Feature.DEMO_SERVER,
+                        Feature.DEMO_CLIENT_FULLSCREEN,
+                        Feature.DEMO_CLIENT_WINDOWED,
+                    )
+                )
+                input_lock = statuses[Feature.INPUT_DEVICE_LOCK]
+                screen_lock = statuses[Feature.SCREEN_LOCK]
+                demo_server = statuses[Feature.DEMO_SERVER]
                 demo_client = any(
-                    [
-                        self._fetch_feature_status(Feature.DEMO_CLIENT_FULLSCREEN),
-                        self._fetch_feature_status(Feature.DEMO_CLIENT_WINDOWED),
-                    ]
+                    [statuses[Feature.DEMO_CLIENT_FULLSCREEN], statuses[Feature.DEMO_CLIENT_WINDOWED]]
                 )
             except VeyonError as exc:
                 MODULE.warn("Veyon error on {}: {}".format(self.name, exc))
@@ -818,12 +1121,6 @@ class VeyonComputer(threading.Thread):
                 )
             )
 
-    def lockScreen(self, lock):  # type: (bool) -> None
-        self._set_feature(Feature.SCREEN_LOCK, lock)
-
-    def lockInput(self, lock):  # type: (bool) -> None
-        self._set_feature(Feature.INPUT_DEVICE_LOCK, lock)
-
     def startDemoServer(self, token):  # type: (str) -> None
         MODULE.process("Starting demo server on %s with token: %s" % (self.ipAddress, token))
         self._veyon_client.set_feature(
@@ -833,19 +1130,6 @@ class VeyonComputer(threading.Thread):
     def stopDemoServer(self):
         self._set_feature(Feature.DEMO_SERVER, active=False)
 
-    def startDemoClient(self, server, token, full_screen=False):
-        MODULE.process(
-            "Starting demo client on %s with token %s, server %s and fullscreen: %s"
-            % (self.ipAddress, token, server.ipAddress, full_screen)
-        )
-        arguments = {"demoAccessToken": token, "demoServerHost": server.ipAddress}
-        feature = Feature.DEMO_CLIENT_FULLSCREEN if full_screen else Feature.DEMO_CLIENT_WINDOWED
-        self._veyon_client.set_feature(feature, host=self.ipAddress, active=True, arguments=arguments)
-
-    def stopDemoClient(self):
-        self._set_feature(Feature.DEMO_CLIENT_FULLSCREEN, active=False)
-        self._set_feature(Feature.DEMO_CLIENT_WINDOWED, active=False)
-
     def powerOff(self):
         self._set_feature(Feature.POWER_DOWN)
 
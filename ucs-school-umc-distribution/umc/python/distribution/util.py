@@ -31,22 +31,27 @@
 # /usr/share/common-licenses/AGPL-3; if not, see
 # <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import errno
+import fcntl
 import itertools
 import json
 import os
 import re
 import shutil
+import threading
 import traceback
 from datetime import datetime
 from pipes import quote
 
 import PAM
+from ldap.filter import filter_format
 from six import iteritems, string_types
 
 import ucsschool.lib.models
 import univention.admin.uexceptions as udm_exceptions
 from ucsschool.lib.models.user import User as SchoolLibUser
+from ucsschool.lib.models.utils import MAX_FILTER_TERMS, search_by_dn
 from univention.admin.uldap import getMachineConnection
 from univention.lib import atjobs
 from univention.lib.i18n import Translation
@@ -71,6 +76,11 @@ POSTFIX_DATADIR_RECIPIENT = ucr.get(
 )
 PAM_HOMEDIR_SESSION = ucr.is_true("homedir/create", True)
 
+FICLONE = 0x40049409  # ioctl(2) request to share the data blocks of two files, see ioctl_ficlone(2)
+
+# shutil.make_archive() changes the working directory of the process
+_MAKE_ARCHIVE_LOCK = threading.Lock()
+
 
 TYPE_USER = "USER"
 TYPE_GROUP = "GROUP"
@@ -262,6 +272,150 @@ def openRecipients(entryDN, ldap_connection):
         return group
 
 
+def get_dns_with_object_class(lo, users, object_class, max_filter_terms=MAX_FILTER_TERMS):
+    """
+    Find the users that have the LDAP object class `object_class` (e.g. `ucsschoolTeacher`).
+
+    Instead of opening every user with UDM, the users are looked up with one LDAP search per
+    container and `max_filter_terms` users, see
+    :py:func:`ucsschool.lib.models.utils.search_by_dn()`.
+
+    :param lo: LDAP connection
+    :param users: list of :py:class:`User` objects
+    :param str object_class: name of the object class
+    :param int max_filter_terms: maximum number of users in one LDAP filter
+    :return: lower case DNs of the users with the object class
+    :rtype: set
+    """
+    return {
+        dn.lower()
+        for dn, _attrs in search_by_dn(
+            lo,
+            [user.dn for user in users if user.dn],
+            filter_format("(objectClass=%s)", [object_class]),
+            attr=["dn"],
+            max_filter_terms=max_filter_terms,
+        )
+    }
+
+
+def unique_users(users):
+    """
+    Remove duplicate users (e.g. members of several groups), keeping the order.
+
+    :param users: list of :py:class:`User` objects
+    :return: list of :py:class:`User` objects
+    """
+    seen = set()
+    result = []
+    for user in users:
+        key = (user.dn or user.username).lower()
+        if key not in seen:
+            seen.add(key)
+            result.append(user)
+    return result
+
+
+def copy_file(src, target):
+    """
+    Copy the content of the file `src` to `target` like :py:func:`shutil.copyfile()`, but let
+    the kernel do the work: the data blocks are shared (reflink) if the filesystem supports it,
+    otherwise they are copied with `copy_file_range(2)` or `sendfile(2)` without passing through
+    user space.
+
+    :param str src: path of the source file
+    :param str target: path of the target file, it is overwritten if it exists
+    """
+    with open(src, "rb") as fsrc, open(target, "wb") as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        try:
+            fcntl.ioctl(outfd, FICLONE, infd)
+            return
+        except OSError:
+            pass  # no reflinks on this filesystem or source and target on different filesystems
+        size = os.fstat(infd).st_size
+        copied = 0
+        for copy in (_copy_file_range, _sendfile):
+            try:
+                copied = copy(infd, outfd, copied, size)
+            except OSError as exc:
+                if exc.errno not in (errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.EOPNOTSUPP):
+                    raise
+            else:
+                if copied >= size:
+                    return
+        # neither copy_file_range(2) nor sendfile(2) could copy (all) the data
+        fsrc.seek(copied)
+        fdst.seek(copied)
+        shutil.copyfileobj(fsrc, fdst)
+
+
+def _copy_file_range(infd, outfd, offset, size):
+    if not hasattr(os, "copy_file_range"):  # Python < 3.8
+        return offset
+    while offset < size:
+        sent = os.copy_file_range(infd, outfd, size - offset, offset, offset)
+        if not sent:
+            break
+        offset += sent
+    return offset
+
+
+def _sendfile(infd, outfd, offset, size):
+    os.lseek(outfd, offset, os.SEEK_SET)
+    while offset < size:
+        sent = os.sendfile(outfd, infd, offset, size - offset)
+        if not sent:
+            break
+        offset += sent
+    return offset
+
+
+def _copy2(src, target):
+    """Like :py:func:`shutil.copy2()` (the default for :py:func:`shutil.copytree()`)."""
+    copy_file(src, target)
+    shutil.copystat(src, target)
+    return target
+
+
+def _get_workers():
+    try:
+        workers = int(ucr.get("ucsschool/datadistribution/workers", 4))
+    except ValueError:
+        MODULE.warn("ucsschool/datadistribution/workers is not a valid integer")
+        workers = 4
+    return max(workers, 1)
+
+
+def _run_for_users(func, users, callback=None):
+    """
+    Call `func` for all `users` with a bounded pool of threads.
+
+    :param func: function called with a user, returning `True` on success and `False` on failure
+    :param users: list of :py:class:`User` objects
+    :param callback: function called with each user and the result of `func`, in the order the
+        users are finished
+    :return: the users for which `func` failed, in the order of `users`
+    :rtype: list
+    """
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_get_workers()) as executor:
+        futures = {executor.submit(func, user): index for index, user in enumerate(users)}
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            try:
+                success = future.result()
+            except Exception:
+                MODULE.error(
+                    "Processing user %r failed:\n%s" % (users[index].username, traceback.format_exc())
+                )
+                success = False
+            results[index] = success
+            if callback:
+                callback(users[index], success)
+    return [user for index, user in enumerate(users) if not results[index]]
+
+
 class Project(_Dict):
     def __init__(self, *args, **_props):
         # init empty project dict
@@ -578,26 +732,36 @@ class Project(_Dict):
                 ijob.rm()
 
     def getRecipients(self):
+        """
+        All users the project is distributed to, including the sender.
 
-        lo, _ = getMachineConnection()
+        Members of several groups are returned only once. Other teachers are excluded, if
+        `ucsschool/datadistribution/exclude_teachers` is set. They are looked up with one LDAP
+        search instead of opening every recipient.
+        """
         users = []
         for item in self.recipients:
             if item.type == TYPE_USER:
-                if not (DISTRIBUTION_EXCLUDE_OTHER_TEACHERS and item.school_lib_user(lo).is_teacher(lo)):
-                    users.append(item)
+                users.append(item)
             elif item.type == TYPE_GROUP:
-                for member in item.members:
-                    if not (
-                        DISTRIBUTION_EXCLUDE_OTHER_TEACHERS and member.school_lib_user(lo).is_teacher(lo)
-                    ):
-                        users.append(member)
-        if self.sender not in users:
-            users.append(self.sender)
-
-        return users
-
-    def distribute(self, usersFailed=None):
-        """Distribute the project data to all registrated receivers."""
+                users.extend(item.members)
+        if DISTRIBUTION_EXCLUDE_OTHER_TEACHERS and users:
+            lo, _ = getMachineConnection()
+            teachers = get_dns_with_object_class(lo, users, "ucsschoolTeacher")
+            users = [user for user in users if user.dn.lower() not in teachers]
+        return unique_users(users + [self.sender])
+
+    def distribute(self, usersFailed=None, callback=None):
+        """
+        Distribute the project data to all registrated receivers.
+
+        The files are copied for up to `ucsschool/datadistribution/workers` users in parallel.
+
+        :param list usersFailed: the users, for which the distribution failed, are appended to it
+        :param callback: function called with each user and `True` if the files were copied
+            successfully or `False` if not, e.g. to report the progress
+        :return: `True` if the files were distributed to all users
+        """
         if not isinstance(usersFailed, list):
             usersFailed = []
 
@@ -609,31 +773,20 @@ class Project(_Dict):
         # make sure all necessary directories exist
         self._createProjectDir()
 
-        # iterate over all recipients
+        users = self.getRecipients()
         MODULE.info('Distributing project "%s" with files: %s' % (self.name, ", ".join(files)))
-        for user in self.getRecipients() + [self.sender]:
-            # create user project directory
+        if not files:
+            MODULE.info("No new files to distribute in project: %s" % self.name)
+        # create the user project directories first: _create_project_dir() changes the umask of
+        # the process, which must not happen while files are copied
+        for user in users:
             MODULE.info("recipient: uid=%s" % user.username)
             self._create_project_dir(user, self.user_projectdir(user))
 
-            # copy files from cache to recipient
-            for fn in files:
-                src = str(os.path.join(self.cachedir, fn))
-                target = str(os.path.join(self.user_projectdir(user), fn))
-                try:
-                    if os.path.islink(src):
-                        raise IOError("Symlinks are not allowed")
-                    shutil.copyfile(src, target)
-                except (OSError, IOError) as e:
-                    MODULE.error('failed to copy "%s" to "%s": %s' % (src, target, str(e)))
-                    usersFailed.append(user)
-                try:
-                    os.chown(target, int(user.uidNumber), int(user.gidNumber))
-                except (OSError, IOError) as e:
-                    MODULE.error('failed to chown "%s": %s' % (target, str(e)))
-                    usersFailed.append(user)
-            else:
-                MODULE.info("No new files to distribute in project: %s" % self.name)
+        # copy files from cache to recipients
+        usersFailed.extend(
+            _run_for_users(lambda user: self._distribute_files(user, files), users, callback)
+        )
 
         # remove cached files
         for fn in files:
@@ -650,6 +803,25 @@ class Project(_Dict):
 
         return len(usersFailed) == 0
 
+    def _distribute_files(self, user, files):
+        success = True
+        for fn in files:
+            src = str(os.path.join(self.cachedir, fn))
+            target = str(os.path.join(self.user_projectdir(user), fn))
+            try:
+                if os.path.islink(src):
+                    raise IOError("Symlinks are not allowed")
+                copy_file(src, target)
+            except (OSError, IOError) as e:
+                MODULE.error('failed to copy "%s" to "%s": %s' % (src, target, str(e)))
+                success = False
+            try:
+                os.chown(target, int(user.uidNumber), int(user.gidNumber))
+            except (OSError, IOError) as e:
+                MODULE.error('failed to chown "%s": %s' % (target, str(e)))
+                success = False
+        return success
+
     def _all_versions(self, recipient):
         """
         Returns a generator containing all version numbers of existing results for a given recipient.
@@ -737,67 +909,99 @@ class Project(_Dict):
             else:
                 MODULE.warn("Could not remove ntacl:\n{}".format(exc))
 
-    def collect(self, dirsFailed=None, readOnly=False, compress=False):
+    def collect(self, dirsFailed=None, readOnly=False, compress=False, callback=None):
+        """
+        Copy the project directories of all recipients into the project directory of the sender.
+
+        The directories of up to `ucsschool/datadistribution/workers` recipients are copied in
+        parallel.
+
+        :param list dirsFailed: the directories, which could not be collected, are appended to it
+        :param bool readOnly: make the collected files read only
+        :param bool compress: collect the directories as ZIP files
+        :param callback: function called with each recipient and `True` if the directory was
+            collected successfully or `False` if not, e.g. to report the progress
+        :return: `True` if the directories of all recipients were collected
+        """
         if not isinstance(dirsFailed, list):
             dirsFailed = []
-        compressed_suffix = ".zip" if compress else ""
 
         # make sure all necessary directories exist
         self._createProjectDir()
 
-        # collect data from all recipients
+        # check space requirements of all recipients, before copying in parallel
+        recipients = []
+        available_space = self._get_available_space()
         for recipient in self.getRecipients():
-            targetdir = self._next_target(recipient)
-
-            # copy entire directory of the recipient
             srcdir = os.path.join(self.user_projectdir(recipient))
-            # check space requirements
             src_size = self._get_directory_size(srcdir)
-            available_space = self._get_available_space()
             if available_space - src_size < 0:
-                MODULE.warn("not enough space to copy from %s to %s" % (srcdir, targetdir))
+                MODULE.warn(
+                    "not enough space to copy from %s to %s" % (srcdir, self._next_target(recipient))
+                )
                 dirsFailed.append(srcdir)
+                if callback:
+                    callback(recipient, False)
                 continue
-            MODULE.info(
-                'collecting data for user "%s" from %s to %s' % (recipient.username, srcdir, targetdir)
-            )
-            if not os.path.isdir(srcdir):
-                MODULE.info("Source directory does not exist (no files distributed?)")
-            else:
-                try:
-                    # copy dir
-                    def ignore(src, names):
-                        # !important" don't let symlinks be copied (e.g. /etc/shadow).
-                        # don't use shutil.copytree(symlinks=True) for this as it changes the
-                        # owner + mode + flags of the symlinks afterwards
-                        return [name for name in names if os.path.islink(os.path.join(src, name))]
-
-                    # zip is hard coded for now. But it could be possible to make it configurable
-                    if compress and "zip" in (e[0] for e in shutil.get_archive_formats()):
-                        shutil.make_archive(targetdir, "zip", srcdir)
-                    else:
-                        shutil.copytree(srcdir, targetdir, ignore=ignore)
-
-                    # Necessary for correct filename in the permission fixing
-                    targetdir = targetdir + compressed_suffix
-                    # fix permission
-                    self._fix_permissions(targetdir)
-                    if compress:
-                        os.chmod(targetdir, 0o600)
-                    for root, dirs, files in os.walk(targetdir):
-                        for momo in dirs + files:
-                            self._fix_permissions(os.path.join(root, momo))
-                        if readOnly:
-                            for file in files:
-                                os.chmod(os.path.join(root, file), 0o400)
-
-                except (OSError, IOError, ValueError):
-                    MODULE.warn('Copy failed: "%s" ->  "%s"' % (srcdir, targetdir))
-                    MODULE.info("Traceback:\n%s" % traceback.format_exc())
-                    dirsFailed.append(srcdir)
+            available_space -= src_size
+            recipients.append(recipient)
+
+        # collect data from all recipients
+        failed = _run_for_users(
+            lambda recipient: self._collect_recipient(recipient, readOnly, compress),
+            recipients,
+            callback,
+        )
+        dirsFailed.extend(os.path.join(self.user_projectdir(recipient)) for recipient in failed)
 
         return len(dirsFailed) == 0
 
+    def _collect_recipient(self, recipient, readOnly, compress):
+        compressed_suffix = ".zip" if compress else ""
+        targetdir = self._next_target(recipient)
+
+        # copy entire directory of the recipient
+        srcdir = os.path.join(self.user_projectdir(recipient))
+        MODULE.info(
+            'collecting data for user "%s" from %s to %s' % (recipient.username, srcdir, targetdir)
+        )
+        if not os.path.isdir(srcdir):
+            MODULE.info("Source directory does not exist (no files distributed?)")
+            return True
+        try:
+            # copy dir
+            def ignore(src, names):
+                # !important" don't let symlinks be copied (e.g. /etc/shadow).
+                # don't use shutil.copytree(symlinks=True) for this as it changes the
+                # owner + mode + flags of the symlinks afterwards
+                return [name for name in names if os.path.islink(os.path.join(src, name))]
+
+            # zip is hard coded for now. But it could be possible to make it configurable
+            if compress and "zip" in (e[0] for e in shutil.get_archive_formats()):
+                with _MAKE_ARCHIVE_LOCK:
+                    shutil.make_archive(targetdir, "zip", srcdir)
+            else:
+                shutil.copytree(srcdir, targetdir, ignore=ignore, copy_function=_copy2)
+
+            # Necessary for correct filename in the permission fixing
+            targetdir = targetdir + compressed_suffix
+            # fix permission
+            self._fix_permissions(targetdir)
+            if compress:
+                os.chmod(targetdir, 0o600)
+            for root, dirs, files in os.walk(targetdir):
+                for momo in dirs + files:
+                    self._fix_permissions(os.path.join(root, momo))
+                if readOnly:
+                    for file in files:
+                        os.chmod(os.path.join(root, file), 0o400)
+
+        except (OSError, IOError, ValueError):
+            MODULE.warn('Copy failed: "%s" ->  "%s"' % (srcdir, targetdir))
+            MODULE.info("Traceback:\n%s" % traceback.format_exc())
+            return False
+        return True
+
     def purge(self):
         """Remove project's cache directory, project file, and at job registrations."""
         if not self.projectfile or not os.path.exists(self.projectfile):
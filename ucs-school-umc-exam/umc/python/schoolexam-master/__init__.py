@@ -34,6 +34,7 @@ UCS@school UMC module schoolexam-master
 UMC module delivering backend services for ucs-school-umc-exam
 """
 
+import concurrent.futures
 import datetime
 import logging
 import os
@@ -41,7 +42,7 @@ import os.path
 import re
 import traceback
 from collections import defaultdict
-from typing import Dict, List, Tuple  # noqa: F401
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple  # noqa: F401
 
 import ldap
 from ldap.dn import escape_dn_chars, str2dn
@@ -81,6 +82,9 @@ from univention.management.console.modules import UMC_Error
 from univention.management.console.modules.decorators import sanitize
 from univention.management.console.modules.sanitizers import DNSanitizer, ListSanitizer, StringSanitizer
 
+if TYPE_CHECKING:
+    from univention.admin.uldap import access as LoType  # noqa: F401
+
 _ = Translation("ucs-school-umc-exam-master").translate
 
 CREATE_USER_PRE_HOOK_DIR = "/usr/share/ucs-school-exam-master/pyhooks/create_exam_user_pre/"
@@ -208,36 +212,131 @@ class Instance(SchoolBaseModule):
         The group has to be created earlier, e.g. by create_ou (ucs-school-import).
         This function also restricts the login of the original user
         """
-        school = request.options["school"]
-        userdn = request.options["userdn"]
-        room_dn = request.options["room"]
-        exam = request.options["exam"]
         logger.info(
             "school=%r userdn=%r room=%r description=%r",
+            request.options["school"],
+            request.options["userdn"],
+            request.options["room"],
+            request.options["description"],
+        )
+        result = self._create_exam_user(
+            request.options["userdn"],
+            request.options["school"],
+            self._get_room(request.options["room"], ldap_user_read),
+            request.options["exam"],
+            request.options["description"],
+            self._get_prohibited_usernames(ldap_admin_write),
+            ldap_admin_write,
+            ldap_position,
+        )
+        self.finished(request.id, result)
+
+    @sanitize(
+        users=ListSanitizer(DNSanitizer(required=True), required=True, min_elements=1),
+        room=StringSanitizer(default=""),
+        description=StringSanitizer(default=""),
+        school=StringSanitizer(default=""),
+        exam=StringSanitizer(default=""),
+    )
+    @LDAP_Connection(USER_READ, ADMIN_WRITE)
+    def create_exam_users(self, request, ldap_user_read=None, ldap_admin_write=None, ldap_position=None):
+        """
+        Create the exam accounts for multiple users, see `create_exam_user()`.
+        Up to `ucsschool/exam/user/create/workers` accounts are created in parallel.
+        The result is a list with one dict per user: `success`, `userdn`, `examuserdn` (`None` if
+        a disabled user was ignored) and, if the creation failed, an error `message`.
+        """
+        school = request.options["school"]
+        userdns = request.options["users"]
+        logger.info(
+            "school=%r users=%r room=%r description=%r",
             school,
-            userdn,
-            room_dn,
+            userdns,
+            request.options["room"],
             request.options["description"],
         )
+        # things that are the same for all users are looked up once, before the threads start
+        room = self._get_room(request.options["room"], ldap_user_read)
+        if room and room not in self._room_host_cache:
+            self._room_host_cache[room] = room.get_computers(ldap_admin_write)
+        prohibited_usernames = self._get_prohibited_usernames(ldap_admin_write)
+        self.examUserContainerDN(ldap_admin_write, ldap_position, school)
+        self._load_pre_create_hooks(ldap_admin_write)
+
+        def _create(userdn):  # type: (str) -> Dict[str, Any]
+            try:
+                result = self._create_exam_user(
+                    userdn,
+                    school,
+                    room,
+                    request.options["exam"],
+                    request.options["description"],
+                    prohibited_usernames,
+                    ldap_admin_write,
+                    ldap_position,
+                )
+            except Exception as exc:
+                if not isinstance(exc, UMC_Error):
+                    logger.exception("Creation of exam user account for %r failed.", userdn)
+                return {"success": False, "userdn": userdn, "examuserdn": None, "message": str(exc)}
+            return result or {"success": True, "userdn": userdn, "examuserdn": None}
+
+        try:
+            max_workers = int(ucr.get("ucsschool/exam/user/create/workers", 4))
+        except ValueError:
+            max_workers = 4
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            results = list(executor.map(_create, userdns))
+        self.finished(request.id, results)
+
+    @staticmethod
+    def _get_room(room_dn, ldap_user_read):  # type: (str, LoType) -> Optional[ComputerRoom]
+        if not room_dn:
+            return None
+        try:
+            return ComputerRoom.from_dn(room_dn, None, ldap_user_read)
+        except univention.admin.uexceptions.noObject:
+            raise UMC_Error("Room %r not found." % (room_dn,))
+
+    @staticmethod
+    def _get_prohibited_usernames(ldap_admin_write):  # type: (LoType) -> List[Tuple[str, List[str]]]
+        return [
+            (prohibited_object["name"], prohibited_object["usernames"])
+            for prohibited_object in univention.admin.handlers.settings.prohibited_username.lookup(
+                None, ldap_admin_write, ""
+            )
+        ]
+
+    def _create_exam_user(
+        self,
+        userdn,
+        school,
+        room,
+        exam,
+        description,
+        prohibited_usernames,
+        ldap_admin_write,
+        ldap_position,
+    ):  # type: (str, str, Optional[ComputerRoom], str, str, List[Tuple[str, List[str]]], LoType, Any) -> Optional[Dict[str, Any]]  # noqa: E501
+        """
+        Create the exam account for the user `userdn`.
+
+        :return: `None` if the user is disabled and was ignored, else a dict with the keys
+            `success`, `userdn` and `examuserdn`.
+        :raises UMC_Error: if the exam account cannot be created
+        """
         try:
             user = Student.from_dn(userdn, None, ldap_admin_write)
         except univention.admin.uexceptions.noObject:
             raise UMC_Error(_("Student %r not found.") % (userdn,))
         except univention.admin.uexceptions.ldapError:
             raise
-        room = None
-        if room_dn != "":
-            try:
-                room = ComputerRoom.from_dn(room_dn, None, ldap_user_read)
-            except univention.admin.uexceptions.noObject:
-                raise UMC_Error("Room %r not found." % (room_dn,))
 
         user_orig = user.get_udm_object(ldap_admin_write)
 
         if user_orig["disabled"] == "1":
             logger.info("Ignored disabled user {}".format(userdn))
-            self.finished(request.id, None)
-            return
+            return None
 
         if len(user_orig["sambaUserWorkstations"]) == 0:
             user_orig["sambaUserWorkstations"] = ["$"]
@@ -286,14 +385,11 @@ class Instance(SchoolBaseModule):
                     exam_user.name,
                     exam,
                 )
-            self.finished(request.id, {"success": True, "userdn": userdn, "examuserdn": exam_user.dn})
-            return
+            return {"success": True, "userdn": userdn, "examuserdn": exam_user.dn}
 
         # Check if it's blacklisted
-        for prohibited_object in univention.admin.handlers.settings.prohibited_username.lookup(
-            None, ldap_admin_write, ""
-        ):
-            if exam_user_uid in prohibited_object["usernames"]:
+        for prohibited_object_name, prohibited_usernames in prohibited_usernames:
+            if exam_user_uid in prohibited_usernames:
                 raise UMC_Error(
                     _(
                         "Requested exam username %(exam_user_uid)s is not allowed according to "
@@ -301,7 +397,7 @@ class Instance(SchoolBaseModule):
                     )
                     % {
                         "exam_user_uid": exam_user_uid,
-                        "prohibited_object_name": prohibited_object["name"],
+                        "prohibited_object_name": prohibited_object_name,
                     }
                 )
 
@@ -315,10 +411,7 @@ class Instance(SchoolBaseModule):
         except univention.admin.uexceptions.noLock:
             univention.admin.allocators.release(ldap_admin_write, ldap_position, "uid", exam_user_uid)
             logger.warning("The exam account does already exist for: %r", exam_user_uid)
-            self.finished(
-                request.id, {"success": True, "userdn": userdn, "examuserdn": exam_user_dn}, success=True
-            )
-            return
+            return {"success": True, "userdn": userdn, "examuserdn": exam_user_dn}
 
         # Ok, we have a valid target uid, so start cloning the user
         # deepcopy(user_orig) does not help much, as we cannot use users.user.object.create()
@@ -359,7 +452,7 @@ class Instance(SchoolBaseModule):
                 alloc.append(("sid", userSid))
 
             # Determine description attribute for exam_user
-            exam_user_description = request.options.get("description")
+            exam_user_description = description
             if not exam_user_description:
                 exam_user_description = _("Exam for user %s") % user_orig["username"]
 
@@ -527,7 +620,7 @@ class Instance(SchoolBaseModule):
         univention.admin.allocators.confirm(ldap_admin_write, ldap_position, "sid", userSid)
         univention.admin.allocators.confirm(ldap_admin_write, ldap_position, "uidNumber", uidNum)
 
-        self.finished(request.id, {"success": True, "userdn": userdn, "examuserdn": exam_user_dn})
+        return {"success": True, "userdn": userdn, "examuserdn": exam_user_dn}
 
     @sanitize(
         users=ListSanitizer(DNSanitizer(required=True), required=True),
@@ -798,13 +891,15 @@ class Instance(SchoolBaseModule):
 
         self.finished(request.id, {}, success=True)
 
-    def run_pre_create_hooks(self, exam_user_dn, al, ldap_admin_write):
+    def _load_pre_create_hooks(self, ldap_admin_write):
         if not self.exam_user_pre_create_hooks:
             add_module_logger_to_schoollib()
             pyhook_loader = ImportPyHookLoader(CREATE_USER_PRE_HOOK_DIR)
             hooks = pyhook_loader.init_hook(ExamUserPyHook, lo=ldap_admin_write, dry_run=False)
             self.exam_user_pre_create_hooks = hooks.get("pre_create", [])
 
+    def run_pre_create_hooks(self, exam_user_dn, al, ldap_admin_write):
+        self._load_pre_create_hooks(ldap_admin_write)
         for hook in self.exam_user_pre_create_hooks:
             al = hook(exam_user_dn, al)
 
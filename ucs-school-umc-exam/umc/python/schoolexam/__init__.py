@@ -31,6 +31,7 @@
 # /usr/share/common-licenses/AGPL-3; if not, see
 # <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import datetime
 import logging
 import os
@@ -42,7 +43,6 @@ import traceback
 from itertools import chain
 from typing import TYPE_CHECKING, List, Optional  # noqa: F401
 
-import ldap
 from ldap.dn import escape_dn_chars
 from ldap.filter import filter_format
 from samba.auth_util import system_session_unix
@@ -101,6 +101,9 @@ if TYPE_CHECKING:
 _ = Translation("ucs-school-umc-exam").translate
 
 CREATE_USER_POST_HOOK_DIR = "/usr/share/ucs-school-exam/hooks/create_exam_user_post.d/"
+CREATE_USERS_CHUNK_SIZE = 10  # number of exam users requested from the Primary Directory Node at once
+POST_HOOK_WORKERS = 4  # number of exam users for which the post hooks run in parallel
+REPLICATION_TIMEOUT = 30 * 60  # wait max. 30 minutes for replication
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 if "schoolexam" not in list(logger.handlers):
@@ -111,6 +114,22 @@ if "schoolexam" not in list(logger.handlers):
     logger.addHandler(_module_handler)
 
 
+def run_create_user_post_hooks(user):  # type: (util.distribution.User) -> bool
+    """Run the hook scripts in `CREATE_USER_POST_HOOK_DIR` for a replicated exam user."""
+    return 0 == subprocess.call(  # nosec
+        [
+            "/bin/run-parts",
+            CREATE_USER_POST_HOOK_DIR,
+            "--arg",
+            user.username,
+            "--arg",
+            user.dn,
+            "--arg",
+            user.homedir,
+        ]
+    )
+
+
 def load_smb_default_file() -> Optional[LoadParm]:
     """
     Try to load the default samba shares.conf and retry if this fails.
@@ -264,6 +283,35 @@ class Instance(SchoolBaseModule):
                 except subprocess.CalledProcessError:
                     logger.error("Could not set the immutable bit on %r", datadir)
 
+    @staticmethod
+    def _create_exam_users_one_by_one(client, users, options):
+        """
+        Request the exam accounts with one create-exam-user call per user, for a Primary
+        Directory Node that does not provide create-exam-users yet.
+
+        :param client: UMC client connected to the Primary Directory Node
+        :param users: recipients to create exam accounts for
+        :param dict options: options of the start_exam request
+        :return: list of results in the format of create-exam-users
+        """
+        results = []
+        for iuser in users:
+            try:
+                ires = client.umc_command(
+                    "schoolexam-master/create-exam-user",
+                    {
+                        "school": options["school"],
+                        "userdn": iuser.dn,
+                        "room": options["room"],
+                        "exam": options["name"],
+                    },
+                ).result
+            except (ConnectionError, HTTPError) as exc:
+                ires = {"success": False, "examuserdn": None, "message": str(exc)}
+            if ires:  # empty if a disabled user was ignored
+                results.append(dict(ires, userdn=iuser.dn))
+        return results
+
     @file_upload
     @sanitize(
         DictSanitizer(
@@ -578,6 +626,7 @@ class Instance(SchoolBaseModule):
 
             # read all recipients and fetch all user objects
             users = []
+            user_dns = set()
             for idn in request.options["recipients"]:
                 ientry = util.distribution.openRecipients(idn, ldap_user_read)
                 if not ientry:
@@ -590,9 +639,12 @@ class Instance(SchoolBaseModule):
                     members = ientry.members
                 for entry in members:
                     # ignore all users except students
+                    if entry.dn in user_dns:
+                        continue
                     user = User.from_dn(entry.dn, None, ldap_user_read)
                     if user.is_student(ldap_user_read) and not user.is_exam_student(ldap_user_read):
                         users.append(entry)
+                        user_dns.add(entry.dn)
 
             # start to create exam user accounts
             progress.component(_("Preparing exam accounts"))
@@ -600,40 +652,69 @@ class Instance(SchoolBaseModule):
             examUsers = set()
             student_dns = set()
             usersReplicated = set()
-            for num, iuser in enumerate(users, start=1):
+            create_in_batches = True
+            for start in range(0, len(users), CREATE_USERS_CHUNK_SIZE):
+                chunk = users[start : start + CREATE_USERS_CHUNK_SIZE]
                 logger.info(
-                    "start_exam() Requesting exam user %02d/%02d to be created: %r",
-                    num,
+                    "start_exam() Requesting exam users %02d-%02d/%02d to be created: %r",
+                    start + 1,
+                    start + len(chunk),
                     len(users),
-                    iuser.dn,
-                )
-                progress.info(
-                    "(%02d/%02d) %s, %s (%s)"
-                    % (num, len(users), iuser.lastname, iuser.firstname, iuser.username)
+                    [iuser.dn for iuser in chunk],
                 )
                 try:
-                    ires = client.umc_command(
-                        "schoolexam-master/create-exam-user",
-                        {
-                            "school": request.options["school"],
-                            "userdn": iuser.dn,
-                            "room": request.options["room"],
-                            "exam": request.options["name"],
-                        },
-                    ).result
-                    if not ires:  # occurs if disabled user gets ignored
-                        continue
-                    examuser_dn = ires.get("examuserdn")
-                    examUsers.add(examuser_dn)
-                    student_dns.add(iuser.dn)
-                    logger.info("start_exam() Exam user has been created: %r", examuser_dn)
+                    if create_in_batches:
+                        try:
+                            results = client.umc_command(
+                                "schoolexam-master/create-exam-users",
+                                {
+                                    "school": request.options["school"],
+                                    "users": [iuser.dn for iuser in chunk],
+                                    "room": request.options["room"],
+                                    "exam": request.options["name"],
+                                },
+                            ).result
+                        except HTTPError as exc:
+                            if exc.status != 404:
+                                raise
+                            # the Primary Directory Node has not been updated yet
+                            logger.warning(
+                                "start_exam() Command create-exam-users not found, requesting "
+                                "exam users one by one: %s",
+                                exc,
+                            )
+                            create_in_batches = False
+                    if not create_in_batches:
+                        results = self._create_exam_users_one_by_one(client, chunk, request.options)
                 except (ConnectionError, HTTPError) as exc:
                     logger.warning(
-                        "start_exam() Could not create exam user account for %r: %s", iuser.dn, exc
+                        "start_exam() Could not create exam user accounts for %r: %s",
+                        [iuser.dn for iuser in chunk],
+                        exc,
                     )
+                    results = []
+                results = {ires["userdn"]: ires for ires in results}
+                for num, iuser in enumerate(chunk, start=start + 1):
+                    progress.info(
+                        "(%02d/%02d) %s, %s (%s)"
+                        % (num, len(users), iuser.lastname, iuser.firstname, iuser.username)
+                    )
+                    ires = results.get(iuser.dn, {})
+                    examuser_dn = ires.get("examuserdn")
+                    if examuser_dn:
+                        examUsers.add(examuser_dn)
+                        student_dns.add(iuser.dn)
+                        logger.info("start_exam() Exam user has been created: %r", examuser_dn)
+                    elif not ires.get("success", True):
+                        logger.warning(
+                            "start_exam() Could not create exam user account for %r: %s",
+                            iuser.dn,
+                            ires.get("message"),
+                        )
+                    # else: connection error (logged above) or disabled user that was ignored
 
-                # indicate the the user has been processed
-                progress.add_steps(percentPerUser)
+                    # indicate the the user has been processed
+                    progress.add_steps(percentPerUser)
 
             logger.info(
                 "start_exam() Sending DNs to add to group to Primary Directory Node: %r", student_dns
@@ -647,67 +728,61 @@ class Instance(SchoolBaseModule):
             # wait for the replication of all users to be finished
             progress.component(_("Preparing user home directories"))
             recipients = []  # list of User objects for all exam users
-            openAttempts = 30 * 60  # wait max. 30 minutes for replication
-            while (len(examUsers) > len(usersReplicated)) and (openAttempts > 0):
-                openAttempts -= 1
-                logger.info(
-                    "start_exam() waiting for replication to be finished, %d user objects missing",
-                    len(examUsers) - len(usersReplicated),
-                )
-                for idn in examUsers - usersReplicated:
-                    try:
-                        ldap_user_read.get(idn, required=True)
-                    except ldap.NO_SUCH_OBJECT:
-                        continue  # not replicated yet
-                    iuser = util.distribution.openRecipients(idn, ldap_user_read)
-                    if not iuser:
-                        continue  # not a users/user object
-                    logger.info("user has been replicated: %r", idn)
-
-                    # Bug #52307:
-                    # Creating two exams quickly in succession leads to the
-                    # second exam mode using the same UIDs as the first.
-                    # -> clear user name cache to force Samba to get the
-                    # new UID from ldap.
-                    logger.info("Clear user name cache...")
-                    cmd = ["/usr/sbin/nscd", "-i", "passwd"]
-                    if subprocess.call(cmd):  # nosec
-                        logger.error("Clearing user name cache failed: %s", " ".join(cmd))
-                    else:
-                        logger.info("Clearing user name cache finished successfully.")
-
-                    # call hook scripts
-                    if 0 != subprocess.call(  # nosec
-                        [
-                            "/bin/run-parts",
-                            CREATE_USER_POST_HOOK_DIR,
-                            "--arg",
-                            iuser.username,
-                            "--arg",
-                            iuser.dn,
-                            "--arg",
-                            iuser.homedir,
-                        ]
-                    ):
-                        raise ValueError(f"failed to run hook scripts for user {iuser.username!r}")
-
-                    # store User object in list of final recipients
-                    recipients.append(iuser)
-
-                    # mark the user as replicated
-                    usersReplicated.add(idn)
-                    progress.info(
-                        f"({len(usersReplicated):02d}/{len(examUsers):02d}) {iuser.lastname}, "
-                        f"{iuser.firstname} ({iuser.username})"
+            deadline = time.monotonic() + REPLICATION_TIMEOUT
+            wait = 0.25
+            with concurrent.futures.ThreadPoolExecutor(max_workers=POST_HOOK_WORKERS) as hook_pool:
+                hook_results = []
+                while examUsers - usersReplicated and time.monotonic() < deadline:
+                    logger.info(
+                        "start_exam() waiting for replication to be finished, %d user objects missing",
+                        len(examUsers) - len(usersReplicated),
                     )
-                    progress.add_steps(percentPerUser)
+                    new_users = []
+                    for idn in util.find_replicated(ldap_user_read, examUsers - usersReplicated):
+                        iuser = util.distribution.openRecipients(idn, ldap_user_read)
+                        if not iuser:
+                            continue  # not a users/user object
+                        logger.info("user has been replicated: %r", idn)
+                        new_users.append(iuser)
+                        # mark the user as replicated
+                        usersReplicated.add(idn)
+
+                    if new_users:
+                        # Bug #52307:
+                        # Creating two exams quickly in succession leads to the
+                        # second exam mode using the same UIDs as the first.
+                        # -> clear user name cache to force Samba to get the
+                        # new UID from ldap.
+                        logger.info("Clear user name cache...")
+                        cmd = ["/usr/sbin/nscd", "-i", "passwd"]
+                        if subprocess.call(cmd):  # nosec
+                            logger.error("Clearing user name cache failed: %s", " ".join(cmd))
+                        else:
+                            logger.info("Clearing user name cache finished successfully.")
+
+                    for iuser in new_users:
+                        # call hook scripts
+                        hook_result = hook_pool.submit(run_create_user_post_hooks, iuser)
+                        hook_results.append((iuser, hook_result))
+                        # store User object in list of final recipients
+                        recipients.append(iuser)
+                        progress.info(
+                            f"({len(recipients):02d}/{len(examUsers):02d}) {iuser.lastname}, "
+                            f"{iuser.firstname} ({iuser.username})"
+                        )
+                        progress.add_steps(percentPerUser)
 
-                # wait a second
-                time.sleep(1)
+                    if examUsers - usersReplicated:
+                        time.sleep(wait)
+                        wait = min(wait * 2, 1.0)
+
+                for iuser, hook_result in hook_results:
+                    if not hook_result.result():
+                        raise ValueError(f"failed to run hook scripts for user {iuser.username!r}")
 
             progress.add_steps(percentPerUser)
 
-            if openAttempts <= 0:
+            if examUsers - usersReplicated:
                 logger.error(
                     "replication timeout - %d user objects missing: %r ",
                     (len(examUsers) - len(usersReplicated)),
@@ -734,16 +809,18 @@ class Instance(SchoolBaseModule):
             # distribute exam files
             progress.component(_("Distributing exam files"))
             progress.info("")
-            exam_students = [
-                s
-                for s in my.project.getRecipients()
-                if User.from_dn(s.dn, None, ldap_user_read).is_exam_student(ldap_user_read)
-            ]
+            exam_recipients = my.project.getRecipients()
+            exam_student_dns = util.distribution.get_dns_with_object_class(
+                ldap_user_read, exam_recipients, "ucsschoolExam"
+            )
+            exam_students = [s for s in exam_recipients if s.dn.lower() in exam_student_dns]
             Instance.set_datadir_immutable_flag(exam_students, my.project, False)
-            my.project.distribute()
+            my.project.distribute(
+                callback=lambda user, success: progress.add_steps(15.0 / len(exam_recipients))
+            )
             self.set_nt_acls_on_exam_folders(exam_students)
             Instance.set_datadir_immutable_flag(exam_students, my.project, True)
-            progress.add_steps(20)
+            progress.add_steps(5)
 
             # prepare room settings via lib...
             #   first step: acquire room
@@ -31,10 +31,15 @@
 # <http://www.gnu.org/licenses/>.
 
 import logging
+from typing import TYPE_CHECKING, Iterable, Set  # noqa: F401
 
 import univention.management.console.modules.distribution.util as distribution
+from ucsschool.lib.models.utils import MAX_FILTER_TERMS, search_by_dn
 from univention.management.console.config import ucr
 
+if TYPE_CHECKING:
+    from univention.admin.uldap import access as LoType  # noqa: F401
+
 distribution.DISTRIBUTION_DATA_PATH = ucr.get(
     "ucsschool/exam/cache", "/var/lib/ucs-school-umc-schoolexam"
 )
@@ -81,3 +86,20 @@ class Progress(object):
 
     def add_steps(self, steps=1):
         self._steps += steps
+
+
+def find_replicated(lo, dns, max_filter_terms=MAX_FILTER_TERMS):
+    # type: (LoType, Iterable[str], int) -> Set[str]
+    """
+    Find out which of the LDAP objects `dns` exist in the LDAP server of `lo`.
+
+    Instead of reading every object, the objects are searched with one OR filter of their RDNs
+    per parent container, see :py:func:`ucsschool.lib.models.utils.search_by_dn()`.
+
+    :param lo: LDAP connection, usually to the local LDAP server
+    :param dns: DNs of the objects to look for
+    :param int max_filter_terms: maximum number of RDNs in one search filter
+    :return: those of `dns` that exist
+    :rtype: set
+    """
+    return {dn for dn, _attrs in search_by_dn(lo, dns, attr=["dn"], max_filter_terms=max_filter_terms)}
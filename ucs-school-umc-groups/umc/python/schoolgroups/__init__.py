@@ -34,12 +34,13 @@
 from ldap.dn import explode_rdn
 from ldap.filter import filter_format
 
+import univention.admin.modules as udm_modules
 import univention.admin.uexceptions as udm_exceptions
 from ucsschool.lib.models.attributes import ValidationError
-from ucsschool.lib.models.base import WrongObjectType
 from ucsschool.lib.models.group import SchoolClass, SchoolGroup, WorkGroup
 from ucsschool.lib.models.share import GroupShare
-from ucsschool.lib.models.user import Teacher, TeachersAndStaff, User
+from ucsschool.lib.models.user import Teacher, TeachersAndStaff
+from ucsschool.lib.models.utils import MAX_FILTER_TERMS, search_by_dn
 from ucsschool.lib.school_umc_base import Display, SchoolBaseModule, SchoolSanitizer
 from ucsschool.lib.school_umc_ldap_connection import (
     MACHINE_WRITE,
@@ -88,6 +89,52 @@ def get_exception_msg(e):
     return msg
 
 
+class _Member(object):
+    """
+    Group member read by :py:func:`_read_members()`, with the role checks of
+    :py:class:`ucsschool.lib.models.user.User`, but without further LDAP access.
+    """
+
+    ATTRS = ["objectClass", "uid", "uidNumber", "givenName", "sn", "ucsschoolSchool"]
+
+    def __init__(self, dn, attrs):
+        self.dn = dn
+        self.object_classes = {oc.decode("UTF-8") for oc in attrs.get("objectClass", [])}
+        self.schools = [school.decode("UTF-8") for school in attrs.get("ucsschoolSchool", [])]
+        self.label = Display.user_ldap(attrs)
+
+    def is_student(self):
+        return "ucsschoolStudent" in self.object_classes
+
+    def is_teacher(self):
+        return "ucsschoolTeacher" in self.object_classes
+
+    def is_staff(self):
+        return "ucsschoolStaff" in self.object_classes
+
+    def is_administrator(self):
+        return "ucsschoolAdministrator" in self.object_classes
+
+
+def _read_members(dns, ldap_connection, max_filter_terms=MAX_FILTER_TERMS):
+    """
+    Read the objects `dns` with one LDAP search per container and `max_filter_terms` objects
+    (see :py:func:`ucsschool.lib.models.utils.search_by_dn()`), instead of opening each one
+    with UDM.
+
+    return: dict: DN (as in `dns`) -> `_Member` for users, `None` for other objects (e.g.
+        computers). Objects that don't exist or cannot be read are missing.
+    """
+    user_module = udm_modules.get("users/user")
+    members = {}
+    attrs = _Member.ATTRS + ["univentionObjectType"]
+    for dn, ldap_attrs in search_by_dn(
+        ldap_connection, dns, attr=attrs, max_filter_terms=max_filter_terms
+    ):
+        members[dn] = _Member(dn, ldap_attrs) if user_module.identify(dn, ldap_attrs) else None
+    return members
+
+
 def _filter_users(
     input_users,
     school,
@@ -110,45 +157,37 @@ def _filter_users(
       * For flavor "workgroup":
         * User must be a student.
 
+    All users are read with a few LDAP searches, see `_read_members()`.
+
     return: filtered list of users
     """
+    members = _read_members(input_users, ldap_machine_write)
     users = []
     # add only certain users to the group
     for userdn in input_users:
-        try:
-            user = User.from_dn(userdn, None, ldap_machine_write)
-        except WrongObjectType:
+        if userdn not in members:
+            MODULE.error("Not adding not existing user %r to group." % (userdn,))
+            continue
+        user = members[userdn]
+        if user is None:
             # the object is not a user, so it will just be added without filtering
             users.append(userdn)
             MODULE.info("Adding non user object %r." % userdn)
             continue
-        except udm_exceptions.noObject as exc:
-            MODULE.error("Not adding not existing user %r to group: %r." % (userdn, exc))
-            continue
         if not user.schools or not set(user.schools) & {school}:
-            raise UMC_Error(
-                _("User %s does not belong to school %r.")
-                % (Display.user(user.get_udm_object(ldap_machine_write)), school)
-            )
+            raise UMC_Error(_("User %s does not belong to school %r.") % (user.label, school))
         if (
             flavor == "workgroup-admin"
-            and not user.is_student(ldap_machine_write)
-            and not user.is_administrator(ldap_machine_write)
-            and not user.is_staff(ldap_machine_write)
-            and not user.is_teacher(ldap_machine_write)
+            and not user.is_student()
+            and not user.is_administrator()
+            and not user.is_staff()
+            and not user.is_teacher()
         ):
-            raise UMC_Error(
-                _("User %s does not belong to school %r.")
-                % (Display.user(user.get_udm_object(ldap_machine_write)), school)
-            )
-        if flavor == "class" and not user.is_teacher(ldap_machine_write):
-            raise UMC_Error(
-                _("User %s is not a teacher.") % (Display.user(user.get_udm_object(ldap_machine_write)),)
-            )
-        if flavor == "workgroup" and not user.is_student(ldap_machine_write):
-            raise UMC_Error(
-                _("User %s is not a student.") % (Display.user(user.get_udm_object(ldap_machine_write)),)
-            )
+            raise UMC_Error(_("User %s does not belong to school %r.") % (user.label, school))
+        if flavor == "class" and not user.is_teacher():
+            raise UMC_Error(_("User %s is not a teacher.") % (user.label,))
+        if flavor == "workgroup" and not user.is_student():
+            raise UMC_Error(_("User %s is not a student.") % (user.label,))
         users.append(user.dn)
 
     return users
@@ -188,8 +227,8 @@ class Instance(SchoolBaseModule):
             group = None
 
         result = [
-            {"id": i.dn, "label": Display.user(i)}
-            for i in self._users(
+            {"id": i.dn, "label": Display.user_record(i)}
+            for i in self._user_records(
                 ldap_user_read,
                 request.options["school"],
                 group=group,
@@ -243,11 +282,13 @@ class Instance(SchoolBaseModule):
                 {"id": dn, "label": explode_rdn(dn, True)[0]}
                 for dn in result["allowed_email_senders_groups"]
             ]
+            senders = result["allowed_email_senders_users"]
+            members = _read_members(senders, ldap_user_read)
             umc_users = []
-            for user_dn in result["allowed_email_senders_users"]:
-                user = User.from_dn(user_dn, None, ldap_user_read)
+            for user_dn in senders:
+                user = members.get(user_dn)
                 umc_users.append(
-                    {"id": user_dn, "label": Display.user(user.get_udm_object(ldap_user_read))}
+                    {"id": user_dn, "label": user.label if user else explode_rdn(user_dn, True)[0]}
                 )
             result["allowed_email_senders_users"] = umc_users
             if result["email"]:
@@ -275,10 +316,10 @@ class Instance(SchoolBaseModule):
     def _filter_members(request, group, users, ldap_user_read=None):
         """Filter out group members that should no be shown in current module flavor."""
         members = []
+        users_from_ldap = _read_members(users, ldap_user_read)
         for member_dn in users:
-            try:
-                user = User.from_dn(member_dn, None, ldap_user_read)
-            except udm_exceptions.noObject:
+            user = users_from_ldap.get(member_dn)
+            if user is None:
                 MODULE.process(
                     "Could not open (foreign) user %r: no permissions/does not exists/not a user"
                     % (member_dn,)
@@ -286,19 +327,19 @@ class Instance(SchoolBaseModule):
                 continue
             if not user.schools or not set(user.schools).intersection({group.school}):
                 continue
-            if request.flavor == "class" and not user.is_teacher(ldap_user_read):
+            if request.flavor == "class" and not user.is_teacher():
                 continue  # only display teachers
-            elif request.flavor == "workgroup" and not user.is_student(ldap_user_read):
+            elif request.flavor == "workgroup" and not user.is_student():
                 continue  # only display students
             elif (
                 request.flavor == "workgroup-admin"
-                and not user.is_student(ldap_user_read)
-                and not user.is_administrator(ldap_user_read)
-                and not user.is_staff(ldap_user_read)
-                and not user.is_teacher(ldap_user_read)
+                and not user.is_student()
+                and not user.is_administrator()
+                and not user.is_staff()
+                and not user.is_teacher()
             ):
                 continue  # only display school users
-            members.append({"id": user.dn, "label": Display.user(user.get_udm_object(ldap_user_read))})
+            members.append({"id": user.dn, "label": user.label})
         return members
 
     @sanitize(DictSanitizer({"object": DictSanitizer({}, required=True)}))
@@ -349,10 +390,10 @@ class Instance(SchoolBaseModule):
 
         users = []
         # keep specific users from the group
+        users_from_ldap = _read_members(group_from_ldap.users, ldap_machine_write)
         for userdn in group_from_ldap.users:
-            try:
-                user = User.from_dn(userdn, None, ldap_machine_write)
-            except udm_exceptions.noObject:
+            user = users_from_ldap.get(userdn)
+            if user is None:
                 # no permissions/is not a user/does not exists → keep the old value
                 users.append(userdn)
                 continue
@@ -360,8 +401,8 @@ class Instance(SchoolBaseModule):
                 users.append(userdn)
                 continue
             if (
-                (request.flavor == "class" and not user.is_teacher(ldap_machine_write))
-                or (request.flavor == "workgroup" and not user.is_student(ldap_machine_write))
+                (request.flavor == "class" and not user.is_teacher())
+                or (request.flavor == "workgroup" and not user.is_student())
                 or request.flavor == "workgroup-admin"
             ):
                 users.append(userdn)
@@ -469,13 +510,10 @@ class Instance(SchoolBaseModule):
     def add_teacher_to_classes(
         self, request, ldap_machine_write=None, ldap_user_read=None, ldap_position=None
     ):
-        teacher = request.options["$dn$"]
+        teacher_dn = request.options["$dn$"]
         classes = set(request.options["classes"])
-        try:
-            teacher = Teacher.from_dn(teacher, None, ldap_machine_write)
-            if not teacher.is_teacher(ldap_machine_write):
-                raise udm_exceptions.noObject()
-        except udm_exceptions.noObject:
+        teacher = _read_members([teacher_dn], ldap_machine_write).get(teacher_dn)
+        if teacher is None or not teacher.is_teacher():
             raise UMC_Error("The user is not a teacher.")
 
         original_classes = set()
@@ -40,27 +40,41 @@ from io import StringIO
 from ldap.dn import explode_rdn
 from six.moves.urllib_parse import quote
 
+import univention.admin.modules as udm_modules
+from ucsschool.lib.models.group import SchoolClass
 from ucsschool.lib.models.user import User
+from ucsschool.lib.models.utils import paged_search
 from ucsschool.lib.school_umc_base import SchoolBaseModule
 from ucsschool.lib.school_umc_ldap_connection import LDAP_Connection
+from univention.admin.handlers.users.user import unmapDisabled
 from univention.lib.i18n import Translation
 from univention.management.console.config import ucr
 from univention.management.console.log import MODULE
 from univention.management.console.modules import UMC_Error
 from univention.management.console.modules.decorators import allow_get_request, sanitize
 from univention.management.console.modules.sanitizers import (
+    ListSanitizer,
     StringSanitizer,
 )
 
 _ = Translation("ucs-school-umc-lists").translate
 
+CLASSLIST_PATH = "/usr/share/ucs-school-umc-lists/classlists/"
+# LDAP attributes needed to find out whether a user is deactivated, see unmapDisabled()
+DISABLED_LDAP_ATTRS = ["krb5KDCFlags", "sambaAcctFlags", "shadowExpire"]
+
+
+def write_classlist(fd, fieldnames, students, separator):
+    """Write the rows `students` (e.g. from a generator) one by one to the open file `fd`."""
+    writer = csv.writer(fd, delimiter=str(separator))
+    writer.writerow(fieldnames)
+    for row in students:
+        writer.writerow(row)
+
 
 def write_classlist_csv(fieldnames, students, separator):
     with StringIO() as csvfile:
-        writer = csv.writer(csvfile, delimiter=str(separator))
-        writer.writerow(fieldnames)
-        for row in students:
-            writer.writerow(row)
+        write_classlist(csvfile, fieldnames, students, separator)
         return csvfile.getvalue()
 
 
@@ -69,8 +83,7 @@ class Instance(SchoolBaseModule):
     @sanitize(classlist=StringSanitizer(required=True))
     def csv_get(self, request):
         classlist = request.options["classlist"]
-        path = "/usr/share/ucs-school-umc-lists/classlists/"
-        filename = os.path.join(path, os.path.basename(classlist))
+        filename = os.path.join(CLASSLIST_PATH, os.path.basename(classlist))
         # Bug #57018 - retrieve charset from filename
         charset = "utf-16" if "UTF-16" in filename else "utf-8"
         try:
@@ -82,53 +95,60 @@ class Instance(SchoolBaseModule):
                 status=404,
             )
 
+    @sanitize(groups=ListSanitizer(StringSanitizer(required=True), default=[]))
     @LDAP_Connection()
     def csv_list(self, request, ldap_user_read=None, ldap_position=None):
         school = request.options["school"]
-        group = request.options["group"]
+        groups = request.options["groups"] or [request.options["group"]]
         separator = request.options["separator"]
         exclude_deactivated = request.options["exclude_deactivated"]
         default = "firstname Firstname,lastname Lastname,Class Class,username Username"
         ucr_value = ucr.get("ucsschool/umc/lists/class/attributes", "") or default
         attributes, fieldnames = zip(*[field.split() for field in ucr_value.split(",")])
-        rows = []
-        for student in self.students(ldap_user_read, school, group):
-            if exclude_deactivated and not student.is_active():
+
+        User.init_udm_module(ldap_user_read)  # load extended attributes
+        user_module = udm_modules.get("users/user")
+        ldap_attrs = {"uid"}  # an empty list would fetch all attributes
+        ldap_names = {}
+        for attr in attributes:
+            if attr == "Class":
                 continue
-            row = []
-            student_udm_obj = student.get_udm_object(ldap_user_read)
-            if school not in student.school_classes:
-                MODULE.error(
-                    "Student missing class in school {!r}: {!r}".format(school, student_udm_obj.dn)
+            if attr not in user_module.property_descriptions:
+                raise UMC_Error(
+                    _(
+                        "{!r} is not a valid UDM-property. Please change the value of the UCR "
+                        "variable ucsschool/umc/lists/class/attributes."
+                    ).format(attr)
                 )
-                continue
-            for attr in attributes:
-                if attr == "Class":
-                    row.append(student.school_classes[school][0].split("-", 1)[1])
-                else:
-                    try:
-                        value = student_udm_obj[attr]
-                    except KeyError:
-                        raise UMC_Error(
-                            _(
-                                "{!r} is not a valid UDM-property. Please change the value of the UCR "
-                                "variable ucsschool/umc/lists/class/attributes."
-                            ).format(attr)
-                        )
-                    if isinstance(value, list):
-                        value = " ".join(value)
-                    row.append(value)
-            rows.append(row)
-
-        classlistname = explode_rdn(group, True)[0]
+            ldap_names[attr] = user_module.mapping.mapName(attr)
+            if ldap_names[attr]:
+                ldap_attrs.add(ldap_names[attr])
+        if exclude_deactivated:
+            ldap_attrs.update(DISABLED_LDAP_ATTRS)
+
+        if len(groups) == 1:
+            classlistname = explode_rdn(groups[0], True)[0]
+        else:
+            classlistname = school
         timestamp = datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
         # Bug #57018 - workaround to pass used encoding in filename
         enc = "UTF-16" if separator == "\t" else "UTF-8"
         filename = "%s_%s_%s-%s.csv" % (classlistname.replace("/", "_"), enc, timestamp, uuid.uuid4())
-        path = os.path.join("/usr/share/ucs-school-umc-lists/classlists/", filename)
-        with open(path, "w", encoding=enc) as fd:
+        path = os.path.join(CLASSLIST_PATH, filename)
+        # resolve the members before creating the file, a group may not exist
+        students = self.students(ldap_user_read, school, groups, sorted(ldap_attrs))
+        rows = self._classlist_rows(
+            ldap_user_read,
+            school,
+            students,
+            self.school_classes(ldap_user_read, school),
+            attributes,
+            ldap_names,
+            exclude_deactivated,
+        )
+        with open(path, "w", encoding=enc, newline="") as fd:
             os.chmod(path, 0o600)
-            fd.write(write_classlist_csv(fieldnames, rows, separator))
+            write_classlist(fd, fieldnames, rows, separator)
 
         url = "/univention/command/schoollists/csvlistget?classlist=%s" % (quote(filename),)
         self.finished(
@@ -139,6 +159,71 @@ class Instance(SchoolBaseModule):
             },
         )
 
-    def students(self, lo, school, group):
-        for user in self._users(lo, school, group=group, user_type="student"):
-            yield User.from_udm_obj(user, school, lo)
+    def _classlist_rows(
+        self, lo, school, students, school_classes, attributes, ldap_names, exclude_deactivated
+    ):
+        user_module = udm_modules.get("users/user")
+        # properties not stored in one LDAP attribute are read from the UDM object
+        use_udm = not all(ldap_names.values())
+        for dn, student_ldap_attrs in students:
+            if exclude_deactivated and unmapDisabled(student_ldap_attrs) == "1":
+                continue
+            if dn.lower() not in school_classes:
+                MODULE.error("Student missing class in school {!r}: {!r}".format(school, dn))
+                continue
+            udm_obj = None
+            if use_udm:
+                udm_obj = user_module.object(None, lo, None, dn)
+                udm_obj.open()
+            row = []
+            for attr in attributes:
+                if attr == "Class":
+                    row.append(school_classes[dn.lower()][0].split("-", 1)[1])
+                    continue
+                if udm_obj is not None:
+                    value = udm_obj[attr]
+                elif student_ldap_attrs.get(ldap_names[attr]):
+                    value = user_module.mapping.unmapValue(attr, student_ldap_attrs[ldap_names[attr]])
+                else:
+                    value = ""
+                if isinstance(value, list):
+                    value = " ".join(value)
+                row.append(value)
+            yield row
+
+    def students(self, lo, school, groups, ldap_attrs):
+        """
+        Find the students of `school`, that are members of one of the `groups`. The members are
+        read from the groups and searched in bulk (see :py:meth:`_search_users()`).
+
+        :return: list of tuples `(dn, attrs)` with the raw LDAP attributes `ldap_attrs`
+        :raises noObject: if a group does not exist
+        """
+        students = []
+        seen = set()
+        for group in groups:
+            results, missing = self._search_users(lo, school, group, "student", attr=ldap_attrs)
+            self._log_missing_members(group, missing)
+            for dn, attrs in results:
+                if dn.lower() not in seen:
+                    seen.add(dn.lower())
+                    students.append((dn, attrs))
+        return students
+
+    def school_classes(self, lo, school):
+        """
+        Find the school classes of `school` with one paged LDAP search.
+
+        :return: dict: lower case member DN -> list of class names
+        """
+        school_classes = {}
+        for _dn, attrs in paged_search(
+            lo,
+            "(objectClass=univentionGroup)",
+            attr=["cn", "uniqueMember"],
+            base=SchoolClass.get_container(school),
+        ):
+            name = attrs["cn"][0].decode("UTF-8")
+            for member in attrs.get("uniqueMember", []):
+                school_classes.setdefault(member.decode("UTF-8").lower(), []).append(name)
+        return school_classes
@@ -104,6 +104,7 @@ def monkey_post(*args, **kwargs):
             "encoding_error",
             "invalid_feature",
             "get_feature",
+            "set_feature",
             "user_info",
             "idle_timeout",
             "remove_session",
@@ -123,6 +124,18 @@ def monkey_post(*args, **kwargs):
     return response
 
 
+def monkey_put(*args, **kwargs):
+    response = Response()
+    feature = args[1].split("/")[2]
+    if feature == "SCREEN_LOCK":
+        response.status_code = 200
+        response._content = b"{}"
+    else:
+        response.status_code = 400
+        response._content = b'{"error":{"code":3,"message":"Invalid feature"}}'
+    return response
+
+
 def monkey_delete(*args, **kwargs):
     return None
 
@@ -244,6 +257,31 @@ def test_get_feature_status(monkeypatch, feature, expected):
     assert client.get_feature_status(feature) == expected
 
 
+def test_get_feature_statuses(monkeypatch):
+    monkeypatch.setattr(requests.Session, "get", monkey_get)
+    monkeypatch.setattr(requests.Session, "post", monkey_post)
+    monkeypatch.setattr(requests.Session, "delete", monkey_delete)
+    client = VeyonClient("get_feature", {}, auth_method=AuthenticationMethod.AUTH_LOGON)
+    assert client.get_feature_statuses(["REBOOT", "SCREEN_LOCK"]) == {
+        "REBOOT": False,
+        "SCREEN_LOCK": True,
+    }
+
+
+def test_set_feature_on_hosts(monkeypatch):
+    monkeypatch.setattr(requests.Session, "put", monkey_put)
+    monkeypatch.setattr(requests.Session, "post", monkey_post)
+    monkeypatch.setattr(requests.Session, "delete", monkey_delete)
+    client = VeyonClient("set_feature", {}, auth_method=AuthenticationMethod.AUTH_LOGON)
+    assert client.set_feature_on_hosts("SCREEN_LOCK", ["host1", "host2"]) == {
+        "host1": None,
+        "host2": None,
+    }
+    errors = client.set_feature_on_hosts("NON_EXISTENT_FEATURE", ["host1"])
+    assert isinstance(errors["host1"], VeyonError)
+    assert errors["host1"].code == 3
+
+
 def test_get_user_info(monkeypatch):
     monkeypatch.setattr(requests.Session, "get", monkey_get)
     monkeypatch.setattr(requests.Session, "post", monkey_post)
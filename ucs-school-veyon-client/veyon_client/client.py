@@ -27,13 +27,14 @@
 # /usr/share/common-licenses/AGPL-3; if not, see
 # <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import socket
 import threading
 import time
 from collections import defaultdict
 from datetime import datetime
 from threading import Lock
-from typing import TYPE_CHECKING, Dict, Optional  # noqa: F401
+from typing import TYPE_CHECKING, Dict, Iterable, Optional  # noqa: F401
 
 import requests
 
@@ -62,7 +63,8 @@ class VeyonClient:
         auth_method=AuthenticationMethod.AUTH_KEYS,
         default_host="localhost",
         idle_timeout=60,
-    ):  # type: (str, Dict[str, str], Optional[AuthenticationMethod], str, int) -> None
+        max_workers=16,
+    ):  # type: (str, Dict[str, str], Optional[AuthenticationMethod], str, int, int) -> None
         """
         Creates a client that communicates with the Veyon API to control features and fetch
         screenshots.
@@ -73,6 +75,8 @@ class VeyonClient:
         :param default_host: The default host to connect to if no specific host is provided
         :param idle_timeout: The maximum time a connection can be idle without being invalidated by the
             server. Has to be a value > 0. If the given value is < 1, the value is set to 1.
+        :param max_workers: The maximum number of requests sent in parallel by the methods working
+            on multiple features or hosts
         """
         self._url = url
         self._credentials = credentials
@@ -94,6 +98,23 @@ class VeyonClient:
         """This lock is needed to ensure thread safe operation of the defaultdict for the individual
         session locks"""
 
+        self._max_workers = max_workers
+        self._executor = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+        self._executor_lock = Lock()  # type: Lock
+
+    @property
+    def executor(self):  # type: () -> concurrent.futures.ThreadPoolExecutor
+        """
+        Thread pool for parallel requests. The worker threads live as long as the client, so each of
+        them keeps reusing its own requests.Session (and thus its HTTP connection).
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="VeyonClient"
+                )
+            return self._executor
+
     def _get_headers(self, host=None):  # type: (Optional[str]) -> Dict[str, str]
         return {"Connection-Uid": self._get_connection_uid(host)}
 
@@ -257,6 +278,26 @@ class VeyonClient:
             raise VeyonConnectionError(exc)
         check_veyon_error(result)
 
+    def set_feature_on_hosts(self, feature, hosts, active=True, arguments=None):
+        # type: (Feature, Iterable[str], Optional[bool], Optional[Dict[str, str]]) -> Dict[str, Optional[Exception]]  # noqa: E501
+        """
+        De-/Activates a Veyon feature on multiple hosts in parallel
+
+        :param feature: The feature to set
+        :param hosts: The hosts to set the feature for
+        :param active: True if the feature should be activated or triggered, False to deactivate a
+            feature
+        :param arguments: A dictionary containing additional arguments for the feature
+        :returns: The error (VeyonError or VeyonConnectionError) per host or None if setting the
+            feature was successful
+        :rtype: dict
+        """
+        futures = {
+            host: self.executor.submit(self.set_feature, feature, host, active, arguments)
+            for host in hosts
+        }
+        return {host: future.exception() for host, future in futures.items()}
+
     def get_feature_status(self, feature, host=None):  # type: (Feature, Optional[str]) -> bool
         """
         Fetches the status of a given feature on a given host.
@@ -277,6 +318,32 @@ class VeyonClient:
         check_veyon_error(result)
         return result.json()["active"]
 
+    def get_feature_statuses(self, features, host=None):
+        # type: (Iterable[Feature], Optional[str]) -> Dict[Feature, bool]
+        """
+        Fetches the status of multiple features on a given host in parallel.
+
+        :param features: The features to fetch the status for
+        :param host: The host to fetch the feature status for. If not specified the default host is used.
+
+        :returns: The status per feature, see :py:meth:`get_feature_status`
+        :rtype: dict
+        :raises VeyonError: If fetching the status of any of the features failed
+        :raises VeyonConnectionError: If the Veyon API could not be reached
+        """
+        features = list(features)
+        if len(features) > 1:
+            # create the session before sending the requests in parallel
+            try:
+                self._get_connection_uid(host)
+            except requests.RequestException as exc:
+                raise VeyonConnectionError(exc)
+        futures = [
+            (feature, self.executor.submit(self.get_feature_status, feature, host))
+            for feature in features
+        ]
+        return {feature: future.result() for feature, future in futures}
+
     def get_user_info(self, host=None):  # type: (Optional[str]) -> VeyonUser
         """
         Fetches the information about a logged in user on a given host
@@ -67,6 +67,7 @@ FN_CONFIG = "squidGuard.conf"
 DIR_DATA = "/var/lib/ucs-school-webproxy"
 FN_GLOBAL_BLACKLIST_PREFIX = "global-blacklist"
 TXT_GLOBAL_BLACKLIST_COMMENT = "###GLOBAL-BLACKLIST-COMMENT###"
+TXT_LIST_COMMENT = "###LIST-COMMENT-%s###"
 UCR_FORCED_GLOBAL_BLACKLIST = "proxy/filter/global/blacklists/forced"
 RELOAD_SOCKET_PATH = "/var/run/univention-reload-service.socket"
 
@@ -120,15 +121,21 @@ def handler(configRegistry, changes):
     os.close(fno)
 
     checkGlobalBlacklist(configRegistry, DIR_DATA, changes)
-    createTemporaryConfig(fn_temp_config, configRegistry, DIR_TEMP, changes)
+    lists = getLists(configRegistry)
+    createTemporaryConfig(fn_temp_config, configRegistry, DIR_TEMP, changes, lists)
     writeGlobalBlacklist(configRegistry, DIR_TEMP, changes)
-    writeUsergroupMemberLists(configRegistry, DIR_TEMP)
-    writeBlackWhiteLists(configRegistry, DIR_TEMP)
-    writeSettinglist(configRegistry, DIR_TEMP)
-    finalizeConfig(fn_temp_config, DIR_TEMP, DIR_DATA)
+    changed_lists = writeChangedLists(lists, DIR_TEMP, DIR_DATA)
+    enableLists(fn_temp_config, changed_lists)
+    compile_db = any(not fn.startswith("usergroup-") for fn in changed_lists) or any(
+        "proxy/filter/global/blacklists/%s" % (listtype,) in changes for listtype in ("domains", "urls")
+    )
+    finalizeConfig(fn_temp_config, DIR_TEMP, DIR_DATA, compile_db)
+    config_changed = not filesEqual(fn_temp_config, fn_config)
     moveConfig(fn_temp_config, fn_config, FN_CONFIG, DIR_TEMP, DIR_DATA)
     removeTempDirectory(DIR_TEMP)
-    reloadSquid()
+    # a running squid has to reread the configuration and (changed) lists
+    if config_changed or changed_lists or compile_db:
+        reloadSquid()
 
 
 def reloadSquid():
@@ -151,9 +158,15 @@ def reloadSquidDirectly():
     subprocess.call(("/bin/systemctl", "reload", "squid"), close_fds=True)  # nosec
 
 
-def createTemporaryConfig(fn_temp_config, configRegistry, DIR_TEMP, changes):
+def createTemporaryConfig(fn_temp_config, configRegistry, DIR_TEMP, changes, lists):
     # create config in temporary directory with temporary "dbhome" setting
-    touchfnlist = []
+    # All entries referencing a list file are commented out with TXT_LIST_COMMENT, enableLists()
+    # reenables those of changed lists. Unchanged lists are not recompiled (see finalizeConfig()).
+
+    def listEntry(keyword, fn):
+        lists.setdefault(fn, "")  # referenced files must exist
+        return "%s\t %s %s\n" % (TXT_LIST_COMMENT % (fn,), keyword, fn)
+
     if "proxy/filter/redirecttarget" in configRegistry:
         default_redirect = configRegistry["proxy/filter/redirecttarget"]
     else:
@@ -229,41 +242,30 @@ def createTemporaryConfig(fn_temp_config, configRegistry, DIR_TEMP, changes):
     # src usergroup
     for priority, usergroupname, _proxy_setting in sorted(usergroupSetting, reverse=True):
         f.write("src usergroup-%s {\n" % quote(usergroupname))
-        f.write("        userlist usergroup-%s\n" % quote(usergroupname))
+        f.write(listEntry("userlist", "usergroup-%s" % quote(usergroupname)))
         f.write("}\n\n")
-        touchfnlist.append("usergroup-%s" % quote(usergroupname))
 
     f.write("dest blacklist {\n")
-    f.write("	 domainlist blacklisted-domain\n")
-    f.write("	 urllist	blacklisted-url\n")
+    f.write(listEntry("domainlist", "blacklisted-domain"))
+    f.write(listEntry("urllist", "blacklisted-url"))
     f.write("}\n\n")
-    touchfnlist.extend(["blacklisted-domain", "blacklisted-url"])
 
     f.write("dest whitelist {\n")
-    f.write("	 domainlist whitelisted-domain\n")
-    f.write("	 urllist	whitelisted-url\n")
+    f.write(listEntry("domainlist", "whitelisted-domain"))
+    f.write(listEntry("urllist", "whitelisted-url"))
     f.write("}\n\n")
-    touchfnlist.extend(["whitelisted-domain", "whitelisted-url"])
 
     for proxy_setting in [quote(x) for x in proxy_settinglist] + [
         quote(username) + "-user" for username in roomRule
     ]:
         f.write("dest blacklist-%s {\n" % proxy_setting)
-        f.write("	 domainlist blacklisted-domain-%s\n" % proxy_setting)
-        f.write("	 urllist	blacklisted-url-%s\n" % proxy_setting)
+        f.write(listEntry("domainlist", "blacklisted-domain-%s" % proxy_setting))
+        f.write(listEntry("urllist", "blacklisted-url-%s" % proxy_setting))
         f.write("}\n\n")
         f.write("dest whitelist-%s {\n" % proxy_setting)
-        f.write("	 domainlist whitelisted-domain-%s\n" % proxy_setting)
-        f.write("	 urllist	whitelisted-url-%s\n" % proxy_setting)
+        f.write(listEntry("domainlist", "whitelisted-domain-%s" % proxy_setting))
+        f.write(listEntry("urllist", "whitelisted-url-%s" % proxy_setting))
         f.write("}\n\n")
-        touchfnlist.extend(
-            [
-                "blacklisted-domain-%s" % proxy_setting,
-                "blacklisted-url-%s" % proxy_setting,
-                "whitelisted-domain-%s" % proxy_setting,
-                "whitelisted-url-%s" % proxy_setting,
-            ]
-        )
 
     # disable the domainlist/urllist within the temporary config file - processing the global blacklists
     # may take several seconds (depending on their size). The entry is reenabled when copied to target
@@ -349,11 +351,6 @@ def createTemporaryConfig(fn_temp_config, configRegistry, DIR_TEMP, changes):
 
     f.close()
 
-    # NOTE: touch all referenced database files to prevent squidguard
-    #       from shutting down due to missing files
-    for fn in touchfnlist:
-        open(os.path.join(DIR_TEMP, fn), "a+").close()
-
 
 def checkGlobalBlacklist(configRegistry, DIR_DATA, changes):
     for listtype in ("domains", "urls"):
@@ -390,79 +387,108 @@ def writeGlobalBlacklist(configRegistry, DIR_TEMP, changes):
                     fout.write(content)
 
 
-def writeSettinglist(configRegistry, DIR_TEMP):
-    proxy_settinglist = set()
-    regex = re.compile("^proxy/filter/setting((?:-user)?)/([^/]+)/.*$")
-    for key in configRegistry:
-        match = regex.match(key)
-        if match:
-            proxy_settinglist.add(match.groups())
-    for userpart, proxy_setting in proxy_settinglist:
-        for filtertype in ["domain", "url"]:
-            for itemtype in ["blacklisted", "whitelisted"]:
-                filename = "%s-%s-%s%s" % (itemtype, filtertype, quote(proxy_setting), userpart)
-                dbfn = "%s/%s" % (DIR_TEMP, filename)
-                f = open(dbfn, "w")
-                for key in configRegistry:
-                    if key.startswith(
-                        "proxy/filter/setting%s/%s/%s/%s/"
-                        % (userpart, proxy_setting, filtertype, itemtype)
-                    ):
-                        value = configRegistry[key]
-                        if value.startswith("http://"):
-                            value = value[len("http://") :]
-                        if value.startswith("https://"):
-                            value = value[len("https://") :]
-                        if value.startswith("ftp://"):
-                            value = value[len("ftp://") :]
-                        if filtertype == "url":
-                            if value.startswith("www."):
-                                value = value[len("www.") :]
-                        f.write("%s\n" % value)
-                f.close()
-
-
-def writeBlackWhiteLists(configRegistry, DIR_TEMP):
+def stripListEntry(value, filtertype):
+    if value.startswith("http://"):
+        value = value[len("http://") :]
+    if value.startswith("https://"):
+        value = value[len("https://") :]
+    if value.startswith("ftp://"):
+        value = value[len("ftp://") :]
+    if filtertype == "url":
+        if value.startswith("www."):
+            value = value[len("www.") :]
+    return value
+
+
+def getLists(configRegistry):
+    """
+    Compute the content of all black/white lists (global and per setting) and user group member
+    lists with one pass over the UCR variables.
+
+    Returns a dict: name of the list file -> content
+    """
+    domain = configRegistry["windows/domain"]
+    regex_list = re.compile("^proxy/filter/(domain|url)/(blacklisted|whitelisted)/")
+    regex_setting = re.compile("^proxy/filter/setting((?:-user)?)/([^/]+)/(.*)$")
+    lists = {}
     for filtertype in ["domain", "url"]:
         for itemtype in ["blacklisted", "whitelisted"]:
-            filename = "%s-%s" % (itemtype, filtertype)
-            dbfn = "%s/%s" % (DIR_TEMP, filename)
-            f = open(dbfn, "w")
-            for key in configRegistry:
-                if key.startswith("proxy/filter/%s/%s/" % (filtertype, itemtype)):
-                    value = configRegistry[key]
-                    if value.startswith("http://"):
-                        value = value[len("http://") :]
-                    if value.startswith("https://"):
-                        value = value[len("https://") :]
-                    if value.startswith("ftp://"):
-                        value = value[len("ftp://") :]
-                    if filtertype == "url":
-                        if value.startswith("www."):
-                            value = value[len("www.") :]
-                    f.write("%s\n" % value)
-            f.close()
-
-
-def writeUsergroupMemberLists(configRegistry, DIR_TEMP):
-    domain = configRegistry["windows/domain"]
-    for key in configRegistry:
-        if key.startswith("proxy/filter/usergroup/"):
+            lists["%s-%s" % (itemtype, filtertype)] = []
+    for key, value in configRegistry.items():
+        match = regex_setting.match(key)
+        if match:
+            userpart, proxy_setting, subkey = match.groups()
+            for filtertype in ["domain", "url"]:
+                for itemtype in ["blacklisted", "whitelisted"]:
+                    filename = "%s-%s-%s%s" % (itemtype, filtertype, quote(proxy_setting), userpart)
+                    lists.setdefault(filename, [])
+            parts = subkey.split("/", 2)
+            if len(parts) == 3 and parts[0] in ("domain", "url"):
+                if parts[1] in ("blacklisted", "whitelisted"):
+                    filename = "%s-%s-%s%s" % (parts[1], parts[0], quote(proxy_setting), userpart)
+                    lists[filename].append(stripListEntry(value, parts[0]))
+            continue
+        match = regex_list.match(key)
+        if match:
+            filtertype, itemtype = match.groups()
+            lists["%s-%s" % (itemtype, filtertype)].append(stripListEntry(value, filtertype))
+        elif key.startswith("proxy/filter/usergroup/"):
             usergroupname = key.rsplit("/", 1)[1]
-            filename = "usergroup-%s" % quote(usergroupname)
-            dbfn = "%s/%s" % (DIR_TEMP, filename)
-            f = open(dbfn, "w")
-            for memberUid in configRegistry[key].split(","):
-                f.write("%s\n" % (memberUid))
-                f.write("%s\\%s\n" % (domain, memberUid))
-            f.close()
-
-
-def finalizeConfig(fn_temp_config, DIR_TEMP, DIR_DATA):
-    # create all db files
-    subprocess.call(  # nosec
-        ("squidGuard", "-c", fn_temp_config, "-C", "all"), stdin=open("/dev/null"), close_fds=True
-    )
+            lists["usergroup-%s" % quote(usergroupname)] = [
+                line
+                for memberUid in value.split(",")
+                for line in (memberUid, "%s\\%s" % (domain, memberUid))
+            ]
+    return {fn: "".join("%s\n" % (entry,) for entry in entries) for fn, entries in lists.items()}
+
+
+def writeChangedLists(lists, DIR_TEMP, DIR_DATA):
+    """
+    Write the list files, whose content differs from the one in DIR_DATA, to DIR_TEMP. The
+    database files of unchanged lists are kept.
+
+    Returns the names of the written list files.
+    """
+    changed = set()
+    for fn, content in lists.items():
+        fn_data = os.path.join(DIR_DATA, fn)
+        try:
+            with open(fn_data) as fd:
+                unchanged = fd.read() == content
+        except (IOError, OSError, UnicodeDecodeError):
+            unchanged = False
+        if unchanged and (fn.startswith("usergroup-") or os.path.exists(fn_data + ".db")):
+            continue
+        with open(os.path.join(DIR_TEMP, fn), "w") as fd:
+            fd.write(content)
+        changed.add(fn)
+    return changed
+
+
+def enableLists(fn_temp_config, changed_lists):
+    # reenable the entries of the changed lists, so squidGuard creates their database files
+    with open(fn_temp_config) as fd:
+        content = fd.read()
+    for fn in changed_lists:
+        content = content.replace(TXT_LIST_COMMENT % (fn,), "")
+    with open(fn_temp_config, "w") as fd:
+        fd.write(content)
+
+
+def filesEqual(fn1, fn2):
+    try:
+        with open(fn1, "rb") as fd1, open(fn2, "rb") as fd2:
+            return fd1.read() == fd2.read()
+    except (IOError, OSError):
+        return False
+
+
+def finalizeConfig(fn_temp_config, DIR_TEMP, DIR_DATA, compile_db=True):
+    # create the db files of all enabled lists
+    if compile_db:
+        subprocess.call(  # nosec
+            ("squidGuard", "-c", fn_temp_config, "-C", "all"), stdin=open("/dev/null"), close_fds=True
+        )
     # fix permissions
     subprocess.call(("chmod", "-R", "a=,ug+rw", DIR_TEMP, fn_temp_config), close_fds=True)  # nosec
     subprocess.call(("chown", "-R", "root:proxy", DIR_TEMP, fn_temp_config), close_fds=True)  # nosec
@@ -470,6 +496,7 @@ def finalizeConfig(fn_temp_config, DIR_TEMP, DIR_DATA):
     content = open(fn_temp_config).read()
     content = content.replace("\ndbhome %s/\n" % DIR_TEMP, "\ndbhome %s/\n" % DIR_DATA)
     content = content.replace(TXT_GLOBAL_BLACKLIST_COMMENT, "")  # reenable global blacklist entries
+    content = re.sub(TXT_LIST_COMMENT % ("[^#]*",), "", content)  # reenable unchanged lists
     with open(fn_temp_config, "w") as tempConfig:
         tempConfig.write(content)
 
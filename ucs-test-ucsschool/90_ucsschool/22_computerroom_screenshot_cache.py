@@ -0,0 +1,117 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: computerroom screenshot cache expires, evicts and deduplicates downloads
+## roles: [domaincontroller_master, domaincontroller_slave]
+## tags: [apptest,ucsschool,ucsschool_base1]
+## exposure: safe
+## packages: [ucs-school-umc-computerroom]
+
+import threading
+import time
+
+import pytest
+
+from univention.management.console.modules.computerroom.room_management import ScreenshotCache
+
+
+class Fetch(object):
+    def __init__(self, image=b"image", started=None, release=None):
+        self.image = image
+        self.calls = 0
+        self.started = started
+        self.release = release
+
+    def __call__(self):
+        self.calls += 1
+        if self.started:
+            self.started.set()
+        if self.release:
+            assert self.release.wait(10)
+        return self.image
+
+
+def test_cached_images_expire():
+    cache = ScreenshotCache(max_age=0.2, max_bytes=1024)
+    fetch = Fetch()
+
+    assert cache.get(("pc01", 100), fetch) == b"image"
+    assert cache.get(("pc01", 100), fetch) == b"image"
+    assert fetch.calls == 1
+    time.sleep(0.3)
+    assert cache.get(("pc01", 100), fetch) == b"image"
+    assert fetch.calls == 2
+    assert cache.get_stats() == {
+        "hits": 1,
+        "misses": 2,
+        "deduplicated": 0,
+        "evictions": 0,
+        "images": 1,
+        "bytes": 5,
+    }
+
+
+def test_missing_images_are_not_cached():
+    cache = ScreenshotCache(max_age=10, max_bytes=1024)
+    fetch = Fetch(image=None)
+
+    assert cache.get(("pc01", 100), fetch) is None
+    assert cache.get(("pc01", 100), fetch) is None
+    assert fetch.calls == 2
+    assert cache.get_stats()["images"] == 0
+
+
+def test_least_recently_used_images_are_evicted():
+    cache = ScreenshotCache(max_age=10, max_bytes=25)
+    fetches = {name: Fetch(image=name.encode("ASCII") * 10) for name in ("a", "b", "c")}
+
+    cache.get("a", fetches["a"])
+    cache.get("b", fetches["b"])
+    cache.get("a", fetches["a"])  # "b" is now the least recently used image
+    cache.get("c", fetches["c"])
+    stats = cache.get_stats()
+    assert (stats["images"], stats["bytes"], stats["evictions"]) == (2, 20, 1)
+
+    cache.get("a", fetches["a"])
+    cache.get("b", fetches["b"])
+    assert (fetches["a"].calls, fetches["b"].calls, fetches["c"].calls) == (1, 2, 1)
+
+    cache.get("big", Fetch(image=b"x" * 30))
+    assert cache.get_stats()["images"] == 0
+    assert cache.get_stats()["bytes"] == 0
+
+
+def test_concurrent_requests_wait_for_one_download():
+    cache = ScreenshotCache(max_age=10, max_bytes=1024)
+    started, release = threading.Event(), threading.Event()
+    fetch = Fetch(started=started, release=release)
+    results = []
+
+    def request():
+        results.append(cache.get(("pc01", 100), fetch))
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    threads[0].start()
+    assert started.wait(10)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.get_stats()["deduplicated"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert results == [b"image"] * 5
+    assert fetch.calls == 1
+    stats = cache.get_stats()
+    assert (stats["misses"], stats["deduplicated"]) == (1, 4)
+
+
+def test_failed_download_releases_waiting_requests():
+    cache = ScreenshotCache(max_age=10, max_bytes=1024)
+
+    def fetch():
+        raise RuntimeError("download failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get("pc01", fetch)
+    assert cache.get("pc01", Fetch()) == b"image"
@@ -0,0 +1,113 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: computerroom polls its computers with few threads and backs off from unreachable ones
+## roles: [domaincontroller_master, domaincontroller_slave]
+## tags: [apptest,ucsschool,ucsschool_base1]
+## exposure: safe
+## packages: [ucs-school-umc-computerroom]
+
+import threading
+import time
+
+import pytest
+
+from univention.management.console.modules.computerroom.room_management import (
+    MAX_POLL_BACKOFF,
+    VeyonComputer,
+    VeyonPoller,
+)
+
+
+class FakeComputer(object):
+    def __init__(self, delay):
+        self.delay = delay
+        self.polls = []
+        self.threads = set()
+
+    def poll(self):
+        self.polls.append(time.monotonic())
+        self.threads.add(threading.current_thread().name)
+
+    def next_poll_delay(self):
+        return self.delay
+
+
+class FakeUdmComputer(object):
+    info = {"name": "fake-computer", "ip": []}
+
+
+@pytest.fixture
+def poller():
+    poller = VeyonPoller(max_workers=2)
+    yield poller
+    poller.stop()
+
+
+@pytest.fixture
+def veyon_computer(monkeypatch):
+    computer = VeyonComputer(FakeUdmComputer(), None, {}, None)
+    computer._update_interval = 1
+    monkeypatch.setattr(computer, "update", lambda: None)
+    return computer
+
+
+def set_reachable(monkeypatch, computer, reachable):
+    def check_connection():
+        computer.connected = reachable
+        computer.state.set("connected" if reachable else "disconnected")
+
+    monkeypatch.setattr(computer, "_check_connection", check_connection)
+
+
+def test_poll_delay_backs_off_while_unreachable(monkeypatch, veyon_computer):
+    assert 1 <= veyon_computer.next_poll_delay() <= 2
+
+    set_reachable(monkeypatch, veyon_computer, False)
+    delays = []
+    for _ in range(7):
+        veyon_computer.poll()
+        delays.append(veyon_computer.next_poll_delay())
+    assert delays == [2, 4, 8, 16, MAX_POLL_BACKOFF, MAX_POLL_BACKOFF, MAX_POLL_BACKOFF]
+
+    set_reachable(monkeypatch, veyon_computer, True)
+    veyon_computer.poll()
+    assert 1 <= veyon_computer.next_poll_delay() <= 2
+
+
+def test_poller_polls_all_computers_with_its_workers(poller):
+    computers = [FakeComputer(0.05) for _ in range(10)]
+    for computer in computers:
+        poller.add(computer)
+    time.sleep(0.5)
+    poller.stop()
+
+    assert not poller.is_alive()
+    assert all(len(computer.polls) >= 3 for computer in computers)
+    threads = set.union(*(computer.threads for computer in computers))
+    assert len(threads) <= poller.max_workers
+    assert all(name.startswith("VeyonPoller") for name in threads)
+
+
+def test_poller_polls_unreachable_computers_less_often(poller):
+    reachable = FakeComputer(0.05)
+    unreachable = FakeComputer(MAX_POLL_BACKOFF)
+    poller.add(reachable)
+    poller.add(unreachable)
+    time.sleep(0.5)
+
+    assert len(reachable.polls) >= 5
+    assert len(unreachable.polls) == 1
+
+
+def test_poller_stops_polling_removed_computers(poller):
+    computer = FakeComputer(0.05)
+    poller.add(computer)
+    time.sleep(0.2)
+    poller.remove(computer)
+    time.sleep(0.1)  # an update may still have been running
+    polls = len(computer.polls)
+    time.sleep(0.3)
+
+    assert polls >= 1
+    assert len(computer.polls) == polls
+    assert poller.is_alive()
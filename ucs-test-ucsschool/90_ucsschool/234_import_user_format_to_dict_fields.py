@@ -0,0 +1,38 @@
+#!/usr/share/ucs-test/runner /usr/bin/pytest-3 -l -v
+## -*- coding: utf-8 -*-
+## desc: test schemes using fields computed by to_dict()
+## tags: [apptest,ucsschool,ucsschool_import1, unit-test]
+## roles: [domaincontroller_master]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import pytest
+
+import univention.testing.strings as uts
+from ucsschool.importer.utils.shell import ImportStudent  # also initializes import framework
+
+
+@pytest.mark.parametrize(
+    "scheme,expected",
+    [
+        ("<display_name>", "{firstname} {lastname}"),
+        ("<display_name:lower>", "{firstname} {lastname}"),
+        ("<firstname>.<display_name>", "{firstname}.{firstname} {lastname}"),
+        ("<type>", "importStudent"),
+        ("<type_name>", "{type_name}"),
+    ],
+)
+def test_to_dict_fields(scheme, expected):
+    firstname = uts.random_username()
+    lastname = uts.random_username()
+    user = ImportStudent(name="name", school="school", firstname=firstname, lastname=lastname)
+    expected = expected.format(firstname=firstname, lastname=lastname, type_name=user.type_name)
+    if ":lower" in scheme:
+        expected = expected.lower()
+    assert user.format_from_scheme("email", scheme) == expected
+
+
+def test_username_falls_back_to_name():
+    user = ImportStudent(name="name", school="school", firstname="first", lastname="last")
+    assert user.format_from_scheme("email", "<username>@<firstname>") == "name@first"
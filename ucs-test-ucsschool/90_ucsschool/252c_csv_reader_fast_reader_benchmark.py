@@ -0,0 +1,102 @@
+#!/usr/share/ucs-test/runner /usr/bin/pytest-3 -l -v
+## -*- coding: utf-8 -*-
+## desc: Compare results and speed of the fast and the default CsvReader mode
+## tags: [apptest,ucsschool,ucsschool_import1]
+## roles: [domaincontroller_master]
+## exposure: safe
+## packages:
+##   - ucs-school-import
+
+import csv
+import logging
+import time
+
+import pytest
+
+from ucsschool.importer.configuration import setup_configuration
+from ucsschool.importer.factory import setup_factory
+from ucsschool.importer.frontend.user_import_cmdline import UserImportCommandLine
+from ucsschool.importer.reader.csv_reader import CsvReader
+
+NUM_ROWS = 100000
+MAPPING = {
+    "Schule": "school",
+    "Benutzertyp": "__role",
+    "Vorname": "firstname",
+    "Nachname": "lastname",
+    "Klassen": "school_classes",
+    "ID": "record_uid",
+    "Notiz": "__ignore",
+}
+UNMAPPED_COLUMNS = ["Raum", "Telefon", "Geburtstag", "Eltern"]
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="module")
+def import_config():
+    ui = UserImportCommandLine()
+    config = setup_configuration(
+        ui.configuration_files, dry_run=True, source_uid="TestDB", verbose=False
+    )
+    setup_factory(config["factory"])
+    config["csv"]["mapping"] = MAPPING
+    return config
+
+
+def write_csv(filename, encoding, non_ascii_from_row):
+    header = list(MAPPING) + UNMAPPED_COLUMNS
+    with open(filename, "w", encoding=encoding, newline="") as fp:
+        writer = csv.writer(fp, quoting=csv.QUOTE_ALL)
+        writer.writerow(header)
+        for num in range(NUM_ROWS):
+            lastname = "Müller" if num >= non_ascii_from_row else "Mueller"
+            writer.writerow(
+                [
+                    "DEMOSCHOOL",
+                    "student",
+                    " Anna{} ".format(num),
+                    lastname,
+                    "DEMOSCHOOL-1a",
+                    "id{}".format(num),
+                    "note",
+                    "room 1",
+                    "+49 421 {}".format(num),
+                    "2010-01-01",
+                    "Parent {}".format(num),
+                ]
+            )
+
+
+def read_all(config, filename, fast_reader):
+    config["csv"]["fast_reader"] = fast_reader
+    reader = CsvReader(filename, header_lines=1)
+    t0 = time.perf_counter()
+    rows = list(reader.read())
+    return time.perf_counter() - t0, rows
+
+
+@pytest.mark.parametrize(
+    "encoding,non_ascii_from_row",
+    [("utf-8", 0), ("utf-8-sig", 0), ("latin-1", 0), ("utf-8", NUM_ROWS - 1), ("ascii", NUM_ROWS)],
+)
+def test_fast_reader(import_config, tmp_path, encoding, non_ascii_from_row):
+    filename = str(tmp_path / "users.csv")
+    write_csv(filename, encoding, non_ascii_from_row)
+
+    encoding_from_prefix = CsvReader.get_encoding(filename, max_bytes=CsvReader.encoding_detection_size)
+    assert encoding_from_prefix == CsvReader.get_encoding(filename)
+
+    default_time, default_rows = read_all(import_config, filename, False)
+    fast_time, fast_rows = read_all(import_config, filename, True)
+    logger.info(
+        "Reading %d rows (%s, first non-ASCII row: %d): default: %.2fs fast: %.2fs",
+        NUM_ROWS,
+        encoding,
+        non_ascii_from_row,
+        default_time,
+        fast_time,
+    )
+    mapped_columns = [key for key, value in MAPPING.items() if value != "__ignore"]
+    assert len(fast_rows) == len(default_rows) == NUM_ROWS
+    assert fast_rows == [{key: row[key] for key in mapped_columns} for row in default_rows]
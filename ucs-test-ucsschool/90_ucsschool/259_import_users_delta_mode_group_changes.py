@@ -0,0 +1,89 @@
+#!/usr/share/ucs-test/runner python3
+## -*- coding: utf-8 -*-
+## desc: Delta mode skips unchanged users, but repairs changed class memberships
+## tags: [apptest,ucsschool,ucsschool_import1]
+## roles: [domaincontroller_master]
+## exposure: dangerous
+## packages:
+##   - ucs-school-import
+
+import copy
+import csv
+import os
+import tempfile
+
+import univention.testing.strings as uts
+from univention.testing.ucsschool.importusers import Person
+from univention.testing.ucsschool.importusers_cli_v2 import CLI_Import_v2_Tester
+
+
+class Test(CLI_Import_v2_Tester):
+    ou_B = None
+    ou_C = None
+
+    def __init__(self):
+        super(Test, self).__init__()
+        self.summary_fd = tempfile.NamedTemporaryFile(delete=False, mode="w+")
+
+    def cleanup(self):
+        super(Test, self).cleanup()
+        os.remove(self.summary_fd.name)
+
+    def read_summary_actions(self):
+        self.summary_fd.seek(os.SEEK_SET)
+        return {row["username"]: row["action"] for row in csv.DictReader(self.summary_fd)}
+
+    def test(self):
+        source_uid = "source_uid-%s" % (uts.random_string(),)
+        config = copy.deepcopy(self.default_config)
+        config.update_entry("csv:mapping:Benutzername", "name")
+        config.update_entry("csv:mapping:record_uid", "record_uid")
+        config.update_entry("delta_state_file", os.path.join(self.tmpdir, "delta_state.json"))
+        config.update_entry("output:user_import_summary", self.summary_fd.name)
+        config.update_entry("source_uid", source_uid)
+
+        self.log.info("*** 1. Importing (create in %r) students with a class...", self.ou_A.name)
+        person_list = []
+        for _ in range(3):
+            person = Person(self.ou_A.name, "student")
+            person.update(record_uid="record_uid-{}".format(uts.random_string()), source_uid=source_uid)
+            person.append_random_class()
+            person_list.append(person)
+        fn_csv = self.create_csv_file(person_list=person_list, mapping=config["csv"]["mapping"])
+        fn_config = self.create_config_json(config=config)
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        for person in person_list:
+            person.verify()
+        assert os.path.exists(config["delta_state_file"])
+
+        self.log.info("*** 2. Importing the same data again, all users are unchanged...")
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        actions = self.read_summary_actions()
+        assert all(actions[person.username] == "U" for person in person_list), actions
+
+        self.log.info("*** 3. Removing a student from its class outside of the import...")
+        person = person_list[0]
+        class_dn = "cn={},cn=klassen,cn=schueler,cn=groups,{}".format(
+            person.school_classes[self.ou_A.name][0], self.ou_A.dn
+        )
+        self.schoolenv.lo.modify(
+            class_dn,
+            [
+                ("uniqueMember", person.dn.encode("UTF-8"), b""),
+                ("memberUid", person.username.encode("UTF-8"), b""),
+            ],
+        )
+        members = self.lo.get(class_dn, attr=["uniqueMember"]).get("uniqueMember", [])
+        assert person.dn.encode("UTF-8") not in members
+
+        self.log.info("*** 4. Importing the same data again, the membership must be repaired...")
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        actions = self.read_summary_actions()
+        assert actions[person.username] == "M", actions
+        assert all(actions[p.username] == "U" for p in person_list[1:]), actions
+        for person in person_list:
+            person.verify()
+
+
+if __name__ == "__main__":
+    Test().run()
@@ -0,0 +1,104 @@
+#!/usr/share/ucs-test/runner python3
+## -*- coding: utf-8 -*-
+## desc: Parallel and streaming imports create the same users, usernames and counters as a serial one
+## tags: [apptest,ucsschool,ucsschool_import1]
+## roles: [domaincontroller_master]
+## exposure: dangerous
+## packages:
+##   - ucs-school-import
+
+import copy
+
+from ldap.filter import filter_format
+
+import univention.testing.strings as uts
+from univention.testing import utils
+from univention.testing.ucs_samba import wait_for_drs_replication
+from univention.testing.ucsschool.importusers import Person
+from univention.testing.ucsschool.importusers_cli_v2 import UniqueObjectTester
+
+NUM_LASTNAMES = 4
+USERS_PER_LASTNAME = 5
+MODES = (
+    ("serial", {}),
+    ("parallel", {"parallelism": 4}),
+    ("streaming", {"streaming_batch_size": 3}),
+    ("parallel streaming", {"parallelism": 4, "streaming_batch_size": 3}),
+)
+
+
+class Test(UniqueObjectTester):
+    def __init__(self):
+        super(Test, self).__init__()
+        self.ou_B = None
+        self.ou_C = None
+
+    def import_users(self, mode, config_values, persons):
+        tag = uts.random_name(3)
+        source_uid = "source_uid-%s" % (uts.random_string(),)
+        config = copy.deepcopy(self.default_config)
+        config.update_entry("csv:mapping:record_uid", "record_uid")
+        config.update_entry("source_uid", source_uid)
+        config.update_entry(
+            "scheme:username:default", "<:umlauts>%s.<lastname>[0:5][ALWAYSCOUNTER]" % tag
+        )
+        for key, value in config_values.items():
+            config.update_entry(key, value)
+        persons = copy.deepcopy(persons)
+        for person in persons:
+            person.update(source_uid=source_uid, username=None)
+
+        self.log.info("*** Importing %d users (%s)...", len(persons), mode)
+        fn_csv = self.create_csv_file(person_list=persons, mapping=config["csv"]["mapping"])
+        fn_config = self.create_config_json(config=config)
+        self.save_ldap_status()
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        utils.wait_for_replication()
+        self.check_new_and_removed_users(len(persons), 0)
+
+        usernames = {}
+        for person in persons:
+            person.update_from_ldap(self.lo, ["dn", "username"])
+            wait_for_drs_replication(filter_format("cn=%s", (person.username,)))
+            person.verify()
+            usernames[person.record_uid] = person.username
+        prefixes = {"%s.%s" % (tag, person.lastname[0:5]) for person in persons}
+        self.unique_basenames_to_remove.extend(prefixes)
+        for prefix in prefixes:
+            self.check_unique_obj("unique-usernames", prefix, str(USERS_PER_LASTNAME + 1))
+
+        self.log.info("*** Deleting the users (%s)...", mode)
+        fn_csv = self.create_csv_file(person_list=[], mapping=config["csv"]["mapping"])
+        self.save_ldap_status()
+        self.run_import(["-c", fn_config, "-i", fn_csv])
+        utils.wait_for_replication()
+        self.check_new_and_removed_users(0, len(persons))
+        for person in persons:
+            person.set_mode_to_delete()
+            person.verify()
+
+        # the same usernames without the tag of this run
+        return {record_uid: username[len(tag) :] for record_uid, username in usernames.items()}
+
+    def test(self):
+        lastnames = [uts.random_name(8) for _ in range(NUM_LASTNAMES)]
+        persons = []
+        for num in range(NUM_LASTNAMES * USERS_PER_LASTNAME):
+            person = Person(self.ou_A.name, "student")
+            person.update(record_uid=uts.random_name(), lastname=lastnames[num % NUM_LASTNAMES])
+            person.append_random_class()
+            persons.append(person)
+
+        results = {
+            mode: self.import_users(mode, config_values, persons) for mode, config_values in MODES
+        }
+
+        # workers may get the counters in another order, but all users get one of the same usernames
+        serial = results["serial"]
+        for mode, usernames in results.items():
+            assert set(usernames) == set(serial), mode
+            assert sorted(usernames.values()) == sorted(serial.values()), (mode, usernames, serial)
+
+
+if __name__ == "__main__":
+    Test().run()
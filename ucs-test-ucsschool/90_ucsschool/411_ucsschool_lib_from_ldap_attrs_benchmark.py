@@ -0,0 +1,78 @@
+#!/usr/share/ucs-test/runner pytest-3 -s -l -v
+## -*- coding: utf-8 -*-
+## desc: Compare results and speed of from_ldap_attrs() and from_udm_obj()
+## roles: [domaincontroller_master]
+## tags: [apptest,ucsschool,ucsschool_base1]
+## exposure: dangerous
+## packages:
+##   - python3-ucsschool-lib
+
+import logging
+import time
+
+import pytest
+
+import univention.testing.strings as uts
+from ucsschool.lib.models.base import ReadOnlyModel
+from ucsschool.lib.models.group import SchoolClass
+from ucsschool.lib.models.user import Student
+from univention.testing.ucsschool.conftest import UserType
+
+NUM_USERS = 100
+USER_ATTRS = ["name", "school", "schools", "firstname", "lastname", "ucsschool_roles", "school_classes"]
+CLASS_ATTRS = ["name", "school", "description", "users", "ucsschool_roles"]
+
+logger = logging.getLogger(__name__)
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = list(func(*args, **kwargs))
+    return time.perf_counter() - t0, res
+
+
+def test_from_ldap_attrs(create_ou, lo, user_school_attributes):
+    ou_name, ou_dn = create_ou(use_cache=False)
+    school_class = SchoolClass(name="{}-{}".format(ou_name, uts.random_name()), school=ou_name)
+    assert school_class.create(lo)
+    for _ in range(NUM_USERS):
+        school_attrs = user_school_attributes([ou_name], UserType.Student)
+        school_attrs["school_classes"] = {ou_name: [school_class.name]}
+        assert Student(**school_attrs).create(lo)
+
+    udm_time, udm_users = timed(Student.get_all, lo, ou_name)
+    read_time, read_users = timed(Student.iter_all, lo, ou_name, attrs=USER_ATTRS)
+    logger.info(
+        "Loading %d students: from_udm_obj(): %.2fs from_ldap_attrs(): %.2fs",
+        NUM_USERS,
+        udm_time,
+        read_time,
+    )
+    assert len(udm_users) == len(read_users) == NUM_USERS
+    read_users_by_dn = {user.dn: user for user in read_users}
+    for udm_user in udm_users:
+        read_user = read_users_by_dn[udm_user.dn]
+        assert isinstance(read_user, ReadOnlyModel)
+        assert read_user.model is Student
+        for attr in ("name", "school", "firstname", "lastname"):
+            assert getattr(read_user, attr) == getattr(udm_user, attr)
+        assert set(read_user.schools) == set(udm_user.schools)
+        assert set(read_user.ucsschool_roles) == set(udm_user.ucsschool_roles)
+        assert {k: list(v) for k, v in read_user.school_classes.items()} == udm_user.school_classes
+
+    read_user = read_users[0]
+    with pytest.raises(AttributeError):
+        read_user.name = "foo"
+    assert read_user.get_model(lo).dn == read_user.dn
+
+    udm_time, udm_classes = timed(SchoolClass.get_all, lo, ou_name)
+    read_time, read_classes = timed(SchoolClass.iter_all, lo, ou_name, attrs=CLASS_ATTRS)
+    logger.info(
+        "Loading %d classes: from_udm_obj(): %.2fs from_ldap_attrs(): %.2fs",
+        len(udm_classes),
+        udm_time,
+        read_time,
+    )
+    assert sorted((c.dn, c.name, sorted(c.users)) for c in udm_classes) == sorted(
+        (c.dn, c.name, sorted(c.users)) for c in read_classes
+    )